@@ -1,6 +1,9 @@
 
+import functools
+import hashlib
 import logging
 import os
+import struct
 import threading
 import time
 from sqlite3 import OperationalError
@@ -51,13 +54,20 @@ class DBSync(object):
 
 class Journal(object):
     """
-    Interface for accessing the journal for the queries that couldn't run in
-    the remote side, either for it being offline or failed to execute.
+    Interface for accessing the journal for the queries that have not run in
+    the remote side yet, either for it being offline or failed to execute.
 
-    This should be used in a context and provides file locking by itself.
+    The journal is append-only: every query is a record made of its length
+    (4 bytes, big endian) followed by the pickled `(sql, params)` tuple.
+    Records are removed from the head of the journal once the remote side
+    acknowledged them (see `ReplicationSender`).
+
+    It can also be used in a context, which provides file locking by itself and
+    exposes every journaled query in `queries`.
     """
 
     JOURNAL_FILE = '/data/ha-journal'
+    HEADER = struct.Struct('>I')
 
     @classmethod
     def is_empty(cls):
@@ -68,68 +78,359 @@ class Journal(object):
         except OSError:
             return True
 
-    def _get_queries(self):
+    @classmethod
+    def lock(cls, name=None):
+        """
+        Returns an acquired lock for the journal file, `name` suffix is used for
+        other locks related to the journal.
+        """
+        lock = LockFile(cls.JOURNAL_FILE + (f'.{name}' if name else ''))
+        while not lock.i_am_locking():
+            try:
+                lock.acquire(timeout=5)
+            except LockTimeout:
+                lock.break_lock()
+        return lock
+
+    @classmethod
+    def append(cls, queries):
+        """
+        Append `queries` (a list of `(sql, params)`) to the journal.
+        Journal lock must be held.
+        """
+        data = b''
+        for query in queries:
+            payload = pickle.dumps(tuple(query))
+            data += cls.HEADER.pack(len(payload)) + payload
+
+        with open(cls.JOURNAL_FILE, 'ab') as f:
+            f.write(data)
+
+    @classmethod
+    def read(cls, limit=None):
+        """
+        Read up to `limit` queries from the head of the journal.
+        Journal lock must be held.
+
+        Returns the queries and the offset where the next query starts.
+        """
+        queries = []
+        try:
+            f = open(cls.JOURNAL_FILE, 'rb')
+        except FileNotFoundError:
+            return queries, 0
+
+        with f:
+            head = f.read(1)
+            f.seek(0)
+            if head == b'\x80':
+                # Journal written in the previous format (a pickled list of every query)
+                try:
+                    queries = pickle.loads(f.read())
+                except (pickle.PickleError, EOFError):
+                    queries = []
+                cls.rewrite(queries)
+                return cls.read(limit)
+
+            offset = 0
+            while limit is None or len(queries) < limit:
+                header = f.read(cls.HEADER.size)
+                if not header:
+                    break
+                payload = b''
+                if len(header) == cls.HEADER.size:
+                    size = cls.HEADER.unpack(header)[0]
+                    payload = f.read(size)
+                if len(header) < cls.HEADER.size or len(payload) < size:
+                    log.warning('Discarding incomplete query at the end of HA journal')
+                    os.truncate(cls.JOURNAL_FILE, offset)
+                    break
+                try:
+                    queries.append(pickle.loads(payload))
+                except (pickle.PickleError, EOFError):
+                    log.warning('Discarding unreadable query from HA journal', exc_info=True)
+                offset = f.tell()
+
+        return queries, offset
+
+    @classmethod
+    def truncate(cls, offset):
+        """
+        Remove queries before `offset` (a checkpoint returned by `read`).
+        Journal lock must be held.
+        """
         try:
-            with open(self.JOURNAL_FILE, 'rb') as f:
-                self.queries = pickle.loads(f.read())
-        except (pickle.PickleError, EOFError):
-            self.queries = []
+            size = os.stat(cls.JOURNAL_FILE).st_size
+        except FileNotFoundError:
+            return
+
+        if offset >= size:
+            os.truncate(cls.JOURNAL_FILE, 0)
+            return
+
+        tmp = cls.JOURNAL_FILE + '.tmp'
+        with open(cls.JOURNAL_FILE, 'rb') as src, open(tmp, 'wb') as dst:
+            src.seek(offset)
+            dst.write(src.read())
+        os.rename(tmp, cls.JOURNAL_FILE)
+
+    @classmethod
+    def rewrite(cls, queries):
+        """
+        Replace contents of the journal with `queries`.
+        Journal lock must be held.
+        """
+        if os.path.exists(cls.JOURNAL_FILE):
+            os.truncate(cls.JOURNAL_FILE, 0)
+        if queries:
+            cls.append(queries)
 
     def __enter__(self):
-        self._lock = LockFile(self.JOURNAL_FILE)
-        while not self._lock.i_am_locking():
-            try:
-                self._lock.acquire(timeout=5)
-            except LockTimeout:
-                self._lock.break_lock()
+        # Prevent queries from being sent while they are accessed
+        self._send_lock = self.lock('send')
+        self._lock = self.lock()
 
         if not os.path.exists(self.JOURNAL_FILE):
             open(self.JOURNAL_FILE, 'a').close()
 
-        self._get_queries()
+        self.queries, offset = self.read()
+        self._queries = list(self.queries)
         return self
 
     def __exit__(self, typ, value, traceback):
-
-        with open(self.JOURNAL_FILE, 'wb+') as f:
-            if self.queries:
-                f.write(pickle.dumps(self.queries))
-
-        self._lock.release()
+        try:
+            count = len(self._queries)
+            if self.queries[:count] == self._queries:
+                # Only appending queries does not require rewriting the journal
+                if len(self.queries) > count:
+                    self.append(self.queries[count:])
+            else:
+                self.rewrite(self.queries)
+        finally:
+            self._lock.release()
+            self._send_lock.release()
         if typ is not None:
             raise
 
 
-class RunSQLRemote(threading.Thread):
+class ReplicationSender(object):
     """
-    This is a thread responsible for running the queries on the remote side.
+    Long-lived thread responsible for running the queries on the remote side.
+
+    Queries are appended to the Journal and the sender is woken up to send every
+    journaled query in batches of up to `BATCH_SIZE` through a single
+    `datastore.sql_batch` call (or one `datastore.sql` call per query if the
+    remote side does not have it yet). Queries are removed from the journal once
+    the remote side ran them. If it fails (e.g. remote side offline) they stay
+    journaled and sending is retried every `RETRY_INTERVAL` seconds.
 
-    The query will be appended to the Journal in case the Journal is not empty
-    or if it fails (e.g. remote side offline)
+    Sending is serialized between threads and processes by the journal `send` lock.
     """
 
-    def __init__(self, *args, **kwargs):
-        self._sql = kwargs.pop('sql')
-        self._params = kwargs.pop('params')
-        super(RunSQLRemote, self).__init__(*args, **kwargs)
+    BATCH_SIZE = 500
+    RETRY_INTERVAL = 10
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, client=None):
+        self.client = client
+        self.pid = os.getpid()
+        self.event = threading.Event()
+        self.sql_batch = True
+        self.thread = threading.Thread(target=self.run, name='ReplicationSender', daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def get(cls):
+        with cls._instance_lock:
+            # Threads do not survive a fork
+            if cls._instance is None or cls._instance.pid != os.getpid():
+                cls._instance = cls()
+            return cls._instance
+
+    def send(self, sql, params, wait=False):
+        """
+        Journal a query to run on the remote side, sending it right away if `wait`.
+        """
+        lock = Journal.lock()
+        try:
+            Journal.append([(sql, params)])
+        finally:
+            lock.release()
+
+        sent = False
+        try:
+            if wait:
+                sent = self.flush()
+                return sent
+            return True
+        finally:
+            if not sent:
+                # Let the thread send (or retry sending) what is left in the journal
+                self.event.set()
 
     def run(self):
+        pending = not Journal.is_empty()
+        while True:
+            self.event.wait(self.RETRY_INTERVAL if pending else None)
+            self.event.clear()
+            try:
+                pending = not self.flush()
+            except Exception:
+                log.error('Failed to replicate journaled queries', exc_info=True)
+                pending = True
+
+    def flush(self):
+        """
+        Send every journaled query to the remote side.
+
+        Returns whether they have all been sent.
+        """
         from freenasUI.middleware.client import client, ClientException
+
+        send_lock = Journal.lock('send')
         try:
-            with Journal() as f:
-                if f.queries:
-                    f.queries.append((self._sql, self._params))
-                else:
-                    with client as c:
-                        c.call('failover.call_remote', 'datastore.sql', [self._sql, self._params])
-        except ClientException:
-            with Journal() as f:
-                f.queries.append((self._sql, self._params))
-            return False
-        except Exception as err:
-            log.error('Failed to run SQL remotely %s: %s', self._sql, err, exc_info=True)
-            return False
-        return True
+            while True:
+                lock = Journal.lock()
+                try:
+                    # Without `datastore.sql_batch` queries are sent and removed from the journal one by one
+                    queries, offset = Journal.read(self.BATCH_SIZE if self.sql_batch else 1)
+                finally:
+                    lock.release()
+
+                if not queries:
+                    return True
+
+                try:
+                    with (self.client or client) as c:
+                        if self.sql_batch:
+                            c.call('failover.call_remote', 'datastore.sql_batch', [queries])
+                        else:
+                            c.call('failover.call_remote', 'datastore.sql', list(queries[0]))
+                except ClientException as e:
+                    if self.sql_batch and e.errno == ClientException.ENOMETHOD:
+                        # Remote side runs an older version (e.g. during an upgrade)
+                        log.debug('Remote side does not support datastore.sql_batch, sending queries one by one')
+                        self.sql_batch = False
+                        continue
+                    log.debug('Failed to run %d journaled queries remotely: %s', len(queries), e)
+                    # Remote side may come back upgraded
+                    self.sql_batch = True
+                    # We may not be MASTER anymore, do not trust the cached status until the next query
+                    FailoverStatus.invalidate()
+                    return False
+                except Exception as err:
+                    log.error('Failed to run %d journaled queries remotely: %s', len(queries), err, exc_info=True)
+                    FailoverStatus.invalidate()
+                    return False
+
+                lock = Journal.lock()
+                try:
+                    Journal.truncate(offset)
+                finally:
+                    lock.release()
+        finally:
+            send_lock.release()
+
+
+def synced_tables(cursor):
+    """
+    Tables synced between nodes, i.e. not excluded as a whole by NO_SYNC_MAP.
+    """
+    cursor.execute("select name from sqlite_master where type = 'table'")
+    return [row[0] for row in cursor.fetchall() if NO_SYNC_MAP.get(row[0], True)]
+
+
+def table_fields(cursor, table):
+    cursor.execute("PRAGMA table_info('%s');" % table)
+    return [i[1] for i in cursor.fetchall()]
+
+
+def quote_fields(fields):
+    return ', '.join(['`%s`' % f for f in fields])
+
+
+def table_checksums(conn):
+    """
+    Checksum of every synced table of the sqlite3 connection `conn` so both
+    nodes can tell which tables differ without exchanging their contents.
+
+    Fields excluded by NO_SYNC_MAP are left out as they are expected to differ.
+    """
+    cur = conn.cursor()
+    checksums = {}
+    try:
+        for table in synced_tables(cur):
+            no_sync = (NO_SYNC_MAP.get(table) or {}).get('fields', [])
+            fields = [f for f in table_fields(cur, table) if f not in no_sync]
+            checksum = hashlib.sha1(repr(fields).encode())
+            cur.execute('SELECT %s FROM %s ORDER BY rowid' % (quote_fields(fields), table))
+            for row in cur:
+                checksum.update(repr(row).encode())
+            checksums[table] = checksum.hexdigest()
+    finally:
+        cur.close()
+    return checksums
+
+
+def table_rows(conn, tables):
+    """
+    Dump the rows of `tables` as `{table: {'fields': [...], 'rows': [[...]]}}`
+    to be restored by `replace_tables`.
+    """
+    cur = conn.cursor()
+    dump = {}
+    try:
+        for table in tables:
+            fields = table_fields(cur, table)
+            cur.execute('SELECT %s FROM %s ORDER BY rowid' % (quote_fields(fields), table))
+            dump[table] = {
+                'fields': fields,
+                'rows': [list(row) for row in cur.fetchall()],
+            }
+    finally:
+        cur.close()
+    return dump
+
+
+def replace_tables(conn, dump):
+    """
+    Replace the rows of every table in `dump` (as returned by `table_rows`)
+    within a single transaction, keeping the local value of the fields excluded
+    by NO_SYNC_MAP.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute('PRAGMA foreign_keys=OFF')
+        cur.execute('BEGIN TRANSACTION')
+        try:
+            for table, data in dump.items():
+                fields = data['fields']
+                no_sync = [
+                    f for f in (NO_SYNC_MAP.get(table) or {}).get('fields', [])
+                    if f in fields
+                ]
+                local = []
+                if no_sync:
+                    cur.execute('SELECT %s, id FROM %s' % (quote_fields(no_sync), table))
+                    local = cur.fetchall()
+
+                cur.execute('DELETE FROM %s' % table)
+                cur.executemany('INSERT INTO %s (%s) VALUES (%s)' % (
+                    table, quote_fields(fields), ', '.join(['?'] * len(fields)),
+                ), data['rows'])
+
+                if local:
+                    cur.executemany('UPDATE %s SET %s WHERE id = ?' % (
+                        table, ', '.join(['`%s` = ?' % f for f in no_sync]),
+                    ), local)
+            cur.execute('COMMIT')
+        except Exception:
+            cur.execute('ROLLBACK')
+            raise
+    finally:
+        cur.close()
 
 
 class DatabaseFeatures(sqlite3base.DatabaseFeatures):
@@ -243,137 +544,245 @@ class DatabaseWrapper(sqlite3base.DatabaseWrapper):
 
         return True
 
+    def dump_checksums(self):
+        """
+        Checksum of every table synced between nodes, see `table_checksums`.
+        """
+        self.ensure_connection()
+        return table_checksums(self.connection)
 
-class HASQLiteCursorWrapper(Database.Cursor):
+    def dump_tables(self, tables):
+        """
+        Dump only the rows of `tables`, to be sent to the other side when
+        their checksums differ.
+        """
+        self.ensure_connection()
+        return table_rows(self.connection, tables)
 
-    def execute_passive(self, query, params=None):
+    def dump_tables_recv(self, dump):
         """
-        Process the query, modify it if necessary based on NO_SYNC_MAP rules
-        and execute it on the remote side.
+        Receives the tables dumped by `dump_tables` from the other side,
+        replacing them within a transaction.
         """
-        global execute_sync
+        self.ensure_connection()
+        replace_tables(self.connection, dump)
 
-        # Skip SELECT queries
-        if query.lower().startswith('select'):
-            return
+        with Journal() as j:
+            j.queries = []
 
-        try:
-            # FIXME: This is extremely time-consuming (failover.status)
-            from freenasUI.middleware.notifier import notifier
-            if not (
-                hasattr(notifier, 'failover_status') and
-                notifier().failover_status() == 'MASTER'
-            ):
-                return
-        except:
-            return
+        return True
+
+
+def convert_query(query):
+    return sqlite3base.FORMAT_QMARK_REGEX.sub('?', query).replace(
+        '%%', '%'
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def replication_plan(query, params_given, has_params):
+    """
+    Parse `query` and apply NO_SYNC_MAP rules only once per query text.
+
+    Returns a tuple of `(sql, delete_idx)` for every statement of `query` which
+    has to run on the remote side, `delete_idx` being the indexes (in reverse
+    order) of the params to remove for the fields that must not be synced.
+    """
+    plan = []
+    parse = sqlparse.parse(query)
+    for p in parse:
 
-        parse = sqlparse.parse(query)
-        for p in parse:
+        # Only care for DELETE, INSERT and UPDATE queries
+        if p.tokens[0].normalized not in ('DELETE', 'INSERT', 'UPDATE'):
+            continue
 
-            # Only care for DELETE, INSERT and UPDATE queries
-            if p.tokens[0].normalized not in ('DELETE', 'INSERT', 'UPDATE'):
+        delete_idx = []
+        if p.tokens[0].normalized == 'INSERT':
+
+            into = p.token_next_by(m=(sqlparse.tokens.Keyword, 'INTO'))
+            if not into:
                 continue
 
-            cparams = list(params)
-            if p.tokens[0].normalized == 'INSERT':
+            next_ = p.token_next(into[0])
 
-                into = p.token_next_by(m=(sqlparse.tokens.Keyword, 'INTO'))
-                if not into:
-                    continue
+            if next_[1].value in NO_SYNC_MAP:
+                continue
 
-                next_ = p.token_next(into[0])
+        elif p.tokens[0].normalized == 'DELETE':
 
-                if next_[1].value in NO_SYNC_MAP:
-                    continue
+            from_ = p.token_next_by(m=(sqlparse.tokens.Keyword, 'FROM'))
+            if not from_:
+                continue
 
-            elif p.tokens[0].normalized == 'DELETE':
+            next_ = p.token_next(from_[0])
 
-                from_ = p.token_next_by(m=(sqlparse.tokens.Keyword, 'FROM'))
-                if not from_:
-                    continue
+            if next_[1].value in NO_SYNC_MAP:
+                continue
 
-                next_ = p.token_next(from_[0])
+        elif p.tokens[0].normalized == 'UPDATE':
 
-                if next_[1].value in NO_SYNC_MAP:
-                    continue
+            name = p.token_next(0)[1].value
+            no_sync = NO_SYNC_MAP.get(name)
+            # Skip if table is in set to not to sync and has no attrs
+            if no_sync is None and name in NO_SYNC_MAP:
+                continue
 
-            elif p.tokens[0].normalized == 'UPDATE':
+            set_ = p.token_next_by(m=(sqlparse.tokens.Keyword, 'SET'))
+            if not set_:
+                continue
 
-                name = p.token_next(0)[1].value
-                no_sync = NO_SYNC_MAP.get(name)
-                # Skip if table is in set to not to sync and has no attrs
-                if no_sync is None and name in NO_SYNC_MAP:
-                    continue
+            next_ = p.token_next(set_[0])
+            if not next_:
+                continue
 
-                set_ = p.token_next_by(m=(sqlparse.tokens.Keyword, 'SET'))
-                if not set_:
-                    continue
+            if no_sync is None:
+                lookup = []
+            else:
 
-                next_ = p.token_next(set_[0])
-                if not next_:
+                if 'fields' not in no_sync:
                     continue
 
-                if no_sync is None:
-                    lookup = []
-                else:
+                if issubclass(
+                    next_[1].__class__, sqlparse.sql.IdentifierList
+                ):
+                    lookup = list(next_[1].get_sublists())
+                elif issubclass(next_[1].__class__, sqlparse.sql.Comparison):
+                    lookup = [next_[1]]
 
-                    if 'fields' not in no_sync:
-                        continue
+                # Get all placeholders from the query (%s or ?)
+                placeholders = [a for a in p.flatten() if a.value in ('%s', '?')]
 
-                    if issubclass(
-                        next_[1].__class__, sqlparse.sql.IdentifierList
-                    ):
-                        lookup = list(next_[1].get_sublists())
-                    elif issubclass(next_[1].__class__, sqlparse.sql.Comparison):
-                        lookup = [next_[1]]
+            for l in lookup:
 
-                    # Get all placeholders from the query (%s or ?)
-                    placeholders = [a for a in p.flatten() if a.value in ('%s', '?')]
+                if l.value not in no_sync['fields']:
+                    continue
 
-                # Remember correspondent cparams to delete
-                delete_idx = []
+                # Remove placeholder from the params
+                try:
+                    idx = placeholders.index(l.tokens[-1])
+                    if has_params:
+                        delete_idx.append(idx)
+                except ValueError:
+                    pass
+
+                # If it is a list we must also remove the comma around it
+                t_index = l.parent.token_index(l)
+                prev_ = l.parent.token_prev(t_index)
+                next_ = l.parent.token_next(t_index)
+                if next_ and issubclass(
+                    next_[1].__class__, sqlparse.sql.Token
+                ) and next_[1].value == ',':
+                    del l.parent.tokens[next_[0]]
+                elif prev_ and issubclass(
+                    prev_[1].__class__, sqlparse.sql.Token
+                ) and prev_[1].value == ',':
+                    del l.parent.tokens[prev_[0]]
+                del l.parent.tokens[l.parent.token_index(l)]
+
+        if params_given:
+            sql = convert_query(str(p))
+        else:
+            sql = str(p)
+        plan.append((sql, tuple(sorted(delete_idx, reverse=True))))
+
+    return tuple(plan)
+
+
+class FailoverStatus(object):
+    """
+    Cache of `notifier().failover_status()` which is extremely time-consuming
+    to run for every query.
+
+    The status is refreshed at least every `TTL` seconds and whenever
+    replicating to the remote side fails. On HA systems (status MASTER or BACKUP)
+    a thread also refreshes it when middlewared sends a CARP state change event.
+    Processes which receive these events directly (i.e. middlewared) set `watch`
+    to False and call `invalidate` themselves.
+    """
 
-                for l in lookup:
+    TTL = 60
 
-                    if l.value not in no_sync['fields']:
-                        continue
+    watch = True
 
-                    # Remove placeholder from the params
-                    try:
-                        idx = placeholders.index(l.tokens[-1])
-                        if cparams:
-                            delete_idx.append(idx)
-                    except ValueError:
-                        pass
+    _lock = threading.Lock()
+    _status = None
+    _updated = None
+    _pid = None
+    _watching = False
+
+    @classmethod
+    def get(cls):
+        with cls._lock:
+            if cls._pid != os.getpid():
+                # Threads do not survive a fork
+                cls._pid = os.getpid()
+                cls._status = None
+                cls._watching = False
+
+            if cls._status is not None and time.monotonic() - cls._updated < cls.TTL:
+                return cls._status
 
-                    # If it is a list we must also remove the comma around it
-                    t_index = l.parent.token_index(l)
-                    prev_ = l.parent.token_prev(t_index)
-                    next_ = l.parent.token_next(t_index)
-                    if next_ and issubclass(
-                        next_[1].__class__, sqlparse.sql.Token
-                    ) and next_[1].value == ',':
-                        del l.parent.tokens[next_[0]]
-                    elif prev_ and issubclass(
-                        prev_[1].__class__, sqlparse.sql.Token
-                    ) and prev_[1].value == ',':
-                        del l.parent.tokens[prev_[0]]
-                    del l.parent.tokens[l.parent.token_index(l)]
-
-                delete_idx.sort(reverse=True)
-                for i in delete_idx:
-                    del cparams[i]
-
-            if params is not None:
-                sql = self.convert_query(str(p))
+        try:
+            from freenasUI.middleware.notifier import notifier
+            if hasattr(notifier, 'failover_status'):
+                status = notifier().failover_status()
             else:
-                sql = str(p)
-            # Actually try to run the query on the remote side within a thread
-            rsr = RunSQLRemote(sql=sql, params=cparams)
-            rsr.start()
-            if execute_sync:
-                rsr.join()
+                status = 'SINGLE'
+        except Exception:
+            return None
+
+        with cls._lock:
+            cls._status = status
+            cls._updated = time.monotonic()
+            # Only HA systems can change status, do not watch for events otherwise
+            if cls.watch and not cls._watching and status in ('MASTER', 'BACKUP'):
+                cls._watching = True
+                threading.Thread(target=cls._watch, name='FailoverStatus', daemon=True).start()
+        return status
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._status = None
+
+    @classmethod
+    def _watch(cls):
+        from freenasUI.middleware.client import Client
+        while True:
+            try:
+                with Client() as c:
+                    c.subscribe('devd.carp', lambda *args, **kwargs: cls.invalidate())
+                    # The status may have changed while we were not subscribed
+                    cls.invalidate()
+                    c._closed.wait()
+            except Exception:
+                pass
+            time.sleep(5)
+
+
+class HASQLiteCursorWrapper(Database.Cursor):
+
+    def execute_passive(self, query, params=None):
+        """
+        Process the query, modify it if necessary based on NO_SYNC_MAP rules
+        and execute it on the remote side.
+        """
+        global execute_sync
+
+        # Skip SELECT queries
+        if query.lower().startswith('select'):
+            return
+
+        if FailoverStatus.get() != 'MASTER':
+            return
+
+        for sql, delete_idx in replication_plan(query, params is not None, bool(params)):
+            cparams = list(params)
+            for i in delete_idx:
+                del cparams[i]
+
+            # Journal the query to run on the remote side
+            ReplicationSender.get().send(sql, cparams, wait=execute_sync)
 
     def locked_retry(self, method, *args, **kwargs):
         """
@@ -438,6 +847,4 @@ class HASQLiteCursorWrapper(Database.Cursor):
         return self.locked_retry(Database.Cursor.executemany, query, param_list)
 
     def convert_query(self, query):
-        return sqlite3base.FORMAT_QMARK_REGEX.sub('?', query).replace(
-            '%%', '%'
-        )
+        return convert_query(query)
@@ -0,0 +1,70 @@
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from freenasUI.freeadmin.sqlite3_ha import base
+
+
+def create():
+    conn = sqlite3.connect(':memory:', isolation_level=None)
+    conn.executescript("""
+        CREATE TABLE system_failover (id INTEGER PRIMARY KEY, master BOOL, timeout INTEGER);
+        CREATE TABLE account_bsdusers (id INTEGER PRIMARY KEY, bsdusr_username VARCHAR(16));
+        CREATE TABLE local_only (id INTEGER PRIMARY KEY, value VARCHAR(16));
+    """)
+    return conn
+
+
+class TableSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.dict(base.NO_SYNC_MAP, {'local_only': None})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.master = create()
+        self.master.executescript("""
+            INSERT INTO system_failover VALUES (1, 1, 0);
+            INSERT INTO account_bsdusers VALUES (1, 'root'), (2, 'user');
+            INSERT INTO local_only VALUES (1, 'master');
+        """)
+        self.standby = create()
+        self.standby.executescript("""
+            INSERT INTO system_failover VALUES (1, 0, 30);
+            INSERT INTO account_bsdusers VALUES (1, 'root');
+            INSERT INTO local_only VALUES (1, 'standby');
+        """)
+
+    def sync(self):
+        master = base.table_checksums(self.master)
+        standby = base.table_checksums(self.standby)
+        tables = sorted(t for t, checksum in master.items() if standby.get(t) != checksum)
+        base.replace_tables(self.standby, base.table_rows(self.master, tables))
+        return tables
+
+    def test_checksums_match_after_replace_tables(self):
+        self.assertEqual(self.sync(), ['account_bsdusers', 'system_failover'])
+        self.assertEqual(base.table_checksums(self.master), base.table_checksums(self.standby))
+        self.assertEqual(
+            self.standby.execute('SELECT * FROM account_bsdusers').fetchall(), [(1, 'root'), (2, 'user')],
+        )
+
+    def test_no_sync_fields_and_tables_kept_locally(self):
+        self.assertNotIn('local_only', base.table_checksums(self.master))
+
+        self.sync()
+
+        self.assertEqual(self.standby.execute('SELECT * FROM system_failover').fetchall(), [(1, 0, 0)])
+        self.assertEqual(self.standby.execute('SELECT * FROM local_only').fetchall(), [(1, 'standby')])
+
+    def test_differing_row_changes_only_its_table_checksum(self):
+        self.sync()
+        before = base.table_checksums(self.master)
+
+        self.master.execute("UPDATE account_bsdusers SET bsdusr_username = 'other' WHERE id = 2")
+        self.master.execute('UPDATE system_failover SET master = 0')
+        after = base.table_checksums(self.master)
+
+        self.assertEqual([t for t in before if before[t] != after[t]], ['account_bsdusers'])
+        self.assertEqual(self.sync(), ['account_bsdusers'])
+        self.assertEqual(base.table_checksums(self.master), base.table_checksums(self.standby))
@@ -1,11 +1,13 @@
-from freenasUI.middleware.client import client
+from freenasUI.middleware.client import Client
 from freenasUI.account.models import bsdUsers
 
 
 class AuthTokenBackend(object):
 
     def authenticate(self, auth_token=None):
-        with client as c:
+        # `auth.token` ties the session to the token (and its TTL), so it must not
+        # run on a pooled connection.
+        with Client() as c:
             rv = c.call('auth.token', auth_token)
             if rv:
                 qs = bsdUsers.objects.filter(bsdusr_uid=0)
@@ -1,29 +1,112 @@
 from middlewared.client import CallTimeout, Client, ClientException, ValidationErrors  # noqa
+import os
 import threading
+import time
 
 
 class Connection(object):
+    """
+    Thread-safe pool of persistent connections to middlewared.
 
-    def __init__(self):
-        self.locals = {}
+    `with client as c:` checks out an idle connection (or opens a new one if there
+    is none) for the exclusive use of the current thread and puts it back in the pool
+    when the block exits, so the websocket handshake is not paid on every block.
+    Connections are authenticated when they are opened (unix socket), so they stay
+    authenticated while pooled. Calls that change the session authentication (e.g.
+    `auth.token`) must use a dedicated `Client()` instead.
+
+    Connections that have been closed (e.g. middlewared restarted) or fail a ping
+    after being idle for `ping_after` seconds are discarded and a new one is opened.
+    """
+
+    def __init__(self, max_idle=8, max_idle_time=300, ping_after=30):
+        self.max_idle = max_idle
+        self.max_idle_time = max_idle_time
+        self.ping_after = ping_after
+
+        self.lock = threading.Lock()
+        # (client, time it was put back in the pool), most recently used last
+        self.idle = []
+        self.pid = os.getpid()
+        # Stack of connections checked out by the current thread (blocks can be nested)
+        self.locals = threading.local()
 
     def __enter__(self):
-        """
-        Original intent of that class was to use a single connection to
-        middleware for all django threads, however turned out a bit difficult
-        regarding management of that connection (e.g. reconnect) and due to priorities
-        that feature has been delayed.
-        As a stop-gap solution to keep the same API we are using local thread data to keep
-        track of the client object.
-        """
-        local = self.locals[threading.get_ident()] = threading.local()
-        local.client = Client()
-        return local.client
+        c = self.get()
+        if not hasattr(self.locals, 'clients'):
+            self.locals.clients = []
+        self.locals.clients.append(c)
+        return c
 
     def __exit__(self, typ, value, traceback):
-        self.locals[threading.get_ident()].client.close()
+        c = self.locals.clients.pop()
+        if typ is not None and issubclass(typ, (CallTimeout, OSError)):
+            # Connection may be unusable, do not give it to someone else
+            self._close(c)
+        else:
+            self.put(c)
         if typ is not None:
             raise
 
+    def get(self):
+        while True:
+            with self.lock:
+                self._check_fork()
+                if not self.idle:
+                    break
+                c, last_used = self.idle.pop()
+
+            if self._healthy(c, last_used):
+                return c
+            self._close(c)
+
+        return Client()
+
+    def put(self, c):
+        if c._closed.is_set() or c._jobs_watching or c._event_callbacks:
+            # Do not reuse connections subscribed to events (including `core.get_jobs` after
+            # a `job=True` call): the next user would receive (and accumulate) every event.
+            self._close(c)
+            return
+
+        now = time.monotonic()
+        with self.lock:
+            self._check_fork()
+            expired = [i for i in self.idle if now - i[1] > self.max_idle_time]
+            self.idle = [i for i in self.idle if now - i[1] <= self.max_idle_time]
+            if len(self.idle) < self.max_idle:
+                self.idle.append((c, now))
+            else:
+                expired.append((c, now))
+
+        for c, last_used in expired:
+            self._close(c)
+
+    def _healthy(self, c, last_used):
+        if c._closed.is_set():
+            return False
+
+        idle_time = time.monotonic() - last_used
+        if idle_time > self.max_idle_time:
+            return False
+        if idle_time > self.ping_after:
+            try:
+                return c.ping(timeout=5)
+            except Exception:
+                return False
+        return True
+
+    def _check_fork(self):
+        # Connections opened by the parent process must not be shared with a forked child
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.idle = []
+
+    def _close(self, c):
+        try:
+            c.close()
+        except Exception:
+            pass
+
 
 client = Connection()
@@ -2830,11 +2830,12 @@ class notifier(metaclass=HookMetaclass):
             search = doc.xpath("//class[name = 'DISK']/geom/provider/config[normalize-space(ident) = normalize-space('%s')]/../../name" % value)
             if len(search) > 0:
                 return search[0].text
+            devnames = self.__get_disks()
             with client as c:
-                for devname in self.__get_disks():
-                    serial = c.call('disk.serial_from_device', devname)
-                    if serial == value:
-                        return devname
+                serials = c.call_many([('disk.serial_from_device', devname) for devname in devnames])
+            for devname, serial in zip(devnames, serials):
+                if serial == value:
+                    return devname
             return None
 
         elif tp == 'serial_lunid':
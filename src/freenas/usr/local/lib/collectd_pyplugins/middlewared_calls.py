@@ -0,0 +1,124 @@
+# Copyright 2018 iXsystems, Inc.
+# All rights reserved
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted providing that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED.  IN NO EVENT SHALL THE AUTHOR BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL
+# DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS
+# OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION)
+# HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT,
+# STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING
+# IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+#
+#####################################################################
+import collections
+import traceback
+
+from middlewared.client import Client
+
+# One cannot simply import collectd in a python interpreter (for various reasons)
+# thus adding this workaround for standalone testing
+if __name__ == '__main__':
+    class CollectdDummy:
+        def register_config(self, a):
+            # do something
+            pass
+
+        def register_init(self, a):
+            a()
+
+        def register_read(self, a, b=10):
+            a()
+
+        def info(self, msg):
+            print(msg)
+
+        def warning(self, msg):
+            print(msg)
+
+        def debug(self, msg):
+            print(msg)
+
+        def error(self, msg):
+            print(msg)
+
+        class Values(object):
+            def __init__(self, *args, **kwargs):
+                self.plugin = ''
+                self.plugin_instance = ''
+                self.type = None
+                self.type_instance = None
+                self.values = None
+                self.meta = None
+
+            def dispatch(self, interval=None):
+                print(f'{self.plugin}:{self.plugin_instance}:{self.type}:{self.type_instance}:{self.values}')
+
+    collectd = CollectdDummy()
+else:
+    import collectd
+
+
+READ_INTERVAL = 60.0
+
+
+collectd.info('Loading "middlewared_calls" python plugin')
+
+
+class MiddlewaredCalls(object):
+    """
+    Totals of middlewared method calls (`core.get_call_stats`) by execution path:
+    number of calls and errors and time spent (milliseconds), as counters.
+    Resetting the middlewared counters shows up as a negative rate.
+    """
+
+    def init(self):
+        collectd.info('Initializing "middlewared_calls" plugin')
+
+    def dispatch_value(self, path, type_instance, value):
+        val = collectd.Values()
+        val.plugin = 'middlewared'
+        val.plugin_instance = path
+        val.type = 'derive'
+        val.type_instance = type_instance
+        val.values = [value, ]
+        val.meta = {'0': True}
+        val.dispatch(interval=READ_INTERVAL)
+
+    def read(self):
+        try:
+            with Client() as c:
+                stats = c.call('core.get_call_stats')
+        except Exception:
+            collectd.info(traceback.format_exc())
+            return
+
+        totals = collections.defaultdict(lambda: [0, 0, 0.0])
+        for method in stats['methods']:
+            total = totals[method['path']]
+            total[0] += method['calls']
+            total[1] += method['errors']
+            total[2] += method['time']
+
+        for path, (calls, errors, time) in totals.items():
+            self.dispatch_value(path, 'calls', calls)
+            self.dispatch_value(path, 'errors', errors)
+            self.dispatch_value(path, 'time', int(time * 1000))
+
+
+middlewared_calls = MiddlewaredCalls()
+
+collectd.register_init(middlewared_calls.init)
+collectd.register_read(middlewared_calls.read, READ_INTERVAL)
@@ -0,0 +1,46 @@
+#!/usr/local/bin/python3
+"""
+Measure query time against row count for services extending datastore rows.
+
+Must be run on a FreeNAS system with middlewared running.
+
+Usage: python3 benchmarks/datastore_extend.py [--rows 1,10,100,1000] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from middlewared.client import Client  # noqa
+
+SERVICES = ['disk', 'user', 'group', 'certificate', 'pool']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='1,10,100,1000')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--services', default=','.join(SERVICES))
+    args = parser.parse_args()
+
+    rows = [int(i) for i in args.rows.split(',')]
+
+    with Client() as c:
+        print(f'{"method":<20}{"rows":>8}{"returned":>10}{"ms/query":>12}{"ms/row":>10}')
+        for service in args.services.split(','):
+            total = c.call(f'{service}.query', [], {'count': True})
+            for limit in rows:
+                if limit > total and limit != rows[0]:
+                    break
+                start = time.monotonic()
+                for i in range(args.repeat):
+                    result = c.call(f'{service}.query', [], {'limit': limit})
+                elapsed = (time.monotonic() - start) / args.repeat * 1000
+                per_row = elapsed / len(result) if result else 0
+                print(f'{service + ".query":<20}{limit:>8}{len(result):>10}{elapsed:>12.2f}{per_row:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/local/bin/python3
+"""
+Measure calls per second of the GUI middleware client: a new connection per
+`with client` block (previous behavior), pooled connections and pipelined calls.
+
+Must be run on a FreeNAS system with middlewared running.
+
+Usage: python3 benchmarks/gui_client_pool.py [--calls N] [--threads N] [--method core.ping]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+if '/usr/local/www' not in sys.path:
+    sys.path.append('/usr/local/www')
+
+from middlewared.client import Client  # noqa
+from freenasUI.middleware.client import Connection  # noqa
+
+
+def bench(label, fn, calls, threads):
+    per_thread = calls // threads
+    workers = [threading.Thread(target=fn, args=(per_thread,)) for i in range(threads)]
+    start = time.monotonic()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.monotonic() - start
+    print(f'{label:<40}{per_thread * threads / elapsed:>12.0f} calls/s')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--method', default='core.ping')
+    parser.add_argument('--pipeline', type=int, default=20, help='Calls sent at once when pipelining')
+    args = parser.parse_args()
+
+    def unpooled(n):
+        for i in range(n):
+            with Client() as c:
+                c.call(args.method)
+
+    pool = Connection()
+
+    def pooled(n):
+        for i in range(n):
+            with pool as c:
+                c.call(args.method)
+
+    def pipelined(n):
+        for i in range(0, n, args.pipeline):
+            with pool as c:
+                c.call_many([(args.method,)] * min(args.pipeline, n - i))
+
+    bench('new connection per block', unpooled, args.calls, args.threads)
+    bench('pooled connections', pooled, args.calls, args.threads)
+    bench(f'pooled, {args.pipeline} calls pipelined', pipelined, args.calls, args.threads)
+
+
+if __name__ == '__main__':
+    main()
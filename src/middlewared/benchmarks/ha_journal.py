@@ -0,0 +1,115 @@
+#!/usr/local/bin/python3
+"""
+Benchmark the sqlite3_ha replication journal: journal N writes while the remote
+node is down and replay them against a local stand-in peer (an in-memory sqlite3
+database), compared to the previous journal which unpickled and rewrote the whole
+file for every write and replayed one call per query.
+
+Must be run where the FreeNAS GUI (freenasUI) is importable.
+
+Usage: python3 benchmarks/ha_journal.py [--writes N]
+"""
+import argparse
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+if '/usr/local/www' not in sys.path:
+    sys.path.append('/usr/local/www')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freenasUI.settings')
+
+from freenasUI.freeadmin.sqlite3_ha.base import Journal, ReplicationSender  # noqa
+
+SQL = 'INSERT INTO test (value) VALUES (?)'
+
+
+class StandInPeer(object):
+    """
+    Runs `datastore.sql`/`datastore.sql_batch` calls on a local database.
+    """
+
+    def __init__(self):
+        self.db = sqlite3.connect(':memory:', check_same_thread=False)
+        self.db.execute('CREATE TABLE test (id INTEGER PRIMARY KEY, value INTEGER)')
+        self.calls = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, typ, value, traceback):
+        pass
+
+    def call(self, method, remote_method, params):
+        self.calls += 1
+        if remote_method == 'datastore.sql':
+            self.db.execute(*params)
+        else:
+            with self.db:
+                for query, query_params in params[0]:
+                    self.db.execute(query, query_params)
+
+    def count(self):
+        return self.db.execute('SELECT COUNT(*) FROM test').fetchone()[0]
+
+
+def legacy(writes):
+    # Previous journal: a pickled list rewritten on every write
+    path = tempfile.mktemp()
+    start = time.monotonic()
+    for i in range(writes):
+        try:
+            with open(path, 'rb') as f:
+                queries = pickle.loads(f.read())
+        except (FileNotFoundError, EOFError):
+            queries = []
+        queries.append((SQL, [i]))
+        with open(path, 'wb+') as f:
+            f.write(pickle.dumps(queries))
+    journaled = time.monotonic() - start
+
+    peer = StandInPeer()
+    start = time.monotonic()
+    with open(path, 'rb') as f:
+        for query, params in pickle.loads(f.read()):
+            peer.call('failover.call_remote', 'datastore.sql', [query, params])
+    os.unlink(path)
+    return journaled, time.monotonic() - start, peer
+
+
+def current(writes):
+    Journal.JOURNAL_FILE = tempfile.mktemp()
+    start = time.monotonic()
+    for i in range(writes):
+        lock = Journal.lock()
+        try:
+            Journal.append([(SQL, [i])])
+        finally:
+            lock.release()
+    journaled = time.monotonic() - start
+
+    peer = StandInPeer()
+    sender = ReplicationSender(client=peer)
+    start = time.monotonic()
+    sender.flush()
+    replayed = time.monotonic() - start
+    os.unlink(Journal.JOURNAL_FILE)
+    return journaled, replayed, peer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--writes', type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f'{"journal":<20}{"journal ms":>12}{"replay ms":>12}{"calls":>8}{"rows":>8}')
+    for name, fn in (('pickled list', legacy), ('append-only', current)):
+        journaled, replayed, peer = fn(args.writes)
+        print(f'{name:<20}{journaled * 1000:>12.0f}{replayed * 1000:>12.0f}{peer.calls:>8}{peer.count():>8}')
+
+
+if __name__ == '__main__':
+    main()
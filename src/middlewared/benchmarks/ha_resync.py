@@ -0,0 +1,96 @@
+#!/usr/local/bin/python3
+"""
+Benchmark a failover resync between two local sqlite3 databases: the full SQL
+script of `dump()`/`dump_recv()` compared to table checksums, shipping only the
+tables which differ as parameterized rows.
+
+Must be run where the FreeNAS GUI (freenasUI) is importable.
+
+Usage: python3 benchmarks/ha_resync.py [--tables N] [--rows N] [--changed N]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+if '/usr/local/www' not in sys.path:
+    sys.path.append('/usr/local/www')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'freenasUI.settings')
+
+from freenasUI.freeadmin.sqlite3_ha.base import (  # noqa
+    replace_tables, synced_tables, table_checksums, table_fields, table_rows,
+)
+
+
+def create(path, tables, rows):
+    db = sqlite3.connect(path)
+    with db:
+        for t in range(tables):
+            db.execute(f'CREATE TABLE table_{t} (id INTEGER PRIMARY KEY, name VARCHAR(120), value INTEGER)')
+            db.executemany(
+                f'INSERT INTO table_{t} (name, value) VALUES (?, ?)',
+                [(f'name {i} of table {t}', i) for i in range(rows)],
+            )
+    return db
+
+
+def legacy(master, standby):
+    # Previous resync: an INSERT statement per row of every table, run as a script
+    cur = master.cursor()
+    script = []
+    for table in synced_tables(cur):
+        fields = table_fields(cur, table)
+        script.append('DELETE FROM %s' % table)
+        cur.execute('SELECT %s FROM %s' % (
+            "'INSERT INTO %s (%s) VALUES (' || %s ||')'" % (
+                table,
+                ', '.join(['`%s`' % f for f in fields]),
+                " || ',' || ".join(['quote(`%s`)' % f for f in fields]),
+            ),
+            table,
+        ))
+        script.extend(row[0] for row in cur.fetchall())
+    sent = len(json.dumps(script))
+    standby.executescript(';'.join(['PRAGMA foreign_keys=OFF', 'BEGIN TRANSACTION'] + script + ['COMMIT;']))
+    return len(synced_tables(cur)), sent
+
+
+def current(master, standby):
+    remote = table_checksums(standby)
+    tables = [table for table, checksum in table_checksums(master).items() if remote.get(table) != checksum]
+    dump = table_rows(master, tables)
+    sent = len(json.dumps(remote)) + len(json.dumps(dump))
+    replace_tables(standby, dump)
+    return len(tables), sent
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tables', type=int, default=100)
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--changed', type=int, default=2, help='Tables changed on the master since last sync')
+    args = parser.parse_args()
+
+    print(f'{"resync":<20}{"ms":>10}{"tables":>8}{"bytes sent":>12}{"in sync":>9}')
+    for name, fn in (('full dump script', legacy), ('changed tables', current)):
+        with tempfile.TemporaryDirectory() as d:
+            master = create(os.path.join(d, 'master.db'), args.tables, args.rows)
+            standby = create(os.path.join(d, 'standby.db'), args.tables, args.rows)
+            with master:
+                for t in range(args.changed):
+                    master.execute(f'UPDATE table_{t} SET value = value + 1 WHERE id % 10 = 0')
+
+            start = time.monotonic()
+            tables, sent = fn(master, standby)
+            elapsed = time.monotonic() - start
+
+            in_sync = table_checksums(master) == table_checksums(standby)
+            print(f'{name:<20}{elapsed * 1000:>10.0f}{tables:>8}{sent:>12}{str(in_sync):>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/local/bin/python3
+"""
+Compare calls per second of `Middleware.run_in_thread` using a new
+ThreadPoolExecutor per call against the shared IoThreadPoolExecutor.
+
+Usage: python3 benchmarks/io_thread_pool.py [--calls N] [--concurrency N]
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import functools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from middlewared.utils.io_thread_pool_executor import IoThreadPoolExecutor  # noqa
+
+
+def noop():
+    pass
+
+
+async def per_call_executor(loop, method):
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    try:
+        return await loop.run_in_executor(executor, functools.partial(method))
+    finally:
+        executor.shutdown(wait=False)
+
+
+def shared_executor(executor):
+    async def run_in_thread(loop, method):
+        return await loop.run_in_executor(executor, functools.partial(method))
+    return run_in_thread
+
+
+async def bench(loop, run_in_thread, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await run_in_thread(loop, noop)
+
+    start = time.monotonic()
+    await asyncio.gather(*[one() for i in range(calls)])
+    return calls / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+
+    rate = loop.run_until_complete(bench(loop, per_call_executor, args.calls, args.concurrency))
+    print(f'ThreadPoolExecutor per call: {rate:10.0f} calls/s')
+
+    executor = IoThreadPoolExecutor('IoThread')
+    rate = loop.run_until_complete(bench(loop, shared_executor(executor), args.calls, args.concurrency))
+    print(f'IoThreadPoolExecutor:        {rate:10.0f} calls/s')
+    print(f'IoThreadPoolExecutor stats:  {executor.stats()}')
+    executor.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/local/bin/python3
+"""
+Measure the time `JobsQueue` takes to schedule N queued jobs sharing a few
+locks, compared to the previous scheduler which scanned the whole queue (and
+grew every lock job list) on every wakeup.
+
+Jobs are queued grouped by lock and every lock is kept held by a running job,
+as when replication or cloud sync tasks pile up behind a few locks. A job only
+finishes once another one has been scheduled so only the scheduler is measured.
+
+Usage: python3 benchmarks/jobs_queue.py [--jobs N] [--locks N]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from middlewared.job import Job, JobsQueue  # noqa
+
+
+class Middleware(object):
+
+    def send_event(self, *args, **kwargs):
+        pass
+
+
+class LegacyJobSharedLock(object):
+
+    def __init__(self, queue, name):
+        self.queue = queue
+        self.name = name
+        self.jobs = []
+        self.semaphore = asyncio.Semaphore()
+
+    def add_job(self, job):
+        self.jobs.append(job)
+
+    def get_jobs(self):
+        return self.jobs
+
+    def remove_job(self, job):
+        self.jobs.remove(job)
+
+    def locked(self):
+        return self.semaphore.locked()
+
+    async def acquire(self):
+        return await self.semaphore.acquire()
+
+    def release(self):
+        return self.semaphore.release()
+
+
+class LegacyJobsQueue(JobsQueue):
+    """
+    Previous scheduler: a single list scanned on every wakeup.
+    """
+
+    def __init__(self, middleware):
+        super().__init__(middleware)
+        self.queue = []
+
+    def add(self, job):
+        if job.options["lock_queue_size"] is not None:
+            lock = self.get_lock(job)
+            queued_jobs = [another_job for another_job in self.queue if self.get_lock(another_job) is lock]
+            if len(queued_jobs) >= job.options["lock_queue_size"]:
+                return queued_jobs[-1]
+
+        self.deque.add(job)
+        self.queue.append(job)
+        self.queue_event.set()
+        return job
+
+    def get_lock(self, job):
+        name = job.get_lock_name()
+        if name is None:
+            return None
+
+        lock = self.job_locks.get(name)
+        if lock is None:
+            lock = LegacyJobSharedLock(self, name)
+            self.job_locks[lock.name] = lock
+        lock.add_job(job)
+        return lock
+
+    def release_lock(self, job):
+        lock = job.get_lock()
+        if not lock:
+            return
+        lock.remove_job(job)
+        lock.release()
+
+        if len(lock.get_jobs()) == 0:
+            self.job_locks.pop(lock.name)
+
+        self.queue_event.set()
+
+    async def next(self):
+        while True:
+            await self.queue_event.wait()
+            found = None
+            for job in self.queue:
+                lock = self.get_lock(job)
+                if lock is None or not lock.locked():
+                    found = job
+                    if lock:
+                        job.lock = lock
+                        await lock.acquire()
+                    break
+            if found:
+                self.queue.remove(found)
+                if len(self.queue) == 0:
+                    self.queue_event.clear()
+                return found
+            else:
+                self.queue_event.clear()
+
+
+def new_job(middleware, i, jobs, locks):
+    options = {
+        'lock': f'lock-{i * locks // jobs}',
+        'lock_queue_size': None,
+        'logs': False,
+        'process': False,
+        'pipes': [],
+        'check_pipes': False,
+        'transient': True,
+    }
+    return Job(middleware, 'bench.job', None, None, [i], options, None)
+
+
+async def schedule(queue_class, jobs, locks):
+    middleware = Middleware()
+    queue = queue_class(middleware)
+    queue.deque.maxlen = jobs
+    for i in range(jobs):
+        queue.add(new_job(middleware, i, jobs, locks))
+
+    next_ = getattr(queue, 'next', queue.__next__)
+    running = []
+    start = time.monotonic()
+    for i in range(jobs):
+        running.append(await next_())
+        if len(running) == locks:
+            # Every lock is held, let the oldest job finish
+            queue.release_lock(running.pop(0))
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--jobs', type=int, default=10000)
+    parser.add_argument('--locks', type=int, default=4)
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    print(f'{"scheduler":<24}{"ms":>10}{"jobs/s":>12}')
+    for name, queue_class in (('queue scan', LegacyJobsQueue), ('per-lock FIFO', JobsQueue)):
+        elapsed = loop.run_until_complete(schedule(queue_class, args.jobs, args.locks))
+        print(f'{name:<24}{elapsed * 1000:>10.0f}{args.jobs / elapsed:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
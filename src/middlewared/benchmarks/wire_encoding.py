@@ -0,0 +1,146 @@
+#!/usr/local/bin/python3
+"""
+Compare round trip (encode + decode) time and size of websocket messages
+using JSON (`ejson`) and msgpack (`emsgpack`) for the shape of large query
+results: `pool.query`, `disk.query` and `zfs.snapshot.query`.
+
+Requires the msgpack module.
+
+Usage: python3 benchmarks/wire_encoding.py [--disks N] [--snapshots N] [--rounds N]
+"""
+import argparse
+from datetime import datetime, timedelta
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from middlewared.client import ejson, emsgpack  # noqa
+
+
+def zfs_property(value, source='DEFAULT'):
+    return {'value': str(value), 'rawvalue': str(value), 'parsed': value, 'source': source}
+
+
+def pools(disks):
+    vdevs = []
+    for i in range(0, disks, 6):
+        vdevs.append({
+            'type': 'RAIDZ2',
+            'path': None,
+            'guid': str(uuid.uuid4().int >> 64),
+            'status': 'ONLINE',
+            'stats': {'read_errors': 0, 'write_errors': 0, 'checksum_errors': 0, 'size': 0, 'allocated': 0},
+            'children': [{
+                'type': 'DISK',
+                'path': f'/dev/gptid/{uuid.uuid4()}',
+                'guid': str(uuid.uuid4().int >> 64),
+                'status': 'ONLINE',
+                'stats': {'read_errors': 0, 'write_errors': 0, 'checksum_errors': 0, 'size': 0, 'allocated': 0},
+                'children': [],
+            } for j in range(6)],
+        })
+    return [{
+        'id': 1,
+        'name': 'tank',
+        'guid': str(uuid.uuid4().int >> 64),
+        'encrypt': 0,
+        'encryptkey': '',
+        'is_decrypted': True,
+        'status': 'ONLINE',
+        'healthy': True,
+        'scan': {
+            'function': 'SCRUB',
+            'state': 'FINISHED',
+            'start_time': datetime.now() - timedelta(hours=5),
+            'end_time': datetime.now(),
+            'percentage': 100.0,
+            'bytes_to_process': 12345678901,
+            'bytes_processed': 12345678901,
+            'errors': 0,
+        },
+        'topology': {'data': vdevs, 'log': [], 'cache': [], 'spare': []},
+    }]
+
+
+def disks(count):
+    return [{
+        'identifier': f'{{serial_lunid}}SERIAL{i:06d}_5000c500{i:08x}',
+        'name': f'da{i}',
+        'subsystem': 'da',
+        'number': i,
+        'serial': f'SERIAL{i:06d}',
+        'size': 4000787030016,
+        'multipath_name': '',
+        'multipath_member': '',
+        'description': '',
+        'transfermode': 'Auto',
+        'hddstandby': 'ALWAYS ON',
+        'advpowermgmt': 'DISABLED',
+        'acousticlevel': 'DISABLED',
+        'togglesmart': True,
+        'smartoptions': '',
+        'expiretime': None,
+        'enclosure_slot': None,
+        'passwd': '',
+        'critical': None,
+        'difference': None,
+        'informational': None,
+    } for i in range(count)]
+
+
+def snapshots(count):
+    return [{
+        'id': f'tank/dataset{i % 50}@auto-{i:08d}',
+        'name': f'tank/dataset{i % 50}@auto-{i:08d}',
+        'pool': 'tank',
+        'type': 'SNAPSHOT',
+        'snapshot_name': f'auto-{i:08d}',
+        'properties': {
+            'used': zfs_property(123456, 'NONE'),
+            'referenced': zfs_property(987654321, 'NONE'),
+            'creation': zfs_property(1500000000 + i, 'NONE'),
+            'compressratio': zfs_property('1.00x', 'NONE'),
+            'written': zfs_property(4096, 'NONE'),
+        },
+    } for i in range(count)]
+
+
+def result(payload):
+    return {'id': str(uuid.uuid4()), 'msg': 'result', 'result': payload}
+
+
+def bench(encoder, message, rounds):
+    start = time.monotonic()
+    for i in range(rounds):
+        encoded = encoder.dumps(message)
+        encoder.loads(encoded)
+    return (time.monotonic() - start) / rounds, len(encoded)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--disks', type=int, default=240)
+    parser.add_argument('--snapshots', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=10)
+    args = parser.parse_args()
+
+    if not emsgpack.available():
+        sys.exit('msgpack module is not available')
+
+    print(f'{"payload":<22}{"encoding":<10}{"ms":>10}{"bytes":>12}')
+    for name, payload in (
+        ('pool.query', pools(args.disks)),
+        ('disk.query', disks(args.disks)),
+        ('zfs.snapshot.query', snapshots(args.snapshots)),
+    ):
+        message = result(payload)
+        for encoding, encoder in (('json', ejson), ('msgpack', emsgpack)):
+            elapsed, size = bench(encoder, message, args.rounds)
+            print(f'{name:<22}{encoding:<10}{elapsed * 1000:>10.1f}{size:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/local/bin/python3
+"""
+Benchmark zfs.dataset.query options on a synthetic dataset tree using fake libzfs
+datasets, compared to retrieving the full state of every dataset (as done before
+the query options existed).
+
+Usage: python3 benchmarks/zfs_dataset_query.py [--fanout N] [--levels N] [--properties N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from middlewared.common.zfs.dataset_query import datasets_state  # noqa
+from middlewared.utils import filter_list  # noqa
+
+
+class FakeType(object):
+    name = 'FILESYSTEM'
+
+
+class FakeProperty(object):
+
+    def __init__(self, name):
+        self.name = name
+
+    def __getstate__(self):
+        # libzfs reads value, rawvalue and source of the property from the kernel
+        return {
+            'value': str(hash(self.name)),
+            'rawvalue': str(hash(self.name)),
+            'source': 'DEFAULT',
+            'parsed': hash(self.name),
+        }
+
+
+class FakeDataset(object):
+
+    type = FakeType()
+
+    def __init__(self, name, properties, children):
+        self.name = name
+        self.property_names = properties
+        self.children = children
+
+    @property
+    def properties(self):
+        return {name: FakeProperty(name) for name in self.property_names}
+
+    @property
+    def mountpoint(self):
+        return f'/mnt/{self.name}'
+
+    def __getstate__(self, recursive=True):
+        state = {
+            'id': self.name,
+            'name': self.name,
+            'pool': self.name.split('/')[0],
+            'type': self.type.name,
+            'properties': {k: v.__getstate__() for k, v in self.properties.items()},
+            'mountpoint': self.mountpoint,
+        }
+        if recursive:
+            state['children'] = [i.__getstate__() for i in self.children]
+        return state
+
+    @property
+    def children_recursive(self):
+        for child in self.children:
+            yield child
+            yield from child.children_recursive
+
+
+def build(name, fanout, levels, properties):
+    children = [build(f'{name}/ds{i}', fanout, levels - 1, properties) for i in range(fanout)] if levels else []
+    return FakeDataset(name, properties, children)
+
+
+def bench(label, fn, repeat):
+    start = time.monotonic()
+    for i in range(repeat):
+        result = fn()
+    elapsed = (time.monotonic() - start) / repeat * 1000
+    print(f'{label:<45}{elapsed:>10.2f} ms{len(result):>10} datasets')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pools', type=int, default=2)
+    parser.add_argument('--fanout', type=int, default=8)
+    parser.add_argument('--levels', type=int, default=3)
+    parser.add_argument('--properties', type=int, default=60)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    properties = ['used', 'available', 'mountpoint'] + [f'prop{i}' for i in range(args.properties - 3)]
+    roots = [build(f'pool{i}', args.fanout, args.levels, properties) for i in range(args.pools)]
+
+    def full():
+        # Previous behavior: every dataset with all properties and all nested children
+        datasets = []
+        for root in roots:
+            datasets.append(root.__getstate__())
+            datasets.extend(i.__getstate__() for i in root.children_recursive)
+        return filter_list(datasets, [], {})
+
+    bench('full state of every dataset', full, args.repeat)
+    bench('nested, single walk', lambda: datasets_state(roots), args.repeat)
+    bench('flat', lambda: datasets_state(roots, flat=True), args.repeat)
+    bench('flat, 2 properties', lambda: datasets_state(roots, ['used', 'available'], flat=True), args.repeat)
+    bench('flat, names only', lambda: datasets_state(roots, [], flat=True), args.repeat)
+    bench('flat, names only, depth 1', lambda: datasets_state(roots, [], depth=1, flat=True), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
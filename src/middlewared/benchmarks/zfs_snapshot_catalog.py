@@ -0,0 +1,125 @@
+#!/usr/local/bin/python3
+"""
+Benchmark zfs.snapshot.query filtering against the snapshot catalog using a
+fake libzfs backend, compared to walking every snapshot for each query (as
+done before the catalog existed), and the cost of the periodic verification
+of the catalog against the backend.
+
+Usage: python3 benchmarks/zfs_snapshot_catalog.py [--snapshots N] [--datasets N] [--pools N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+
+from middlewared.common.zfs.snapshot_catalog import SnapshotCatalog  # noqa
+from middlewared.utils import filter_list  # noqa
+
+
+class FakeBackend(object):
+
+    def __init__(self, pools, datasets, snapshots):
+        self.snapshots = {}
+        for i in range(snapshots):
+            pool = f'pool{i % pools}'
+            dataset = f'{pool}/dataset{i % datasets}'
+            name = f'{dataset}@auto-{i}'
+            self.snapshots[name] = {
+                'id': name,
+                'name': name,
+                'pool': pool,
+                'dataset': dataset,
+                'snapshot_name': f'auto-{i}',
+                'type': 'SNAPSHOT',
+                'properties': {
+                    'creation': {'value': str(i), 'rawvalue': str(1500000000 + i), 'parsed': 1500000000 + i},
+                    'used': {'value': '0', 'rawvalue': '0', 'parsed': 0},
+                    'referenced': {'value': '96K', 'rawvalue': '98304', 'parsed': 98304},
+                },
+            }
+        self.pool_names = [f'pool{i}' for i in range(pools)]
+
+    def pools(self):
+        return self.pool_names
+
+    def dataset_snapshots(self, dataset, recursive=False):
+        return [
+            s for name, s in self.snapshots.items()
+            if name.startswith(dataset + '@') or (recursive and name.startswith(dataset + '/'))
+        ]
+
+    def load_snapshots(self, names):
+        return {name: self.snapshots.get(name) for name in names}
+
+    def snapshot_space(self, pool):
+        return {
+            name: {'used': 0, 'referenced': 98304, 'written': 0}
+            for name, s in self.snapshots.items() if s['pool'] == pool
+        }
+
+
+def bench(label, fn, repeat):
+    start = time.monotonic()
+    for i in range(repeat):
+        result = fn()
+    elapsed = (time.monotonic() - start) / repeat * 1000
+    print(f'{label:<45}{elapsed:>10.2f} ms{len(result):>10} results')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--snapshots', type=int, default=100000)
+    parser.add_argument('--datasets', type=int, default=500)
+    parser.add_argument('--pools', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    backend = FakeBackend(args.pools, args.datasets, args.snapshots)
+    queries = [
+        ('by name', [('name', '=', 'pool1/dataset1@auto-1')]),
+        ('by dataset', [('dataset', '=', 'pool1/dataset1')]),
+        ('by pool', [('pool', '=', 'pool2')]),
+        ('by creation', [('properties.creation.rawvalue', '>=', str(1500000000 + args.snapshots - 100))]),
+    ]
+
+    def full_walk(filters):
+        # Previous behavior: every snapshot is loaded for each query
+        return filter_list([backend.snapshots[name] for name in backend.snapshots], filters, {})
+
+    for label, filters in queries:
+        bench(f'full walk {label}', lambda: full_walk(filters), 1)
+
+    catalog = SnapshotCatalog(backend)
+    start = time.monotonic()
+    catalog.sync()
+    print(f'{"catalog initial scan":<45}{(time.monotonic() - start) * 1000:>10.2f} ms')
+
+    for label, filters in queries:
+        bench(f'catalog {label}', lambda: catalog.query(filters, {}), args.repeat)
+
+    name = 'pool0/dataset0@new'
+    backend.snapshots[name] = dict(backend.snapshots['pool0/dataset0@auto-0'], id=name, name=name)
+    bench('catalog add + remove', lambda: (catalog.add(name), catalog.remove(name)), args.repeat)
+    backend.snapshots.pop(name)
+
+    # Periodic verification (out of the query path), listing every snapshot of every pool
+    bench('catalog verify, no drift', lambda: catalog.verify() or [], args.repeat)
+
+    drift = iter(range(args.snapshots))
+    template = backend.snapshots['pool0/dataset0@auto-0']
+
+    def verify_drift():
+        # 10 snapshots created and 10 destroyed without an event (e.g. autosnap)
+        for i in [next(drift) for j in range(10)]:
+            new = f'pool0/dataset0@drift-{i}'
+            backend.snapshots[new] = dict(template, id=new, name=new)
+            backend.snapshots.pop(f'pool{i % args.pools}/dataset{i % args.datasets}@auto-{i}')
+        catalog.verify()
+        return []
+    bench('catalog verify, 20 drifted snapshots', verify_drift, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
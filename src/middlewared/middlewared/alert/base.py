@@ -72,6 +72,9 @@ class AlertSource:
 
     run_on_backup_node = True
 
+    # Seconds a check may take before the last known alerts of the source are kept instead
+    run_timeout = 60
+
     def __init__(self, middleware):
         self.middleware = middleware
 
@@ -8,7 +8,11 @@ class BootVolumeStatusAlertSource(AlertSource):
     hardware = True
 
     async def check(self):
-        state, status = await self.middleware.call("notifier.zpool_status", "freenas-boot")
+        pool = (await self.middleware.call("alert.pools_state")).get("freenas-boot")
+        if pool is None:
+            return
+
+        state, status = pool["state"], pool["status"]
         if state != "HEALTHY":
             return Alert(
                 "The boot volume state is %(state)s: %(status)s",
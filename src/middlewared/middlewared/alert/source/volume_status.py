@@ -12,11 +12,12 @@ class VolumeStatusAlertSource(AlertSource):
             return
 
         alerts = []
-        for pool in await self.middleware.call("pool.query"):
-            if not pool["is_decrypted"]:
+        for pool in (await self.middleware.call("alert.pools_state")).values():
+            # Configured volumes which are not imported have UNKNOWN state, locked volumes are not listed
+            if not pool["configured"]:
                 continue
 
-            state, status = await self.middleware.call("notifier.zpool_status", pool["name"])
+            state, status = pool["state"], pool["status"]
             if state != "HEALTHY":
                 if not (await self.middleware.call("system.is_freenas")):
                     try:
@@ -1,36 +1,23 @@
 from datetime import timedelta
-import subprocess
 
-from middlewared.alert.base import Alert, AlertLevel, ThreadedAlertSource
+from middlewared.alert.base import Alert, AlertLevel, AlertSource
 from middlewared.alert.schedule import IntervalSchedule
 
 
-class ZpoolCapacityAlertSource(ThreadedAlertSource):
+class ZpoolCapacityAlertSource(AlertSource):
     level = AlertLevel.WARNING
     title = "The capacity for the volume is above recommended value"
 
     schedule = IntervalSchedule(timedelta(minutes=5))
 
-    def check_sync(self):
+    async def check(self):
         alerts = []
-        pools = [
-            pool["name"]
-            for pool in self.middleware.call_sync("pool.query")
-        ] + ["freenas-boot"]
-        for pool in pools:
-            proc = subprocess.Popen([
-                "/sbin/zpool",
-                "list",
-                "-H",
-                "-o", "cap",
-                pool.encode("utf8"),
-            ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding="utf8")
-            data = proc.communicate()[0]
-            if proc.returncode != 0:
+        pools = await self.middleware.call("alert.pools_state")
+        for pool in pools.values():
+            if not pool["configured"] and pool["name"] != "freenas-boot":
                 continue
-            try:
-                cap = int(data.strip("\n").replace("%", ""))
-            except ValueError:
+            cap = pool["capacity"]
+            if cap is None:
                 continue
 
             msg = (
@@ -47,10 +34,10 @@ class ZpoolCapacityAlertSource(ThreadedAlertSource):
                     Alert(
                         msg,
                         {
-                            "volume": pool,
+                            "volume": pool["name"],
                             "capacity": cap,
                         },
-                        key=[pool, level.name],
+                        key=[pool["name"], level.name],
                         level=level,
                     )
                 )
@@ -1,4 +1,4 @@
-from . import ejson as json
+from . import ejson as json, emsgpack
 from .protocol import DDPProtocol
 from .utils import ProgressBar
 from collections import defaultdict, namedtuple, Callable
@@ -200,7 +200,10 @@ class WSClient(WebSocketClient):
         return super().close_connection()
 
     def received_message(self, message):
-        self.protocol.on_message(message.data.decode('utf8'))
+        if message.is_binary:
+            self.protocol.on_message(bytes(message.data))
+        else:
+            self.protocol.on_message(message.data.decode('utf8'))
 
     def on_open(self):
         self.client.on_open()
@@ -279,18 +282,25 @@ class CallTimeout(ClientException):
 
 class Client(object):
 
-    def __init__(self, uri=None, reserved_ports=False, reserved_ports_blacklist=None):
+    def __init__(self, uri=None, reserved_ports=False, reserved_ports_blacklist=None, msgpack=False):
         """
         Arguments:
            :reserved_ports(bool): whether the connection should origin using a reserved port (<= 1024)
            :reserved_ports_blacklist(list): list of ports that should not be used as origin
+           :msgpack(bool): ask the server to use binary (msgpack) encoding instead of JSON.
+               JSON is still used if the server does not support it.
         """
+        if msgpack and not emsgpack.available():
+            raise ClientException('msgpack module is not available')
+        self._msgpack = msgpack
+        self._encoding = 'json'
         self._calls = {}
         self._jobs = defaultdict(dict)
         self._jobs_lock = Lock()
         self._jobs_watching = False
         self._pings = {}
         self._event_callbacks = {}
+        self._send_lock = Lock()
         if uri is None:
             uri = 'ws+unix:///var/run/middlewared.sock'
         self._closed = Event()
@@ -322,12 +332,19 @@ class Client(object):
             raise
 
     def _send(self, data):
-        self._ws.send(json.dumps(data))
+        # Calls can be sent from several threads (e.g. pipelined or job callbacks)
+        with self._send_lock:
+            if self._encoding == 'msgpack':
+                self._ws.send(emsgpack.dumps(data), binary=True)
+            else:
+                self._ws.send(json.dumps(data))
 
     def _recv(self, message):
         _id = message.get('id')
         msg = message.get('msg')
         if msg == 'connected':
+            if message.get('encoding') == 'msgpack':
+                self._encoding = 'msgpack'
             self._connected.set()
         elif msg == 'failed':
             raise ClientException('Unsupported protocol version')
@@ -366,11 +383,14 @@ class Client(object):
                         break
 
     def on_open(self):
-        self._send({
+        connect = {
             'msg': 'connect',
             'version': '1',
             'support': ['1'],
-        })
+        }
+        if self._msgpack:
+            connect['encoding'] = 'msgpack'
+        self._send(connect)
 
     def on_close(self, code, reason=None):
         self._closed.set()
@@ -418,23 +438,8 @@ class Client(object):
         if job and not self._jobs_watching:
             self._jobs_subscribe()
 
-        c = Call(method, params)
-        self._register_call(c)
-        self._send({
-            'msg': 'method',
-            'method': c.method,
-            'id': c.id,
-            'params': c.params,
-        })
-
-        if not c.returned.wait(timeout):
-            self._unregister_call(c)
-            raise CallTimeout("Call timeout")
-
-        if c.errno:
-            if c.trace and c.type == 'VALIDATION':
-                raise ValidationErrors(c.extra)
-            raise ClientException(c.error, c.errno, c.trace, c.extra)
+        c = self._call_send(method, params)
+        self._call_wait(c, timeout)
 
         if job:
             job_id = c.result
@@ -462,6 +467,47 @@ class Client(object):
 
         return c.result
 
+    def call_many(self, calls, timeout=CALL_TIMEOUT):
+        """
+        Pipeline several calls over this connection: every call is sent before
+        waiting for any of the results.
+
+        `calls` is a list of `(method, *params)` tuples. Returns the results in the
+        same order or raises the error of the first call that failed.
+        """
+        sent = [self._call_send(call[0], call[1:]) for call in calls]
+
+        endtime = time.monotonic() + timeout
+        try:
+            for c in sent:
+                self._call_wait(c, max(endtime - time.monotonic(), 0.001))
+        finally:
+            for c in sent:
+                self._unregister_call(c)
+
+        return [c.result for c in sent]
+
+    def _call_send(self, method, params):
+        c = Call(method, params)
+        self._register_call(c)
+        self._send({
+            'msg': 'method',
+            'method': c.method,
+            'id': c.id,
+            'params': c.params,
+        })
+        return c
+
+    def _call_wait(self, c, timeout):
+        if not c.returned.wait(timeout):
+            self._unregister_call(c)
+            raise CallTimeout("Call timeout")
+
+        if c.errno:
+            if c.trace and c.type == 'VALIDATION':
+                raise ValidationErrors(c.extra)
+            raise ClientException(c.error, c.errno, c.trace, c.extra)
+
     def subscribe(self, name, callback):
         ready = Event()
         _id = str(uuid.uuid4())
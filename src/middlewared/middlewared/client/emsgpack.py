@@ -0,0 +1,59 @@
+"""
+Binary (msgpack) encoding of websocket messages, an alternative to `ejson`
+negotiated during the `connect` handshake.
+
+Dates and times use extension types equivalent to the `ejson` ones.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+EXT_DATE = 1
+EXT_DATETIME = 2
+EXT_TIME = 3
+
+DATETIME = struct.Struct('>q')
+
+
+def available():
+    return msgpack is not None
+
+
+def default(obj):
+    if type(obj) is date:
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode())
+    elif type(obj) is datetime:
+        if obj.tzinfo:
+            obj += obj.utcoffset()
+            obj = obj.replace(tzinfo=None)
+        # Total milliseconds since EPOCH
+        return msgpack.ExtType(EXT_DATETIME, DATETIME.pack(int((obj - datetime(1970, 1, 1)).total_seconds() * 1000)))
+    elif type(obj) is time:
+        return msgpack.ExtType(EXT_TIME, str(obj).encode())
+    raise TypeError(f'Object of type {obj.__class__.__name__} is not msgpack serializable')
+
+
+def ext_hook(code, data):
+    if code == EXT_DATE:
+        return date(*[int(i) for i in data.decode().split('-')])
+    elif code == EXT_DATETIME:
+        return datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(milliseconds=DATETIME.unpack(data)[0])
+    elif code == EXT_TIME:
+        return time(*[int(i) for i in data.decode().split(':')])
+    return msgpack.ExtType(code, data)
+
+
+def dumps(obj):
+    return msgpack.packb(obj, default=default, use_bin_type=True)
+
+
+def loads(data):
+    kwargs = {}
+    if msgpack.version >= (1, 0, 0):
+        # Keys are not always strings (e.g. ids), same as JSON would allow after conversion
+        kwargs['strict_map_key'] = False
+    return msgpack.unpackb(data, ext_hook=ext_hook, raw=False, **kwargs)
@@ -1,4 +1,4 @@
-from . import ejson as json
+from . import ejson as json, emsgpack
 
 
 class DDPProtocol(object):
@@ -15,10 +15,16 @@ class DDPProtocol(object):
         if message is None:
             return
 
-        try:
-            message = json.loads(message)
-        except ValueError:
-            raise Exception("Invalid JSON message")
+        if isinstance(message, bytes):
+            try:
+                message = emsgpack.loads(message)
+            except ValueError:
+                raise Exception("Invalid msgpack message")
+        else:
+            try:
+                message = json.loads(message)
+            except ValueError:
+                raise Exception("Invalid JSON message")
 
         if 'msg' not in message:
             raise Exception("msg property not found")
@@ -0,0 +1,57 @@
+def dataset_state(ds, properties=None):
+    """
+    Same as libzfs `ZFSDataset.__getstate__(recursive=False)` but only reading
+    `properties` (a list of property names) or all of them if it is `None`.
+    """
+    if properties is None:
+        props = {k: v.__getstate__() for k, v in ds.properties.items()}
+    elif properties:
+        all_props = ds.properties
+        props = {k: all_props[k].__getstate__() for k in properties if k in all_props}
+    else:
+        props = {}
+
+    return {
+        'id': ds.name,
+        'name': ds.name,
+        'pool': ds.name.split('/', 1)[0],
+        'type': ds.type.name,
+        'properties': props,
+        'mountpoint': ds.mountpoint,
+    }
+
+
+def datasets_state(roots, properties=None, depth=None, flat=False, list_descendants=True):
+    """
+    Walk libzfs datasets `roots` and their descendants once and return their state
+    in pre-order (parents before their children).
+
+    - properties: list of properties to retrieve, all of them if `None`
+    - depth: how many levels below `roots` to walk, unlimited if `None`
+    - flat: do not nest descendants in a `children` list of their parent.
+      Nested children are the same dicts returned in the list, not copies.
+    - list_descendants: whether descendants are returned as entries of their own
+      or only nested in `children` of `roots`
+
+    Only `roots` are returned (without `children`) when both `flat` is set and
+    `list_descendants` is not.
+    """
+    rv = []
+
+    def walk(ds, level, listed):
+        state = dataset_state(ds, properties)
+        if listed:
+            rv.append(state)
+
+        children = []
+        if (depth is None or level < depth) and (list_descendants or not flat):
+            for child in ds.children:
+                children.append(walk(child, level + 1, list_descendants))
+
+        if not flat:
+            state['children'] = children
+        return state
+
+    for root in roots:
+        walk(root, 0, True)
+    return rv
@@ -0,0 +1,380 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+import logging
+import subprocess
+import threading
+import time
+
+from middlewared.utils import filter_list
+
+logger = logging.getLogger(__name__)
+
+CREATION_FILTER = 'properties.creation.rawvalue'
+# Properties of snapshots which change without any event we can follow
+SPACE_PROPERTIES = ('used', 'referenced', 'written')
+
+
+class LibzfsSnapshotBackend(object):
+    """
+    Reads snapshots using libzfs.
+
+    A backend needs to implement `pools`, `dataset_snapshots`, `load_snapshots` and
+    `snapshot_space` so a fake one can be used to drive tests and benchmarks.
+    """
+
+    def pools(self):
+        import libzfs
+        with libzfs.ZFS() as zfs:
+            return [pool.name for pool in zfs.pools]
+
+    def dataset_snapshots(self, dataset, recursive=False):
+        import libzfs
+        with libzfs.ZFS() as zfs:
+            try:
+                ds = zfs.get_dataset(dataset)
+            except libzfs.ZFSException:
+                return []
+            return [i.__getstate__() for i in (ds.snapshots_recursive if recursive else ds.snapshots)]
+
+    def load_snapshots(self, names):
+        """
+        Returns {name: snapshot state or None if it does not exist} of `names`.
+        """
+        import libzfs
+        result = {}
+        with libzfs.ZFS() as zfs:
+            for name in names:
+                try:
+                    result[name] = zfs.get_snapshot(name).__getstate__()
+                except libzfs.ZFSException:
+                    result[name] = None
+        return result
+
+    def snapshot_space(self, pool):
+        """
+        Returns {name: {property: bytes}} of the `SPACE_PROPERTIES` of every snapshot
+        of `pool` or None if they cannot be read.
+
+        This only lists names and a few numeric properties which is a lot cheaper than
+        loading every property of every snapshot with libzfs.
+        """
+        cp = subprocess.run(
+            ['zfs', 'list', '-H', '-p', '-r', '-t', 'snapshot', '-o', 'name,' + ','.join(SPACE_PROPERTIES), pool],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, encoding='utf8', errors='ignore',
+        )
+        if cp.returncode != 0:
+            logger.debug('Failed to list snapshots of %r: %s', pool, cp.stderr.strip())
+            return None
+
+        space = {}
+        for line in cp.stdout.splitlines():
+            name, *values = line.split('\t')
+            space[name] = {
+                prop: int(value) if value.isdigit() else None for prop, value in zip(SPACE_PROPERTIES, values)
+            }
+        return space
+
+
+def split_snapshot_name(name):
+    """
+    Returns (pool, dataset) of a snapshot name, e.g. tank/foo@bar -> (tank, tank/foo)
+    """
+    dataset = name.split('@', 1)[0]
+    return dataset.split('/', 1)[0], dataset
+
+
+def creation(snapshot):
+    try:
+        return int(snapshot['properties']['creation']['rawvalue'])
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def nicenum(num):
+    """
+    Format a number of bytes the way zfs does for property values, e.g. 98304 -> 96K.
+    """
+    index = 0
+    n = num
+    while n >= 1024 and index < 6:
+        n //= 1024
+        index += 1
+
+    if index == 0:
+        return str(n)
+    unit = 'BKMGTPE'[index]
+    if num % (1 << (10 * index)) == 0:
+        return f'{n}{unit}'
+    for precision in (2, 1, 0):
+        value = f'{num / (1 << (10 * index)):.{precision}f}{unit}'
+        if len(value) <= 5:
+            break
+    return value
+
+
+def space_property(value):
+    return {'value': nicenum(value), 'rawvalue': str(value), 'parsed': value, 'source': 'NONE'}
+
+
+def copy_snapshot(snapshot):
+    """
+    Copy of a snapshot state which can be modified down to its `properties` (values
+    of properties are still shared).
+    """
+    snapshot = dict(snapshot)
+    if isinstance(snapshot.get('properties'), dict):
+        snapshot['properties'] = dict(snapshot['properties'])
+    return snapshot
+
+
+class SnapshotCatalog(object):
+    """
+    In-memory catalog of ZFS snapshots indexed by name, dataset, pool and creation time.
+
+    Pools are scanned once and then kept current incrementally (`add`, `add_many`,
+    `remove`). A pool is rescanned when it is invalidated (an event we
+    cannot apply incrementally), when it appears/disappears or when its last full
+    scan is older than `max_age` seconds.
+
+    Snapshots can also be created or destroyed without any event we see (e.g.
+    `zfs snapshot` run by autosnap) and space accounting properties change all
+    the time, so `verify` is meant to be called periodically (out of the query
+    path): snapshot names of every pool are compared with a cheap listing, only
+    the ones which differ are (re)loaded and `SPACE_PROPERTIES` are refreshed.
+    """
+
+    def __init__(self, backend, max_age=3600):
+        self.backend = backend
+        self.max_age = max_age
+
+        self.lock = threading.RLock()
+        # name -> snapshot state
+        self.snapshots = {}
+        # dataset -> [(creation, name)] sorted by creation time
+        self.by_dataset = defaultdict(list)
+        # pool -> set of datasets having snapshots
+        self.by_pool = defaultdict(set)
+        # [(creation, name)] of every snapshot sorted by creation time
+        self.by_creation = []
+        # pool -> monotonic time of the last full scan
+        self.scanned = {}
+        self.invalidated = set()
+
+    def query(self, filters=None, options=None):
+        with self.lock:
+            self.sync()
+            candidates = self.candidates(filters or [])
+        result = filter_list(candidates, filters, options)
+        # Catalog snapshots must not be modified by callers, only copy the ones returned
+        if isinstance(result, list):
+            return [copy_snapshot(snapshot) for snapshot in result]
+        elif isinstance(result, dict):
+            return copy_snapshot(result)
+        return result
+
+    def sync(self):
+        """
+        Rescan pools which are not known to be current.
+        """
+        with self.lock:
+            pools = set(self.backend.pools())
+
+            for pool in set(self.scanned) - pools:
+                self.drop_pool(pool)
+
+            now = time.monotonic()
+            for pool in pools:
+                if (
+                    pool not in self.scanned or pool in self.invalidated or
+                    now - self.scanned[pool] > self.max_age
+                ):
+                    self.scan_pool(pool)
+
+    def invalidate(self, pool):
+        with self.lock:
+            self.invalidated.add(pool)
+
+    def scan_pool(self, pool):
+        with self.lock:
+            self.drop_pool(pool)
+            self._insert_many(self.backend.dataset_snapshots(pool, recursive=True))
+            self.scanned[pool] = time.monotonic()
+            self.invalidated.discard(pool)
+
+    def verify(self):
+        """
+        Verify every scanned pool, see `verify_pool`.
+        """
+        with self.lock:
+            pools = list(self.scanned)
+        for pool in pools:
+            self.verify_pool(pool)
+
+    def verify_pool(self, pool):
+        """
+        Load (or remove) snapshots of `pool` which drifted from the catalog and
+        refresh space accounting properties of the others.
+
+        The catalog is only locked to compare and apply changes, never while
+        reading from the backend.
+        """
+        space = self.backend.snapshot_space(pool)
+        if space is None:
+            return
+
+        with self.lock:
+            if pool not in self.scanned or pool in self.invalidated:
+                # Will be rescanned anyway
+                return
+
+            drifted = [name for name in space if name not in self.snapshots]
+            for dataset in self.by_pool.get(pool, set()):
+                drifted.extend(key[1] for key in self.by_dataset[dataset] if key[1] not in space)
+
+            for name, values in space.items():
+                snapshot = self.snapshots.get(name)
+                if snapshot is None or not isinstance(snapshot.get('properties'), dict):
+                    continue
+                properties = snapshot['properties']
+                for prop, value in values.items():
+                    if value is not None and (properties.get(prop) or {}).get('parsed') != value:
+                        # Replace instead of updating, property values are shared with copies
+                        properties[prop] = space_property(value)
+
+        if drifted:
+            logger.debug('%d snapshots of pool %r drifted from the catalog', len(drifted), pool)
+            # Snapshots may have changed since they were listed, ask the backend about every one of them
+            self.add_many(drifted)
+
+    def drop_pool(self, pool):
+        with self.lock:
+            for dataset in self.by_pool.pop(pool, set()):
+                for snapshot in list(self.by_dataset.get(dataset, [])):
+                    self._delete(snapshot[1])
+            self.scanned.pop(pool, None)
+            self.invalidated.discard(pool)
+
+    def add(self, name):
+        """
+        (Re)load a single snapshot, e.g. after it has been created.
+        """
+        self.add_many([name])
+
+    def add_many(self, names):
+        """
+        (Re)load snapshots `names`, removing the ones which do not exist anymore.
+        """
+        snapshots = self.backend.load_snapshots(names)
+        with self.lock:
+            for name, snapshot in snapshots.items():
+                if snapshot is None:
+                    self._delete(name)
+                else:
+                    self._insert(snapshot)
+
+    def remove(self, name):
+        with self.lock:
+            self._delete(name)
+
+    def _insert_many(self, snapshots):
+        # Sort once instead of inserting every snapshot in the sorted indexes
+        keys = []
+        datasets = set()
+        for snapshot in snapshots:
+            name = snapshot['name']
+            if name in self.snapshots:
+                self._delete(name)
+
+            pool, dataset = split_snapshot_name(name)
+            key = (creation(snapshot), name)
+            self.snapshots[name] = snapshot
+            self.by_dataset[dataset].append(key)
+            self.by_pool[pool].add(dataset)
+            datasets.add(dataset)
+            keys.append(key)
+
+        for dataset in datasets:
+            self.by_dataset[dataset].sort()
+        self.by_creation.extend(keys)
+        self.by_creation.sort()
+
+    def _insert(self, snapshot):
+        name = snapshot['name']
+        if name in self.snapshots:
+            self._delete(name)
+
+        pool, dataset = split_snapshot_name(name)
+        key = (creation(snapshot), name)
+        self.snapshots[name] = snapshot
+        insort(self.by_dataset[dataset], key)
+        self.by_pool[pool].add(dataset)
+        insort(self.by_creation, key)
+
+    def _delete(self, name):
+        snapshot = self.snapshots.pop(name, None)
+        if snapshot is None:
+            return
+
+        pool, dataset = split_snapshot_name(name)
+        key = (creation(snapshot), name)
+        _remove_sorted(self.by_dataset[dataset], key)
+        if not self.by_dataset[dataset]:
+            del self.by_dataset[dataset]
+            self.by_pool[pool].discard(dataset)
+        _remove_sorted(self.by_creation, key)
+
+    def candidates(self, filters):
+        """
+        Use the indexes to narrow down the snapshots which can match `filters`
+        (a list of filters which must all match). The result is sorted by creation
+        time and still needs to go through `filter_list`.
+
+        Snapshots returned are the ones of the catalog and must not be modified.
+        """
+        keys = None
+        for f in filters:
+            if len(f) != 3:
+                continue
+            name, op, value = f
+
+            if name in ('id', 'name') and op in ('=', 'in'):
+                names = [value] if op == '=' else value
+                found = [(creation(self.snapshots[n]), n) for n in names if n in self.snapshots]
+            elif name == 'dataset' and op in ('=', 'in'):
+                datasets = [value] if op == '=' else value
+                found = [key for ds in datasets for key in self.by_dataset.get(ds, [])]
+            elif name == 'pool' and op in ('=', 'in'):
+                pools = [value] if op == '=' else value
+                found = [
+                    key for pool in pools for ds in self.by_pool.get(pool, []) for key in self.by_dataset[ds]
+                ]
+            elif name == CREATION_FILTER and op in ('>', '>=', '<', '<=') and str(value).isdigit():
+                found = _creation_range(self.by_creation, op, int(value))
+            else:
+                continue
+
+            found = set(found)
+            keys = found if keys is None else keys & found
+
+        if keys is None:
+            keys = self.by_creation
+        else:
+            keys = sorted(keys)
+        return [self.snapshots[key[1]] for key in keys]
+
+
+def _remove_sorted(keys, key):
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        del keys[i]
+
+
+def _creation_range(keys, op, value):
+    if op == '>':
+        return keys[bisect_right(keys, (value, '\U0010ffff')):]
+    elif op == '>=':
+        return keys[bisect_left(keys, (value, '')):]
+    elif op == '<':
+        return keys[:bisect_left(keys, (value, ''))]
+    else:
+        return keys[:bisect_right(keys, (value, '\U0010ffff'))]
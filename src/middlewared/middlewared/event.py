@@ -3,6 +3,15 @@ import threading
 
 
 class EventSource(object):
+    """
+    Source of events for a single subscription.
+
+    Either implement `run`, which runs in its own thread until it returns (it
+    should return once `_cancel` is set), or implement `attach`/`detach` to
+    register with something shared (e.g. a publisher thread used by every
+    subscriber) without holding a thread for the subscription: `attach` is called
+    once on subscribe and `detach` once the subscription is cancelled.
+    """
 
     def __init__(self, middleware, app, ident, name, arg):
         self.middleware = middleware
@@ -11,16 +20,42 @@ class EventSource(object):
         self.name = name
         self.arg = arg
         self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._attached = False
 
     def send_event(self, etype, **kwargs):
         self.app.send_event(self.name, etype, **kwargs)
 
     def process(self):
-        self.run()
+        with self._lock:
+            if self._cancel.is_set():
+                return
+            attached = self.attach()
+            self._attached = attached is True
+
+        if attached is None:
+            self.run()
+        elif attached:
+            # `detach` is called by `cancel`, nothing left to do in this thread
+            return
         asyncio.run_coroutine_threadsafe(self.app.unsubscribe(self.ident), self.app.loop)
 
+    def attach(self):
+        """
+        Returns True once attached, False if the subscription can not be served
+        or None (default) to use `run` instead.
+        """
+        return None
+
+    def detach(self):
+        pass
+
     def run(self):
         raise NotImplementedError('run() method not implemented')
 
     def cancel(self):
-        self._cancel.set()
+        with self._lock:
+            self._cancel.set()
+            if self._attached:
+                self._attached = False
+                self.detach()
@@ -1,17 +1,20 @@
 import asyncio
-from collections import OrderedDict
+from collections import deque, OrderedDict
 import copy
 from datetime import datetime
 import enum
 import logging
 import os
+import queue
 import sys
 import time
 import traceback
 import threading
 
+from middlewared.event import EventSource
 from middlewared.service_exception import CallError
 from middlewared.pipe import Pipes
+from middlewared.schema import private_args_kwargs
 
 logger = logging.getLogger(__name__)
 
@@ -30,31 +33,43 @@ class JobSharedLock(object):
     Each job method can specify a lock which will be shared
     among all calls for that job and only one job can run at a time
     for this lock.
+
+    Jobs waiting for the lock are kept in order so releasing it hands it
+    over to the next one without looking at any other job.
     """
 
     def __init__(self, queue, name):
         self.queue = queue
         self.name = name
-        self.jobs = []
-        self.semaphore = asyncio.Semaphore()
+        # Jobs waiting for the lock, first in first out
+        self.waiting = deque()
+        # Job holding the lock
+        self.owner = None
 
     def add_job(self, job):
-        self.jobs.append(job)
+        self.waiting.append(job)
 
     def get_jobs(self):
-        return self.jobs
-
-    def remove_job(self, job):
-        self.jobs.remove(job)
+        jobs = list(self.waiting)
+        if self.owner is not None:
+            jobs.insert(0, self.owner)
+        return jobs
 
     def locked(self):
-        return self.semaphore.locked()
+        return self.owner is not None
 
-    async def acquire(self):
-        return await self.semaphore.acquire()
+    def acquire_next(self):
+        """
+        Hand the lock over to the next waiting job, if it is not locked.
+        Returns that job.
+        """
+        if self.owner is not None or not self.waiting:
+            return None
+        self.owner = self.waiting.popleft()
+        return self.owner
 
     def release(self):
-        return self.semaphore.release()
+        self.owner = None
 
 
 class JobsQueue(object):
@@ -62,13 +77,14 @@ class JobsQueue(object):
     def __init__(self, middleware):
         self.middleware = middleware
         self.deque = JobsDeque()
-        self.queue = []
+        # Jobs ready to run: jobs without a lock and jobs which acquired theirs
+        self.queue = deque()
 
         # Event responsible for the job queue schedule loop.
         # This event is set and a new job is potentially ready to run
         self.queue_event = asyncio.Event()
 
-        # Shared lock (JobSharedLock) dict
+        # Shared lock (JobSharedLock) dict, only for locks held or waited for
         self.job_locks = {}
 
     def __getitem__(self, item):
@@ -81,21 +97,24 @@ class JobsQueue(object):
         return self.deque.all()
 
     def add(self, job):
-        if job.options["lock_queue_size"] is not None:
-            lock = self.get_lock(job)
-            queued_jobs = [another_job for another_job in self.queue if self.get_lock(another_job) is lock]
-            if len(queued_jobs) >= job.options["lock_queue_size"]:
-                return queued_jobs[-1]
+        lock = self.get_lock(job)
+        if lock is not None and job.options["lock_queue_size"] is not None:
+            if lock.waiting and len(lock.waiting) >= job.options["lock_queue_size"]:
+                return lock.waiting[-1]
 
         self.deque.add(job)
-        self.queue.append(job)
+
+        if lock is None:
+            self.queue.append(job)
+            # A job has been added to the queue, let the queue scheduler run
+            self.queue_event.set()
+        else:
+            lock.add_job(job)
+            self.__schedule(lock)
 
         if not job.options["transient"]:
             self.middleware.send_event('core.get_jobs', 'ADDED', id=job.id, fields=job.__encode__())
 
-        # A job has been added to the queue, let the queue scheduler run
-        self.queue_event.set()
-
         return job
 
     def remove(self, job_id):
@@ -113,23 +132,26 @@ class JobsQueue(object):
         if lock is None:
             lock = JobSharedLock(self, name)
             self.job_locks[lock.name] = lock
-        lock.add_job(job)
         return lock
 
     def release_lock(self, job):
         lock = job.get_lock()
         if not lock:
             return
-        # Remove job from lock list and release it so another job can use it
-        lock.remove_job(job)
         lock.release()
 
-        if len(lock.get_jobs()) == 0:
-            self.job_locks.pop(lock.name)
+        if lock.waiting:
+            # Next job waiting for the same lock can run
+            self.__schedule(lock)
+        else:
+            self.job_locks.pop(lock.name, None)
 
-        # Once a lock is released there could be another job in the queue
-        # waiting for the same lock
-        self.queue_event.set()
+    def __schedule(self, lock):
+        job = lock.acquire_next()
+        if job is not None:
+            job.set_lock(lock)
+            self.queue.append(job)
+            self.queue_event.set()
 
     async def __next__(self):
         """
@@ -139,22 +161,12 @@ class JobsQueue(object):
         while True:
             # Awaits a new event to look for a job
             await self.queue_event.wait()
-            found = None
-            for job in self.queue:
-                lock = self.get_lock(job)
-                # Get job in the queue if it has no lock or its not locked
-                if lock is None or not lock.locked():
-                    found = job
-                    if lock:
-                        await job.set_lock(lock)
-                    break
-            if found:
-                # Unlocked job found to run
-                self.queue.remove(found)
+            if self.queue:
+                job = self.queue.popleft()
                 # If there are no more jobs in the queue, clear the event
-                if len(self.queue) == 0:
+                if not self.queue:
                     self.queue_event.clear()
-                return found
+                return job
             else:
                 # No jobs available to run, clear the event
                 self.queue_event.clear()
@@ -202,11 +214,180 @@ class JobsDeque(object):
         del self.__dict[job_id]
 
 
+class JobLogs(object):
+    """
+    Buffered writer for the logs of a job.
+
+    `write` only appends to a memory buffer (it can be called from the event loop
+    or a thread) which is flushed to `path` in a thread every `FLUSH_INTERVAL`
+    seconds or once `FLUSH_SIZE` bytes are pending.
+
+    Once the file reaches `max_size` it is rotated to `<path>.1` so a job never
+    keeps more than twice `max_size` on disk. The buffer is capped to its last
+    `max_size` bytes as well (older data would not fit in the file anyway) in
+    case the disk does not keep up.
+
+    Data written once the logs are closed is dropped.
+
+    First and last lines (up to their last `EXCERPT_LINE_LENGTH` bytes, e.g. for
+    progress output which never writes a newline) are kept in memory to build the
+    logs excerpt and `listeners` are called with every chunk written (e.g. to
+    follow the logs).
+    """
+
+    FLUSH_INTERVAL = 1
+    FLUSH_SIZE = 64 * 1024
+    MAX_SIZE = 16 * 1024 * 1024
+    EXCERPT_LINES = 5
+    EXCERPT_LINE_LENGTH = 1024
+
+    def __init__(self, middleware, path, max_size=None):
+        self.middleware = middleware
+        self.path = path
+        self.max_size = max_size or self.MAX_SIZE
+        self.loop = asyncio.get_event_loop()
+
+        self.lock = threading.Lock()
+        self.buffer = bytearray()
+        self.flush_scheduled = False
+        self.flush_lock = asyncio.Lock()
+        self.fd = None
+        self.size = 0
+        self.closed = False
+
+        self.partial_line = b""
+        self.head = []
+        self.tail = deque(maxlen=self.EXCERPT_LINES)
+        self.lines = 0
+
+        self.listeners = set()
+
+    def write(self, data):
+        if not data:
+            return
+
+        with self.lock:
+            if self.closed:
+                return
+
+            self.buffer.extend(data)
+            if len(self.buffer) > self.max_size:
+                del self.buffer[:len(self.buffer) - self.max_size]
+
+            lines = (self.partial_line + data).split(b"\n")
+            self.partial_line = lines.pop()[-self.EXCERPT_LINE_LENGTH:]
+            for line in lines:
+                self.__add_line(line + b"\n")
+
+            listeners = list(self.listeners)
+            schedule = not self.flush_scheduled or len(self.buffer) >= self.FLUSH_SIZE
+            self.flush_scheduled = True
+
+        for listener in listeners:
+            listener(data)
+
+        if schedule:
+            self.loop.call_soon_threadsafe(self.__schedule_flush)
+
+    async def open(self):
+        """
+        Create (or truncate) the log file so it exists even if nothing is ever written.
+        """
+        await self.middleware.run_in_thread(self.__open)
+
+    def follow(self, listener):
+        """
+        Add `listener` to be called with every chunk written.
+        Returns the last lines written so far.
+        """
+        with self.lock:
+            self.listeners.add(listener)
+            return b"".join(self.tail) + self.partial_line
+
+    def unfollow(self, listener):
+        with self.lock:
+            self.listeners.discard(listener)
+
+    def excerpt(self):
+        with self.lock:
+            head = [line.decode("utf-8", "ignore") for line in self.head]
+            tail = [line.decode("utf-8", "ignore") for line in self.tail]
+            lines = self.lines
+
+        if lines > 2 * self.EXCERPT_LINES:
+            return "%s[%d more lines]\n%s" % ("".join(head), lines - 2 * self.EXCERPT_LINES, "".join(tail))
+        else:
+            # Every line is either in head or in tail
+            return "".join(head + tail[len(tail) - (lines - len(head)):])
+
+    async def flush(self):
+        async with self.flush_lock:
+            with self.lock:
+                data = bytes(self.buffer)
+                self.buffer.clear()
+                self.flush_scheduled = False
+
+            if data:
+                await self.middleware.run_in_thread(self.__write, data)
+
+    async def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.partial_line:
+                self.__add_line(self.partial_line)
+                self.partial_line = b""
+            self.listeners.clear()
+
+        await self.flush()
+        async with self.flush_lock:
+            if self.fd is not None:
+                await self.middleware.run_in_thread(self.fd.close)
+
+    def __add_line(self, line):
+        if len(line) > self.EXCERPT_LINE_LENGTH:
+            line = line[-self.EXCERPT_LINE_LENGTH:]
+        if len(self.head) < self.EXCERPT_LINES:
+            self.head.append(line)
+        self.tail.append(line)
+        self.lines += 1
+
+    def __schedule_flush(self):
+        if len(self.buffer) >= self.FLUSH_SIZE:
+            asyncio.ensure_future(self.flush())
+        else:
+            self.loop.call_later(self.FLUSH_INTERVAL, lambda: asyncio.ensure_future(self.flush()))
+
+    def __write(self, data):
+        if len(data) > self.max_size:
+            data = data[-self.max_size:]
+
+        if self.fd is not None and self.size + len(data) > self.max_size:
+            self.fd.close()
+            os.replace(self.path, f"{self.path}.1")
+            self.fd = None
+
+        if self.fd is None:
+            self.__open()
+
+        self.fd.write(data)
+        self.fd.flush()
+        self.size += len(data)
+
+    def __open(self):
+        self.fd = open(self.path, "wb")
+        self.size = 0
+
+
 class Job(object):
     """
     Represents a long running call, methods marked with @job decorator
     """
 
+    # Minimum interval (seconds) between two progress events of a job
+    PROGRESS_INTERVAL = 1
+
     def __init__(self, middleware, method_name, serviceobj, method, args, options, pipes):
         self._finished = asyncio.Event()
         self.middleware = middleware
@@ -228,6 +409,9 @@ class Job(object):
             'description': None,
             'extra': None,
         }
+        self.progress_event_scheduled = False
+        self.progress_event_handle = None
+        self.progress_event_sent_at = 0
         self.time_started = datetime.now()
         self.time_finished = None
         self.loop = None
@@ -257,9 +441,8 @@ class Job(object):
     def get_lock(self):
         return self.lock
 
-    async def set_lock(self, lock):
+    def set_lock(self, lock):
         self.lock = lock
-        await self.lock.acquire()
 
     def set_result(self, result):
         self.result = result
@@ -286,8 +469,43 @@ class Job(object):
             self.progress['description'] = description
         if extra:
             self.progress['extra'] = extra
+        self.__schedule_progress_event()
+
+    def __schedule_progress_event(self):
+        # Progress events are coalesced so a job sends at most one every `PROGRESS_INTERVAL`
+        # seconds, always with the latest progress. Can be called from a thread.
+        if self.progress_event_scheduled:
+            return
+        self.progress_event_scheduled = True
+        if self.loop is None:
+            self.__send_progress_event()
+        else:
+            self.loop.call_soon_threadsafe(self.__schedule_progress_event_in_loop)
+
+    def __schedule_progress_event_in_loop(self):
+        if self.progress_event_handle is not None:
+            return
+        delay = self.progress_event_sent_at + self.PROGRESS_INTERVAL - time.monotonic()
+        if delay <= 0:
+            self.__send_progress_event()
+        else:
+            self.progress_event_handle = self.loop.call_later(delay, self.__send_progress_event)
+
+    def __send_progress_event(self):
+        self.progress_event_handle = None
+        self.progress_event_scheduled = False
+        if self._finished.is_set():
+            return
+        self.progress_event_sent_at = time.monotonic()
         self.middleware.send_event('core.get_jobs', 'CHANGED', id=self.id, fields=self.__encode__())
 
+    def __cancel_progress_event(self):
+        # Job state change event already has the latest progress
+        if self.progress_event_handle is not None:
+            self.progress_event_handle.cancel()
+            self.progress_event_handle = None
+        self.progress_event_scheduled = False
+
     async def wait(self, timeout=None):
         if timeout is None:
             await self._finished.wait()
@@ -323,9 +541,11 @@ class Job(object):
             logs_dir = os.path.join("/tmp/middlewared/jobs")
             os.makedirs(logs_dir, exist_ok=True)
             self.logs_path = os.path.join(logs_dir, f"{self.id}.log")
-            self.logs_fd = open(self.logs_path, "wb")
+            self.logs_fd = JobLogs(self.middleware, self.logs_path)
+            await self.logs_fd.open()
 
         self.set_state('RUNNING')
+        start = time.monotonic()
         try:
             self.loop = asyncio.get_event_loop()
             self.future = asyncio.ensure_future(self.__run_body())
@@ -339,8 +559,14 @@ class Job(object):
             await self.__close_logs()
             await self.__close_pipes()
 
+            if self.middleware.call_stats.enabled:
+                self.middleware.call_stats.add(
+                    self.method_name, 'job', time.monotonic() - start, self.state != State.SUCCESS,
+                )
+
             queue.release_lock(self)
             self._finished.set()
+            self.__cancel_progress_event()
             if self.options['transient']:
                 queue.remove(self.id)
             else:
@@ -357,39 +583,19 @@ class Job(object):
         else:
             # Make sure args are not altered during job run
             args = copy.deepcopy(self.args)
+            # That copy belongs to this run, @accepts does not need to copy it again
+            kwargs = private_args_kwargs(self.method)
             if asyncio.iscoroutinefunction(self.method):
-                rv = await self.method(*([self] + args))
+                rv = await self.method(*([self] + args), **kwargs)
             else:
-                rv = await self.middleware.run_in_thread(self.method, *([self] + args))
+                rv = await self.middleware.run_in_thread(self.method, *([self] + args), **kwargs)
         self.set_result(rv)
         self.set_state('SUCCESS')
 
     async def __close_logs(self):
         if self.logs_fd:
-            self.logs_fd.close()
-
-            def get_logs_excerpt():
-                head = []
-                tail = []
-                lines = 0
-                with open(self.logs_path, "r", encoding="utf-8", errors="ignore") as f:
-                    for line in f:
-                        if len(head) < 5:
-                            head.append(line)
-
-                        tail.append(line)
-                        tail = tail[-5:]
-
-                        lines += 1
-
-                if lines > 10:
-                    excerpt = "%s[%d more lines]\n%s" % ("".join(head), lines - 10, "".join(tail))
-                else:
-                    excerpt = "".join(head + tail)
-
-                return excerpt
-
-            self.logs_excerpt = await self.middleware.run_in_thread(get_logs_excerpt)
+            await self.logs_fd.close()
+            self.logs_excerpt = self.logs_fd.excerpt()
 
     async def __close_pipes(self):
         def close_pipes():
@@ -433,10 +639,59 @@ class Job(object):
 
     def cleanup(self):
         if self.logs_path:
-            try:
-                os.unlink(self.logs_path)
-            except Exception:
-                pass
+            for path in (self.logs_path, f"{self.logs_path}.1"):
+                try:
+                    os.unlink(path)
+                except Exception:
+                    pass
+
+
+class JobLogsEventSource(EventSource):
+    """
+    Follow the logs of a job: `core.job_logs:<job id>`.
+
+    Sends the last lines written so far and then new data as it is written
+    until the job finishes.
+    """
+
+    def run(self):
+        try:
+            job = self.middleware.jobs.get(int(self.arg))
+        except (TypeError, ValueError):
+            return
+        if job is None or not job.options["logs"]:
+            return
+
+        # Logs are only opened once the job starts running
+        while job.logs_fd is None:
+            if job.time_finished or self._cancel.wait(1):
+                return
+
+        pending = queue.Queue()
+        logs = job.logs_fd
+        data = logs.follow(pending.put)
+        try:
+            while not self._cancel.is_set():
+                if data:
+                    self.send_event('ADDED', fields={'data': data.decode("utf-8", "ignore")})
+
+                try:
+                    chunks = [pending.get(timeout=1)]
+                except queue.Empty:
+                    if job.time_finished:
+                        break
+                    data = None
+                    continue
+
+                # Send everything written meanwhile at once
+                while True:
+                    try:
+                        chunks.append(pending.get_nowait())
+                    except queue.Empty:
+                        break
+                data = b"".join(chunks)
+        finally:
+            logs.unfollow(pending.put)
 
 
 class JobProgressBuffer:
@@ -1,19 +1,22 @@
 from .apidocs import app as apidocs_app
-from .client import ejson as json
+from .client import ejson as json, emsgpack
 from .event import EventSource
-from .job import Job, JobsQueue
+from .job import Job, JobLogsEventSource, JobsQueue
 from .pipe import Pipes, Pipe
 from .restful import RESTfulAPI
-from .schema import ResolverError, Error as SchemaError
+from .schema import Error as SchemaError, private_args_kwargs
 from .service import CallError, CallException, ValidationError, ValidationErrors
 from .utils import start_daemon_thread, load_modules, load_classes
+from .utils.call_stats import CallStats
+from .utils.loop_monitor import LoopMonitor
+from .utils.io_thread_pool_executor import IoThreadPoolExecutor
 from .webui_auth import WebUIAuth
 from .worker import ProcessPoolExecutor, main_worker
 from aiohttp import web
 from aiohttp.web_exceptions import HTTPPermanentRedirect
 from aiohttp.web_middlewares import normalize_path_middleware
 from aiohttp_wsgi import WSGIHandler
-from collections import defaultdict
+from collections import defaultdict, deque
 
 import argparse
 import asyncio
@@ -39,8 +42,30 @@ import uuid
 from . import logger
 
 
+def event_message(name, event_type, **kwargs):
+    event = {
+        'msg': event_type.lower(),
+        'collection': name,
+    }
+    if 'id' in kwargs:
+        event['id'] = kwargs.pop('id')
+    if event_type in ('ADDED', 'CHANGED'):
+        if 'fields' in kwargs:
+            event['fields'] = kwargs.pop('fields')
+    if event_type == 'CHANGED':
+        if 'cleared' in kwargs:
+            event['cleared'] = kwargs.pop('cleared')
+    if kwargs:
+        event['extra'] = kwargs
+    return event
+
+
 class Application(object):
 
+    # Maximum number of messages waiting to be sent to the client. When it is reached
+    # the connection is closed as the client is not keeping up.
+    SEND_QUEUE_SIZE = 5000
+
     def __init__(self, middleware, loop, request, response):
         self.middleware = middleware
         self.loop = loop
@@ -50,6 +75,27 @@ class Application(object):
         self.handshake = False
         self.logger = logger.Logger('application').getLogger()
         self.sessionid = str(uuid.uuid4())
+        # Messages encoding negotiated during handshake ("json" or "msgpack")
+        self.encoding = 'json'
+
+        """
+        Outbound messages are queued and sent by a single writer task so a slow
+        client can not make memory grow without bounds.
+
+        CHANGED events waiting in the queue are merged with newer ones for the
+        same collection and id (indexed in __send_queue_changed).
+        """
+        self.__loop_thread = threading.get_ident()
+        self.__send_queue = deque()
+        self.__send_queue_changed = {}
+        self.__send_queue_event = asyncio.Event(loop=loop)
+        self.__writer = None
+        self.__closed = False
+        self.__stats = {
+            'sent': 0,
+            'coalesced': 0,
+            'queue_max': 0,
+        }
 
         """
         Callback index registered by services. They are blocking.
@@ -66,10 +112,106 @@ class Application(object):
         assert name in ('on_message', 'on_close')
         self.__callbacks[name].append(method)
 
-    def _send(self, data):
-        asyncio.run_coroutine_threadsafe(self.response.send_json(
-            data, dumps=json.dumps
-        ), loop=self.loop)
+    def encode(self, data):
+        if self.encoding == 'msgpack':
+            return emsgpack.dumps(data)
+        return json.dumps(data)
+
+    def _send(self, data, encoded=None):
+        """
+        Queue `data` to be sent. `encoded` is the result of `encode(data)` if
+        already known (e.g. events sent to every subscribed client).
+        """
+        if threading.get_ident() == self.__loop_thread:
+            self.__enqueue(data, encoded)
+        else:
+            self.loop.call_soon_threadsafe(self.__enqueue, data, encoded)
+
+    def __enqueue(self, data, encoded):
+        if self.__closed:
+            return
+
+        key = None
+        if data.get('msg') in ('added', 'changed', 'removed') and 'id' in data:
+            key = (data['collection'], data['id'])
+
+        if key is not None:
+            if data['msg'] == 'changed':
+                pending_entry = self.__send_queue_changed.get(key)
+                if pending_entry is not None:
+                    # Merge into the pending event so the client gets the latest state at once
+                    pending = pending_entry[0]
+                    pending_entry[1] = None
+                    if 'fields' in data:
+                        pending['fields'] = dict(pending.get('fields') or {}, **data['fields'])
+                        if 'cleared' in pending:
+                            pending['cleared'] = [i for i in pending['cleared'] if i not in data['fields']]
+                    if 'cleared' in data:
+                        pending['fields'] = {
+                            k: v for k, v in (pending.get('fields') or {}).items() if k not in data['cleared']
+                        }
+                        pending['cleared'] = (pending.get('cleared') or []) + [
+                            i for i in data['cleared'] if i not in (pending.get('cleared') or [])
+                        ]
+                    if 'extra' in data:
+                        pending['extra'] = data['extra']
+                    self.__stats['coalesced'] += 1
+                    return
+            else:
+                # Do not merge events for this id beyond ADDED/REMOVED to keep them in order
+                self.__send_queue_changed.pop(key, None)
+
+        if len(self.__send_queue) >= self.SEND_QUEUE_SIZE:
+            self.logger.warning(
+                'Closing connection %s: %d messages waiting to be sent', self.sessionid, len(self.__send_queue),
+            )
+            self.__close()
+            return
+
+        # Entries are [message, encoded message]
+        entry = [data, encoded]
+        if key is not None and data['msg'] == 'changed':
+            # Events may be shared by all clients, only merge into a copy
+            entry[0] = dict(data)
+            self.__send_queue_changed[key] = entry
+        self.__send_queue.append(entry)
+        self.__stats['queue_max'] = max(self.__stats['queue_max'], len(self.__send_queue))
+        self.__send_queue_event.set()
+
+    async def __write(self):
+        while True:
+            await self.__send_queue_event.wait()
+            while self.__send_queue:
+                entry = self.__send_queue.popleft()
+                data, encoded = entry
+                if data.get('msg') == 'changed':
+                    key = (data['collection'], data.get('id'))
+                    if self.__send_queue_changed.get(key) is entry:
+                        self.__send_queue_changed.pop(key)
+                if encoded is None:
+                    encoded = self.encode(data)
+                try:
+                    if isinstance(encoded, bytes):
+                        await self.response.send_bytes(encoded)
+                    else:
+                        await self.response.send_str(encoded)
+                except Exception:
+                    self.logger.debug('Failed to send message to %s', self.sessionid, exc_info=True)
+                    self.__close()
+                    return
+                self.__stats['sent'] += 1
+            self.__send_queue_event.clear()
+
+    def __close(self):
+        self.__closed = True
+        self.__send_queue.clear()
+        self.__send_queue_changed.clear()
+        if self.__writer is not None and self.__writer is not asyncio.Task.current_task(loop=self.loop):
+            self.__writer.cancel()
+        asyncio.ensure_future(self.response.close(), loop=self.loop)
+
+    def get_send_stats(self):
+        return dict(self.__stats, queued=len(self.__send_queue))
 
     def _tb_error(self, exc_info):
         klass, exc, trace = exc_info
@@ -226,6 +368,7 @@ class Application(object):
             start_daemon_thread(target=es.process)
         else:
             self.__subscribed[ident] = name
+        self.middleware.subscribe_wsclient(name, self)
 
         self._send({
             'msg': 'ready',
@@ -234,38 +377,38 @@ class Application(object):
 
     async def unsubscribe(self, ident):
         if ident in self.__subscribed:
-            self.__subscribed.pop(ident)
+            name = self.__subscribed.pop(ident)
         elif ident in self.__event_sources:
-            event_source = self.__event_sources[ident]['event_source']
+            event_source = self.__event_sources.pop(ident)['event_source']
+            name = event_source.name
             await self.middleware.run_in_thread(event_source.cancel)
+        else:
+            return
+        if not self.__is_subscribed(name):
+            self.middleware.unsubscribe_wsclient(name, self)
+
+    def __is_subscribed(self, name):
+        return (
+            any(i == name for i in self.__subscribed.values()) or
+            any(i['name'] == name for i in self.__event_sources.values())
+        )
 
     def send_event(self, name, event_type, **kwargs):
-        if (
-            not any(i == name or i == '*' for i in self.__subscribed.values()) and
-            not any(i['name'] == name for i in self.__event_sources.values())
-        ):
+        if not self.__is_subscribed(name) and not self.__is_subscribed('*'):
             return
-        event = {
-            'msg': event_type.lower(),
-            'collection': name,
-        }
-        kwargs = kwargs.copy()
-        if 'id' in kwargs:
-            event['id'] = kwargs.pop('id')
-        if event_type in ('ADDED', 'CHANGED'):
-            if 'fields' in kwargs:
-                event['fields'] = kwargs.pop('fields')
-        if event_type == 'CHANGED':
-            if 'cleared' in kwargs:
-                event['cleared'] = kwargs.pop('cleared')
-        if kwargs:
-            event['extra'] = kwargs
-        self._send(event)
+        self._send(event_message(name, event_type, **kwargs))
 
     def on_open(self):
+        self.__writer = asyncio.ensure_future(self.__write(), loop=self.loop)
         self.middleware.register_wsclient(self)
 
     async def on_close(self, *args, **kwargs):
+        self.__closed = True
+        self.__send_queue.clear()
+        self.__send_queue_changed.clear()
+        if self.__writer is not None:
+            self.__writer.cancel()
+
         # Run callbacks registered in plugins for on_close
         for method in self.__callbacks['on_close']:
             try:
@@ -277,6 +420,9 @@ class Application(object):
             event_source = val['event_source']
             asyncio.ensure_future(self.middleware.run_in_thread(event_source.cancel))
 
+        for name in set(self.__subscribed.values()) | {i['name'] for i in self.__event_sources.values()}:
+            self.middleware.unsubscribe_wsclient(name, self)
+
         self.middleware.unregister_wsclient(self)
 
     async def on_message(self, message):
@@ -298,10 +444,15 @@ class Application(object):
                 # It is desired to prevent that in this stage in case we are debugging
                 # middlewared via gdb (which makes the program execution a lot slower)
                 await asyncio.shield(self.middleware.call_hook('core.on_connect', app=self))
-                self._send({
+                connected = {
                     'msg': 'connected',
                     'session': self.sessionid,
-                })
+                }
+                if message.get('encoding') == 'msgpack' and emsgpack.available():
+                    connected['encoding'] = 'msgpack'
+                # Handshake reply is always JSON, next messages use the negotiated encoding
+                self._send(connected, json.dumps(connected))
+                self.encoding = connected.get('encoding', 'json')
                 self.handshake = True
             return
 
@@ -716,23 +867,32 @@ class ShellApplication(object):
 
 class Middleware(object):
 
-    def __init__(self, loop_debug=False, loop_monitor=True, overlay_dirs=None, debug_level=None):
+    def __init__(self, loop_debug=False, loop_monitor=True, overlay_dirs=None, debug_level=None,
+                 profile_startup=False, process_pool_size=2, call_stats=True):
         self.logger = logger.Logger('middlewared', debug_level).getLogger()
         self.crash_reporting = logger.CrashReporting()
         self.crash_reporting_semaphore = asyncio.Semaphore(value=2)
         self.loop_debug = loop_debug
         self.loop_monitor = loop_monitor
         self.overlay_dirs = overlay_dirs or []
+        self.profile_startup = profile_startup
+        self.call_stats = CallStats(enabled=call_stats)
+        self.__loop_monitor = None
         self.__loop = None
         self.__thread_id = threading.get_ident()
         # Spawn new processes for ProcessPool instead of forking
         multiprocessing.set_start_method('spawn')
-        self.__procpool = ProcessPoolExecutor(max_workers=2)
+        self.__procpool = ProcessPoolExecutor(max_workers=process_pool_size)
+        # Latest statistics reported by every process pool worker
+        self.__procpool_stats = {}
         self.__threadpool = concurrent.futures.ThreadPoolExecutor(max_workers=10)
+        self.__io_threadpool = IoThreadPoolExecutor('IoThread')
         self.jobs = JobsQueue(self)
         self.__schemas = {}
         self.__services = {}
         self.__wsclients = {}
+        # Websocket clients subscribed to every event name (or "*")
+        self.__event_subscriptions = defaultdict(set)
         self.__event_sources = {}
         self.__event_subs = defaultdict(list)
         self.__hooks = defaultdict(list)
@@ -742,6 +902,7 @@ class Middleware(object):
     def __init_services(self):
         from middlewared.service import CoreService
         self.add_service(CoreService(self))
+        self.register_event_source('core.job_logs', JobLogsEventSource)
 
     async def __plugins_load(self):
         from middlewared.service import Service, CRUDService, ConfigService, SystemServiceService
@@ -755,13 +916,18 @@ class Middleware(object):
 
         self.logger.debug('Loading plugins from {0}'.format(','.join(plugins_dirs)))
 
+        # Seconds spent importing, resolving schemas and in setup of every plugin
+        import_times = {}
+        resolve_times = defaultdict(float)
+        setup_times = {}
+
         setup_funcs = []
         for plugins_dir in plugins_dirs:
 
             if not os.path.exists(plugins_dir):
                 raise ValueError(f'plugins dir not found: {plugins_dir}')
 
-            for mod in load_modules(plugins_dir):
+            for mod in load_modules(plugins_dir, import_times):
                 for cls in load_classes(mod, Service, (ConfigService, CRUDService, SystemServiceService)):
                     self.add_service(cls(self))
 
@@ -770,34 +936,52 @@ class Middleware(object):
 
         # Now that all plugins have been loaded we can resolve all method params
         # to make sure every schema is patched and references match
-        from middlewared.schema import resolver  # Lazy import so namespace match
+        from middlewared.schema import resolver, resolver_order  # Lazy import so namespace match
         to_resolve = []
         for service in list(self.__services.values()):
             for attr in dir(service):
                 to_resolve.append(getattr(service, attr))
-        while len(to_resolve) > 0:
-            resolved = 0
-            for method in list(to_resolve):
-                try:
-                    resolver(self, method)
-                except ResolverError:
-                    pass
-                else:
-                    to_resolve.remove(method)
-                    resolved += 1
-            if resolved == 0:
-                raise ValueError(f'Not all schemas could be resolved: {to_resolve}')
+        to_resolve, unresolved = resolver_order(self, to_resolve)
+        if unresolved:
+            raise ValueError(f'Not all schemas could be resolved: {unresolved}')
+        for method in to_resolve:
+            start = time.monotonic()
+            resolver(self, method)
+            resolve_times[getattr(method, '__self__', method).__module__] += time.monotonic() - start
 
         # Only call setup after all schemas have been resolved because
         # they can call methods with schemas defined.
         for f in setup_funcs:
+            start = time.monotonic()
             call = f(self)
             # Allow setup to be a coroutine
             if asyncio.iscoroutinefunction(f):
                 await call
+            setup_times[f.__module__] = time.monotonic() - start
+
+        if self.profile_startup:
+            self.__log_startup_profile(import_times, resolve_times, setup_times)
 
         self.logger.debug('All plugins loaded')
 
+    def __log_startup_profile(self, import_times, resolve_times, setup_times):
+        plugins = set(import_times) | set(resolve_times) | set(setup_times)
+        times = sorted(
+            [(
+                name, import_times.get(name, 0), resolve_times.get(name, 0), setup_times.get(name, 0),
+            ) for name in plugins],
+            key=lambda t: sum(t[1:]),
+            reverse=True,
+        )
+        lines = [f'{"plugin":<24}{"import":>10}{"resolve":>10}{"setup":>10}']
+        for name, import_time, resolve_time, setup_time in times + [(
+            'total', sum(import_times.values()), sum(resolve_times.values()), sum(setup_times.values()),
+        )]:
+            lines.append(
+                f'{name:<24}{import_time * 1000:>10.1f}{resolve_time * 1000:>10.1f}{setup_time * 1000:>10.1f}'
+            )
+        self.logger.info('Startup profile (ms):\n%s', '\n'.join(lines))
+
     def __setup_periodic_tasks(self):
         for service_name, service_obj in self.__services.items():
             for task_name in dir(service_obj):
@@ -843,6 +1027,22 @@ class Middleware(object):
     def unregister_wsclient(self, client):
         self.__wsclients.pop(client.sessionid)
 
+    def subscribe_wsclient(self, name, client):
+        self.__event_subscriptions[name].add(client)
+
+    def unsubscribe_wsclient(self, name, client):
+        clients = self.__event_subscriptions.get(name)
+        if clients is not None:
+            clients.discard(client)
+            if not clients:
+                self.__event_subscriptions.pop(name)
+
+    def get_wsclients_stats(self):
+        return [
+            dict(wsclient.get_send_stats(), sessionid=sessionid, authenticated=wsclient.authenticated)
+            for sessionid, wsclient in list(self.__wsclients.items())
+        ]
+
     def register_hook(self, name, method, sync=True):
         """
         Register a hook under `name`.
@@ -915,8 +1115,9 @@ class Middleware(object):
     async def _run_in_conn_threadpool(self, method, *args, **kwargs):
         """
         Threads to handle websocket connection are gated on `__threadpool`.
-        Any other calls should use `run_in_thread` as that launches its own thread
-        and does not cause deadlock waiting another thread to finish in the pool
+        Any other calls should use `run_in_thread` as that never waits for a busy
+        thread (a new one is started if none is idle) and does not cause deadlock
+        waiting another thread to finish in the pool
         (which could happen on the stack call, e.g.
            service.foo calls something in using the thread pool and something also
            uses the thread pool. If service.foo is called many times before each thread
@@ -928,17 +1129,31 @@ class Middleware(object):
         return await self.run_in_executor(self.__procpool, method, *args, **kwargs)
 
     async def run_in_thread(self, method, *args, **kwargs):
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-        try:
-            return await self.loop.run_in_executor(executor, functools.partial(method, *args, **kwargs))
-        finally:
-            executor.shutdown(wait=False)
+        return await self.loop.run_in_executor(self.__io_threadpool, functools.partial(method, *args, **kwargs))
+
+    def get_io_thread_pool_stats(self):
+        return self.__io_threadpool.stats()
+
+    def get_process_pool_stats(self):
+        pids = self.__procpool.get_pids()
+        for pid in list(self.__procpool_stats):
+            if pid not in pids:
+                self.__procpool_stats.pop(pid)
+        return {
+            'max_workers': self.__procpool._max_workers,
+            'workers': [self.__procpool_stats.get(pid, {'pid': pid}) for pid in pids],
+        }
 
     def pipe(self):
         return Pipe(self)
 
-    async def _call(self, name, serviceobj, methodobj, params=None, app=None, pipes=None, io_thread=True):
-
+    async def _call(
+        self, name, serviceobj, methodobj, params=None, app=None, pipes=None, io_thread=True, private_args=False,
+    ):
+        """
+        `private_args` tells whether `params` are only referenced by this call (e.g. decoded from
+        a websocket message) and do not need to be copied before the method is allowed to modify them.
+        """
         args = []
         if hasattr(methodobj, '_pass_app'):
             args.append(app)
@@ -963,31 +1178,43 @@ class Middleware(object):
 
         if job:
             return job
-        else:
 
+        kwargs = private_args_kwargs(methodobj) if private_args else {}
+        start = time.monotonic()
+        path = None
+        error = True
+        try:
             # Currently its only a boolean
             if serviceobj._config.process_pool is True:
-                return await self._call_worker(serviceobj, name, *args)
-
-            if asyncio.iscoroutinefunction(methodobj):
-                return await methodobj(*args)
-
-            tpool = None
-            if serviceobj._config.thread_pool:
-                tpool = serviceobj._config.thread_pool
-            if hasattr(methodobj, '_thread_pool'):
-                tpool = methodobj._thread_pool
-            if tpool:
-                return await self.run_in_executor(tpool, methodobj, *args)
-
-            if io_thread:
-                run_method = self.run_in_thread
+                path = 'process_pool'
+                result = await self._call_worker(serviceobj, name, *args)
+            elif asyncio.iscoroutinefunction(methodobj):
+                path = 'coroutine'
+                result = await methodobj(*args, **kwargs)
             else:
-                run_method = self._run_in_conn_threadpool
-            return await run_method(methodobj, *args)
+                tpool = None
+                if serviceobj._config.thread_pool:
+                    tpool = serviceobj._config.thread_pool
+                if hasattr(methodobj, '_thread_pool'):
+                    tpool = methodobj._thread_pool
+                if tpool:
+                    path = 'thread_pool'
+                    result = await self.run_in_executor(tpool, methodobj, *args, **kwargs)
+                else:
+                    path = 'thread'
+                    if io_thread:
+                        run_method = self.run_in_thread
+                    else:
+                        run_method = self._run_in_conn_threadpool
+                    result = await run_method(methodobj, *args, **kwargs)
+            error = False
+            return result
+        finally:
+            if self.call_stats.enabled:
+                self.call_stats.add(name, path, time.monotonic() - start, error)
 
     async def _call_worker(self, serviceobj, name, *args, job=None):
-        return await self.run_in_proc(
+        stats, result, exc = await self.run_in_proc(
             main_worker,
             # For now only plugins in middlewared.plugins are supported
             f'middlewared.plugins.{serviceobj.__class__.__module__}',
@@ -996,6 +1223,10 @@ class Middleware(object):
             args,
             job,
         )
+        self.__procpool_stats[stats['pid']] = stats
+        if exc is not None:
+            raise exc
+        return result
 
     def _method_lookup(self, name):
         if '.' not in name:
@@ -1030,11 +1261,15 @@ class Middleware(object):
             app.send_error(message, errno.EACCES, 'Not authenticated')
             return
 
-        return await self._call(message['method'], serviceobj, methodobj, params, app=app, io_thread=False)
+        return await self._call(
+            message['method'], serviceobj, methodobj, params, app=app, io_thread=False, private_args=True,
+        )
 
-    async def call(self, name, *params, pipes=None, app=None):
+    async def call(self, name, *params, pipes=None, app=None, private_args=False):
         serviceobj, methodobj = self._method_lookup(name)
-        return await self._call(name, serviceobj, methodobj, params, app=app, pipes=pipes, io_thread=True)
+        return await self._call(
+            name, serviceobj, methodobj, params, app=app, pipes=pipes, io_thread=True, private_args=private_args,
+        )
 
     def call_sync(self, name, *params):
         """
@@ -1073,11 +1308,18 @@ class Middleware(object):
 
         self.logger.trace(f'Sending event "{event_type}":{kwargs}')
 
-        for sessionid, wsclient in list(self.__wsclients.items()):
-            try:
-                wsclient.send_event(name, event_type, **kwargs)
-            except Exception:
-                self.logger.warn('Failed to send event {} to {}'.format(name, sessionid), exc_info=True)
+        wsclients = self.__event_subscriptions.get(name, set()) | self.__event_subscriptions.get('*', set())
+        if wsclients:
+            # Encoded only once (per encoding) for all clients
+            event = event_message(name, event_type, **kwargs)
+            encoded = {}
+            for wsclient in wsclients:
+                try:
+                    if wsclient.encoding not in encoded:
+                        encoded[wsclient.encoding] = wsclient.encode(event)
+                    wsclient._send(event, encoded[wsclient.encoding])
+                except Exception:
+                    self.logger.warn('Failed to send event {} to {}'.format(name, wsclient.sessionid), exc_info=True)
 
         # Send event also for internally subscribed plugins
         for handler in self.__event_subs.get(name, []):
@@ -1095,7 +1337,10 @@ class Middleware(object):
         connection.on_open()
 
         async for msg in ws:
-            x = json.loads(msg.data)
+            if msg.type == web.WSMsgType.BINARY:
+                x = emsgpack.loads(msg.data)
+            else:
+                x = json.loads(msg.data)
             try:
                 await connection.on_message(x)
             except Exception as e:
@@ -1105,26 +1350,13 @@ class Middleware(object):
         await connection.on_close()
         return ws
 
-    def _loop_monitor_thread(self):
-        """
-        Thread responsible for checking current tasks that are taking too long
-        to finish and printing the stack.
-
-        DISCLAIMER/TODO: This is not free of race condition so it may show
-        false positives.
-        """
-        last = None
-        while True:
-            time.sleep(2)
-            current = asyncio.Task.current_task(loop=self.__loop)
-            if current is None:
-                last = None
-                continue
-            if last == current:
-                frame = sys._current_frames()[self.__thread_id]
-                stack = traceback.format_stack(frame, limit=10)
-                self.logger.warn(''.join(['Task seems blocked:'] + stack))
-            last = current
+    def get_loop_stats(self, reset=False):
+        if self.__loop_monitor is None:
+            return None
+        stats = self.__loop_monitor.get_stats()
+        if reset:
+            self.__loop_monitor.reset()
+        return stats
 
     def run(self):
         self.loop = self.__loop = asyncio.get_event_loop()
@@ -1140,7 +1372,12 @@ class Middleware(object):
         if self.loop_monitor:
             # Start monitor thread after plugins have been loaded
             # because of the time spent doing I/O
-            t = threading.Thread(target=self._loop_monitor_thread)
+            self.__loop_monitor = LoopMonitor(self.__loop, self.__thread_id, {
+                # Frames of the middleware method being run, to tell which one blocks the loop
+                Middleware._call.__code__: lambda frame: frame.f_locals['name'],
+                Job._Job__run_body.__code__: lambda frame: frame.f_locals['self'].method_name,
+            })
+            t = threading.Thread(target=self.__loop_monitor.run)
             t.setDaemon(True)
             t.start()
 
@@ -1221,6 +1458,12 @@ def main():
     parser.add_argument('--disable-loop-monitor', '-L', action='store_true')
     parser.add_argument('--loop-debug', action='store_true')
     parser.add_argument('--overlay-dirs', '-o', action='append')
+    parser.add_argument('--process-pool-size', type=int, default=2,
+                        help='Number of worker processes for process pool services and jobs')
+    parser.add_argument('--disable-call-stats', action='store_true',
+                        help='Do not keep per-method call counters (core.get_call_stats)')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Log time spent importing, resolving schemas and setting up every plugin')
     parser.add_argument('--debug-level', choices=[
         'TRACE',
         'DEBUG',
@@ -1270,6 +1513,9 @@ def main():
         loop_monitor=not args.disable_loop_monitor,
         overlay_dirs=args.overlay_dirs,
         debug_level=args.debug_level,
+        profile_startup=args.profile_startup,
+        process_pool_size=args.process_pool_size,
+        call_stats=not args.disable_call_stats,
     ).run()
 
 
@@ -4,6 +4,8 @@ from middlewared.service import (
 )
 from middlewared.utils import run, Popen
 
+from collections import defaultdict
+
 import asyncio
 import binascii
 import crypt
@@ -63,29 +65,51 @@ def nt_password(cleartext):
     return binascii.hexlify(nthash).decode().upper()
 
 
+def membership_filters(field, rows):
+    """
+    Filters to query the rows related to `rows`. For big lists every row is queried
+    instead to stay under the maximum number of SQL variables.
+    """
+    if len(rows) > 500:
+        return []
+    return [(field, 'in', [row['id'] for row in rows])]
+
+
 class UserService(CRUDService):
 
     class Config:
         datastore = 'account.bsdusers'
-        datastore_extend = 'user.user_extend'
+        datastore_extend_batch = 'user.user_extend_batch'
         datastore_prefix = 'bsdusr_'
 
     @private
-    async def user_extend(self, user):
+    async def user_extend_batch(self, users):
 
         # Get group membership
-        user['groups'] = [gm['group']['id'] for gm in await self.middleware.call('datastore.query', 'account.bsdgroupmembership', [('user', '=', user['id'])], {'prefix': 'bsdgrpmember_'})]
+        groups = defaultdict(list)
+        for gm in await self.middleware.call(
+            'datastore.query', 'account.bsdgroupmembership', membership_filters('user', users),
+            {'prefix': 'bsdgrpmember_'}
+        ):
+            groups[gm['user']['id']].append(gm['group']['id'])
 
         # Get authorized keys
-        keysfile = f'{user["home"]}/.ssh/authorized_keys'
-        user['sshpubkey'] = None
-        if os.path.exists(keysfile):
-            try:
-                with open(keysfile, 'r') as f:
-                    user['sshpubkey'] = f.read()
-            except Exception:
-                pass
-        return user
+        def read_sshpubkeys():
+            for user in users:
+                keysfile = f'{user["home"]}/.ssh/authorized_keys'
+                user['sshpubkey'] = None
+                if os.path.exists(keysfile):
+                    try:
+                        with open(keysfile, 'r') as f:
+                            user['sshpubkey'] = f.read()
+                    except Exception:
+                        pass
+
+        await self.middleware.run_in_thread(read_sshpubkeys)
+
+        for user in users:
+            user['groups'] = groups[user['id']]
+        return users
 
     @accepts(Dict(
         'user_create',
@@ -591,14 +615,27 @@ class GroupService(CRUDService):
     class Config:
         datastore = 'account.bsdgroups'
         datastore_prefix = 'bsdgrp_'
-        datastore_extend = 'group.group_extend'
+        datastore_extend_batch = 'group.group_extend_batch'
 
     @private
-    async def group_extend(self, group):
+    async def group_extend_batch(self, groups):
         # Get group membership
-        group['users'] = [gm['user']['id'] for gm in await self.middleware.call('datastore.query', 'account.bsdgroupmembership', [('group', '=', group['id'])], {'prefix': 'bsdgrpmember_'})]
-        group['users'] += [gmu['id'] for gmu in await self.middleware.call('datastore.query', 'account.bsdusers', [('bsdusr_group_id', '=', group['id'])])]
-        return group
+        users = defaultdict(list)
+        for gm in await self.middleware.call(
+            'datastore.query', 'account.bsdgroupmembership', membership_filters('group', groups),
+            {'prefix': 'bsdgrpmember_'}
+        ):
+            users[gm['group']['id']].append(gm['user']['id'])
+        # Users whose primary group it is
+        for gmu in await self.middleware.call(
+            'datastore.query', 'account.bsdusers', membership_filters('bsdusr_group_id', groups),
+            {'select': ['id', 'bsdusr_group']}
+        ):
+            users[gmu['bsdusr_group']['id']].append(gmu['id'])
+
+        for group in groups:
+            group['users'] = users[group['id']]
+        return groups
 
     @accepts(Dict(
         'group_create',
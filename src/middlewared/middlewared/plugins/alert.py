@@ -1,11 +1,15 @@
+import asyncio
 from collections import defaultdict
 import copy
 from datetime import datetime
 import os
+import re
+import time
 import traceback
 
 from freenasUI.support.utils import get_license
 from licenselib.license import ContractType
+import libzfs
 
 from middlewared.alert.base import (
     AlertLevel,
@@ -23,15 +27,40 @@ from middlewared.service import (
     job, periodic, private,
 )
 from middlewared.service_exception import CallError
-from middlewared.utils import load_modules, load_classes
+from middlewared.utils import load_modules, load_classes, run
+from middlewared.utils.asyncio_ import asyncio_map
+from middlewared.validators import Range
 
 POLICIES = ["IMMEDIATELY", "HOURLY", "DAILY", "NEVER"]
 DEFAULT_POLICY = "IMMEDIATELY"
 
+# Seconds pools state is shared between alert sources, shorter than the `process_alerts` interval
+POOLS_STATE_TTL = 30
+
 ALERT_SOURCES = {}
 ALERT_SERVICES_FACTORIES = {}
 
 
+def parse_zpool_status_x(output):
+    """
+    Parse `zpool status -x` output (same as `notifier.zpool_status` for every pool at once).
+
+    Yields (pool, state, status) of pools which are not healthy.
+    """
+    for block in re.split(r"^\s*pool: ", output, flags=re.M)[1:]:
+        name = block.split("\n", 1)[0].strip()
+
+        reg = re.search(r"^\s*state: (\w+)", block, re.M)
+        state = reg.group(1) if reg else "UNKNOWN"
+
+        status = ""
+        reg = re.search(r"^\s*status: (.+)\n\s*action+:", block, re.S | re.M)
+        if reg:
+            status = re.sub(r"\s+", " ", reg.group(1))
+
+        yield name, state, status
+
+
 class AlertPolicy:
     def __init__(self, key=lambda now: now):
         self.key = key
@@ -60,14 +89,32 @@ class AlertPolicy:
 
 
 class AlertService(Service):
+    # Default of how many alert sources are checked at the same time, see `set_sources_concurrency`
+    SOURCES_CONCURRENCY = 8
+
     def __init__(self, middleware):
         super().__init__(middleware)
 
         self.node = "A"
 
+        self.sources_concurrency = self.SOURCES_CONCURRENCY
+
         self.alerts = defaultdict(lambda: defaultdict(dict))
 
         self.alert_source_last_run = defaultdict(lambda: datetime.min)
+        # Checks that did not finish in time, they are not started again until they do
+        self.alert_source_checks = {}
+        self.alert_source_stats = defaultdict(lambda: {
+            "runs": 0,
+            "failures": 0,
+            "timeouts": 0,
+            "last_duration": None,
+            "max_duration": None,
+            "total_duration": 0,
+        })
+
+        self.pools_state_cache = None
+        self.pools_state_lock = asyncio.Lock()
 
         self.policies = {
             "IMMEDIATELY": AlertPolicy(),
@@ -139,6 +186,34 @@ class AlertService(Service):
             for alert in sorted(self.__get_all_alerts(), key=lambda alert: alert.title)
         ]
 
+    @accepts()
+    def source_stats(self):
+        """
+        Returns run statistics of alert sources checked on this node (durations are in seconds).
+
+        At most `alert.get_sources_concurrency` alert sources are checked at the same time.
+        """
+        return [
+            dict(stats, name=name, timeout=ALERT_SOURCES[name].run_timeout if name in ALERT_SOURCES else None)
+            for name, stats in sorted(self.alert_source_stats.items())
+        ]
+
+    @accepts()
+    def get_sources_concurrency(self):
+        """
+        Returns how many alert sources are checked at the same time.
+        """
+        return self.sources_concurrency
+
+    @accepts(Int("concurrency", validators=[Range(min=1)]))
+    def set_sources_concurrency(self, concurrency):
+        """
+        Set how many alert sources are checked at the same time (until middlewared restarts).
+
+        Takes effect the next time alerts are processed.
+        """
+        self.sources_concurrency = concurrency
+
     @accepts(Str("id"))
     def dismiss(self, id):
         node, source, key = id.split(";", 2)
@@ -278,67 +353,169 @@ class AlertService(Service):
                         if remote_failover_status == "BACKUP":
                             run_on_backup_node = True
 
+        alert_sources = []
         for alert_source in ALERT_SOURCES.values():
             if not alert_source.schedule.should_run(datetime.utcnow(), self.alert_source_last_run[alert_source.name]):
                 continue
 
             self.alert_source_last_run[alert_source.name] = datetime.utcnow()
+            alert_sources.append(alert_source)
+
+        await asyncio_map(
+            lambda alert_source: self.__run_alert_source(alert_source, master_node, backup_node, run_on_backup_node),
+            alert_sources,
+            self.sources_concurrency,
+        )
 
-            self.logger.trace("Running alert source: %r", alert_source.name)
+    async def __run_alert_source(self, alert_source, master_node, backup_node, run_on_backup_node):
+        self.logger.trace("Running alert source: %r", alert_source.name)
 
+        try:
+            alerts_a = await self.__run_source(alert_source.name)
+        except UnavailableException:
+            alerts_a = list(self.alerts["A"][alert_source.name].values())
+        for alert in alerts_a:
+            alert.node = master_node
+
+        alerts_b = []
+        if run_on_backup_node and alert_source.run_on_backup_node:
             try:
-                alerts_a = await self.__run_source(alert_source.name)
-            except UnavailableException:
-                alerts_a = list(self.alerts["A"][alert_source.name].values())
-            for alert in alerts_a:
-                alert.node = master_node
-
-            alerts_b = []
-            if run_on_backup_node and alert_source.run_on_backup_node:
                 try:
-                    try:
-                        alerts_b = await self.middleware.call("failover.call_remote", "alert.run_source",
-                                                              [alert_source.name])
-                    except CallError as e:
-                        if e.errno == CallError.EALERTCHECKERUNAVAILABLE:
-                            alerts_b = list(self.alerts["B"][alert_source.name].values())
-                        else:
-                            raise
+                    alerts_b = await asyncio.wait_for(
+                        self.middleware.call("failover.call_remote", "alert.run_source", [alert_source.name]),
+                        # Allow for the remote call itself on top of the time budget of the source
+                        alert_source.run_timeout + 10,
+                    )
+                except asyncio.TimeoutError:
+                    self.logger.warning("Alert source %r timed out on backup node", alert_source.name)
+                    alerts_b = list(self.alerts["B"][alert_source.name].values())
+                except CallError as e:
+                    if e.errno == CallError.EALERTCHECKERUNAVAILABLE:
+                        alerts_b = list(self.alerts["B"][alert_source.name].values())
                     else:
-                        alerts_b = [Alert(**dict(alert,
-                                                 level=(AlertLevel(alert["level"]) if alert["level"] is not None
-                                                        else alert["level"])))
-                                    for alert in alerts_b]
-                except Exception:
-                    alerts_b = [
-                        Alert(title="Unable to run alert source %(source_name)r on backup node\n%(traceback)s",
-                              args={
-                                  "source_name": alert_source.name,
-                                  "traceback": traceback.format_exc(),
-                              },
-                              key="__remote_call_exception__",
-                              level=AlertLevel.CRITICAL)
-                    ]
-            for alert in alerts_b:
-                alert.node = backup_node
-
-            for alert in alerts_a + alerts_b:
-                existing_alert = self.alerts[alert.node][alert_source.name].get(alert.key)
-
-                alert.source = alert_source.name
-                if existing_alert is None:
-                    alert.datetime = datetime.utcnow()
-                else:
-                    alert.datetime = existing_alert.datetime
-                alert.level = alert.level or alert_source.level
-                alert.title = alert.title or alert_source.title
-                if existing_alert is None:
-                    alert.dismissed = False
+                        raise
                 else:
-                    alert.dismissed = existing_alert.dismissed
+                    alerts_b = [Alert(**dict(alert,
+                                             level=(AlertLevel(alert["level"]) if alert["level"] is not None
+                                                    else alert["level"])))
+                                for alert in alerts_b]
+            except Exception:
+                alerts_b = [
+                    Alert(title="Unable to run alert source %(source_name)r on backup node\n%(traceback)s",
+                          args={
+                              "source_name": alert_source.name,
+                              "traceback": traceback.format_exc(),
+                          },
+                          key="__remote_call_exception__",
+                          level=AlertLevel.CRITICAL)
+                ]
+        for alert in alerts_b:
+            alert.node = backup_node
+
+        for alert in alerts_a + alerts_b:
+            existing_alert = self.alerts[alert.node][alert_source.name].get(alert.key)
+
+            alert.source = alert_source.name
+            if existing_alert is None:
+                alert.datetime = datetime.utcnow()
+            else:
+                alert.datetime = existing_alert.datetime
+            alert.level = alert.level or alert_source.level
+            alert.title = alert.title or alert_source.title
+            if existing_alert is None:
+                alert.dismissed = False
+            else:
+                alert.dismissed = existing_alert.dismissed
+
+        self.alerts["A"][alert_source.name] = {alert.key: alert for alert in alerts_a}
+        self.alerts["B"][alert_source.name] = {alert.key: alert for alert in alerts_b}
 
-            self.alerts["A"][alert_source.name] = {alert.key: alert for alert in alerts_a}
-            self.alerts["B"][alert_source.name] = {alert.key: alert for alert in alerts_b}
+    @private
+    async def pools_state(self):
+        """
+        Returns state of pools by name, shared by alert sources.
+
+        State of every imported pool is gathered at once (one libzfs handle and one `zpool status -x`)
+        and reused for `POOLS_STATE_TTL` seconds instead of each source querying each pool.
+        `configured` tells whether the pool is a volume configured in the database (as
+        opposed to the boot pool).
+
+        Configured volumes which are not imported (missing or failed to import) are included
+        with `imported` unset and `UNKNOWN` state, unless they are locked (encrypted and not decrypted).
+        """
+        async with self.pools_state_lock:
+            if self.pools_state_cache is None or time.monotonic() - self.pools_state_cache[0] > POOLS_STATE_TTL:
+                volumes = await self.middleware.call("datastore.query", "storage.volume", [], {"prefix": "vol_"})
+
+                pools = await self.middleware.run_in_thread(self.__pools_state)
+
+                unhealthy = {}
+                cp = await run("/sbin/zpool", "status", "-x", check=False)
+                for name, state, status in parse_zpool_status_x(cp.stdout.decode("utf8", "ignore")):
+                    unhealthy[name] = (state, status)
+
+                configured = {volume["name"] for volume in volumes}
+                for pool in pools.values():
+                    pool["configured"] = pool["name"] in configured
+                    pool["imported"] = True
+                    pool["state"], pool["status"] = unhealthy.get(pool["name"], ("HEALTHY", ""))
+
+                missing = [volume for volume in volumes if volume["name"] not in pools]
+                encrypted_disks = defaultdict(list)
+                if any(volume["encrypt"] > 0 for volume in missing):
+                    for ed in await self.middleware.call("datastore.query", "storage.encrypteddisk"):
+                        encrypted_disks[ed["encrypted_volume"]["id"]].append(ed)
+
+                locked = await self.middleware.run_in_thread(self.__locked_volumes, missing, encrypted_disks)
+                for volume in missing:
+                    if volume["name"] in locked:
+                        continue
+
+                    pools[volume["name"]] = {
+                        "name": volume["name"],
+                        "capacity": None,
+                        "scrub_paused": False,
+                        "upgraded": True,
+                        "configured": True,
+                        "imported": False,
+                        "state": "UNKNOWN",
+                        "status": "The volume is not imported, its disks may be missing or it failed to import",
+                    }
+
+                self.pools_state_cache = (time.monotonic(), pools)
+
+            return self.pools_state_cache[1]
+
+    def __locked_volumes(self, volumes, encrypted_disks):
+        # Encrypted volumes are locked until every geli provider is attached
+        return {
+            volume["name"]
+            for volume in volumes
+            if volume["encrypt"] > 0 and not all(
+                os.path.exists(f"/dev/{ed['encrypted_provider']}.eli") for ed in encrypted_disks[volume["id"]]
+            )
+        }
+
+    def __pools_state(self):
+        pools = {}
+        with libzfs.ZFS() as zfs:
+            for pool in zfs.pools:
+                properties = pool.properties
+                try:
+                    capacity = int(properties["capacity"].rawvalue)
+                except (KeyError, ValueError):
+                    capacity = None
+
+                pools[pool.name] = {
+                    "name": pool.name,
+                    "capacity": capacity,
+                    "scrub_paused": pool.scrub.pause is not None,
+                    # Pools with a legacy version number have not been upgraded to feature flags
+                    "upgraded": properties["version"].value == "-" and all(
+                        feature.state.name in ("ACTIVE", "ENABLED") for feature in pool.features
+                    ),
+                }
+        return pools
 
     @private
     async def run_source(self, source_name):
@@ -350,12 +527,31 @@ class AlertService(Service):
 
     async def __run_source(self, source_name):
         alert_source = ALERT_SOURCES[source_name]
+        stats = self.alert_source_stats[source_name]
+
+        check = self.alert_source_checks.get(source_name)
+        if check is not None:
+            if not check.done():
+                self.logger.warning("Alert source %r is still running", source_name)
+                raise UnavailableException()
+            self.alert_source_checks.pop(source_name)
 
+        start = time.monotonic()
+        check = asyncio.ensure_future(alert_source.check())
         try:
-            alerts = (await alert_source.check()) or []
+            # Shield the check so a timed out threaded check can not be started again while it is still running
+            alerts = (await asyncio.wait_for(asyncio.shield(check), alert_source.run_timeout)) or []
+        except asyncio.TimeoutError:
+            stats["timeouts"] += 1
+            self.logger.warning("Alert source %r timed out after %d seconds", source_name, alert_source.run_timeout)
+            self.alert_source_checks[source_name] = check
+            # Retrieve the result of the check when it finishes so its exception is not logged as never retrieved
+            check.add_done_callback(lambda f: f.cancelled() or f.exception())
+            raise UnavailableException()
         except UnavailableException:
             raise
         except Exception:
+            stats["failures"] += 1
             alerts = [
                 Alert(title="Unable to run alert source %(source_name)r\n%(traceback)s",
                       args={
@@ -368,6 +564,13 @@ class AlertService(Service):
         else:
             if not isinstance(alerts, list):
                 alerts = [alerts]
+        finally:
+            duration = time.monotonic() - start
+            if check.done():
+                stats["runs"] += 1
+                stats["last_duration"] = duration
+                stats["max_duration"] = max(stats["max_duration"] or 0, duration)
+                stats["total_duration"] += duration
 
         return alerts
 
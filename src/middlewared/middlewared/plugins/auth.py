@@ -1,4 +1,7 @@
 import crypt
+import hashlib
+import hmac
+import os
 import socket
 import subprocess
 import time
@@ -63,11 +66,49 @@ class AuthTokens(object):
             self.__sessionid_map.pop(sessionid, None)
 
 
+class VerifiedCredentials(object):
+    """
+    Memory-only cache of credentials verified recently so clients authenticating
+    on every request (e.g. RESTful API) do not pay `crypt` each time.
+
+    Passwords are not kept, only an HMAC of them with a per-process random key.
+    An entry is only valid for the stored password hash it was verified against,
+    so it is invalidated as soon as the password is changed.
+    """
+
+    TTL = 60
+
+    def __init__(self):
+        self.__key = os.urandom(32)
+        self.__entries = {}
+
+    def __digest(self, password):
+        return hmac.new(self.__key, password.encode('utf8'), hashlib.sha256).digest()
+
+    def verified(self, username, password, unixhash):
+        entry = self.__entries.get(username)
+        if entry is None:
+            return False
+        digest, stored_unixhash, expires = entry
+        if stored_unixhash != unixhash or expires < time.monotonic():
+            self.__entries.pop(username, None)
+            return False
+        return hmac.compare_digest(digest, self.__digest(password))
+
+    def add(self, username, password, unixhash):
+        now = time.monotonic()
+        for k, v in list(self.__entries.items()):
+            if v[2] < now:
+                self.__entries.pop(k, None)
+        self.__entries[username] = (self.__digest(password), unixhash, now + self.TTL)
+
+
 class AuthService(Service):
 
     def __init__(self, *args, **kwargs):
         super(AuthService, self).__init__(*args, **kwargs)
         self.authtokens = AuthTokens()
+        self.credentials = VerifiedCredentials()
 
     @accepts(Str('username'), Str('password'))
     async def check_user(self, username, password):
@@ -80,9 +121,15 @@ class AuthService(Service):
             user = await self.middleware.call('datastore.query', 'account.bsdusers', [('bsdusr_username', '=', username)], {'get': True})
         except IndexError:
             return False
-        if user['bsdusr_unixhash'] in ('x', '*'):
+        unixhash = user['bsdusr_unixhash']
+        if unixhash in ('x', '*'):
             return False
-        return crypt.crypt(password, user['bsdusr_unixhash']) == user['bsdusr_unixhash']
+        if self.credentials.verified(username, password, unixhash):
+            return True
+        if crypt.crypt(password, unixhash) == unixhash:
+            self.credentials.add(username, password, unixhash)
+            return True
+        return False
 
     @accepts(Int('ttl', required=False), Dict('attrs', additional_attrs=True))
     def generate_token(self, ttl=None, attrs=None):
@@ -95,6 +142,21 @@ class AuthService(Service):
     def get_token(self, token_id):
         return self.authtokens.get_token(token_id)
 
+    @private
+    def check_token(self, token_id):
+        """
+        Verify a token used to authenticate a single request (e.g. RESTful API),
+        refreshing its last use time.
+        """
+        token = self.authtokens.get_token(token_id)
+        if token is None:
+            return False
+        if int(time.time()) - token['ttl'] < token['last']:
+            token['last'] = int(time.time())
+            return True
+        self.authtokens.pop_token(token['id'])
+        return False
+
     @no_auth_required
     @accepts(Str('username'), Str('password'))
     @pass_app
@@ -188,7 +188,7 @@ class CertificateService(CRUDService):
 
     class Config:
         datastore = 'system.certificate'
-        datastore_extend = 'certificate.cert_extend'
+        datastore_extend_batch = 'certificate.cert_extend_batch'
         datastore_prefix = 'cert_'
 
     def __init__(self, *args, **kwargs):
@@ -203,23 +203,42 @@ class CertificateService(CRUDService):
     @private
     async def cert_extend(self, cert):
         """Extend certificate with some useful attributes."""
+        return (await self.cert_extend_batch([cert]))[0]
 
-        if cert.get('signedby'):
+    @private
+    async def cert_extend_batch(self, certs):
+        """Extend a list of certificates with some useful attributes."""
+
+        signedby_ids = {cert['signedby']['id'] for cert in certs if cert.get('signedby')}
+        if signedby_ids:
 
             # We query for signedby again to make sure it's keys do not have the "cert_" prefix and it has gone through
             # the cert_extend method
 
-            cert['signedby'] = await self.middleware.call(
-                'datastore.query',
-                'system.certificateauthority',
-                [('id', '=', cert['signedby']['id'])],
-                {
-                    'prefix': 'cert_',
-                    'extend': 'certificate.cert_extend',
-                    'get': True
-                }
-            )
+            cas = {
+                ca['id']: ca
+                for ca in await self.middleware.call(
+                    'datastore.query',
+                    'system.certificateauthority',
+                    [('id', 'in', list(signedby_ids))],
+                    {
+                        'prefix': 'cert_',
+                        'extend_batch': 'certificate.cert_extend_batch',
+                    }
+                )
+            }
+            for cert in certs:
+                if cert.get('signedby'):
+                    cert['signedby'] = dict(cas[cert['signedby']['id']])
 
+        def extend():
+            for cert in certs:
+                self.__cert_extend_attributes(cert)
+
+        await self.middleware.run_in_thread(extend)
+        return certs
+
+    def __cert_extend_attributes(self, cert):
         # convert san to list
         cert['san'] = (cert.pop('san', '') or '').split()
         if cert['serial'] is not None:
@@ -322,8 +341,6 @@ class CertificateService(CRUDService):
                 for c in obj.get_subject().get_components()
             ])
 
-        return cert
-
     # HELPER METHODS
 
     @private
@@ -776,7 +793,7 @@ class CertificateAuthorityService(CRUDService):
 
     class Config:
         datastore = 'system.certificateauthority'
-        datastore_extend = 'certificate.cert_extend'
+        datastore_extend_batch = 'certificate.cert_extend_batch'
         datastore_prefix = 'cert_'
 
     def __init__(self, *args, **kwargs):
@@ -816,7 +833,7 @@ class CertificateAuthorityService(CRUDService):
                         [('signedby', '=', ca_id)],
                         {
                             'prefix': self._config.datastore_prefix,
-                            'extend': self._config.datastore_extend
+                            'extend_batch': self._config.datastore_extend_batch
                         }
                     )
                 ]
@@ -1,5 +1,5 @@
 from middlewared.service import CallError, Service
-from middlewared.schema import accepts, Any, Bool, Dict, List, Ref, Str
+from middlewared.schema import accepts, Any, Bool, Dict, Int, List, Ref, Str
 from sqlite3 import OperationalError
 
 import os
@@ -15,17 +15,19 @@ if not apps.ready:
     django.setup()
 
 from django.apps import apps
-from django.db import connection
+from django.db import connection, transaction
 from django.db.models import Q
 from django.db.models.fields.related import ForeignKey, ManyToManyField
 
 # FIXME: django sqlite3_ha backend uses a thread to sync queries to the
-# standby node. That does not play very well with gevent+middleware
-# if that "thread" is still running and the originating connection closes.
+# standby node. Make middleware queries wait for them to be sent instead of
+# leaving them to that thread.
 from freenasUI.freeadmin.sqlite3_ha import base as sqlite3_ha_base
 sqlite3_ha_base.execute_sync = True
+# We get CARP state change events directly, see `setup`
+sqlite3_ha_base.FailoverStatus.watch = False
 
-from middlewared.utils import django_modelobj_serialize
+from middlewared.utils import django_modelobj_serialize, select_fields
 
 
 class DatastoreService(Service):
@@ -84,9 +86,23 @@ class DatastoreService(Service):
         app, model = name.split('.', 1)
         return apps.get_model(app, model)
 
-    def __queryset_serialize(self, qs, extend=None, field_prefix=None):
+    def __queryset_serialize(self, qs, extend=None, field_prefix=None, select=None):
         for i in qs:
-            yield django_modelobj_serialize(self.middleware, i, extend=extend, field_prefix=field_prefix)
+            yield django_modelobj_serialize(self.middleware, i, extend=extend, field_prefix=field_prefix, select=select)
+
+    def __select_fields(self, model, select, prefix):
+        """
+        Map `select` option to model field names (prefixed if needed).
+        Unknown fields are ignored.
+        """
+        fields = {field.name for field in chain(model._meta.fields, model._meta.many_to_many)}
+        rv = set()
+        for name in select:
+            if prefix and name != 'id':
+                name = prefix + name
+            if name in fields:
+                rv.add(name)
+        return rv
 
     @accepts(
         Str('name'),
@@ -94,10 +110,14 @@ class DatastoreService(Service):
         Dict(
             'query-options',
             Str('extend'),
+            Str('extend_batch'),
             Dict('extra', additional_attrs=True),
             List('order_by'),
+            List('select'),
             Bool('count'),
             Bool('get'),
+            Int('offset'),
+            Int('limit'),
             Str('prefix'),
             register=True,
         ),
@@ -120,6 +140,13 @@ class DatastoreService(Service):
 
         `[ ['username', '=', 'root' ] ]`
 
+        `options` accepts `order_by` (list of fields, prefixed with `-` for descending order),
+        `offset` and `limit` to paginate, `select` to return only the given fields,
+        `count` and `get`.
+
+        `extend` is a method called for every row returned while `extend_batch` is a
+        method called only once with the list of all rows, returning the extended list.
+
         .. examples(websocket)::
 
           Querying for username "root" and returning a single item:
@@ -166,12 +193,46 @@ class DatastoreService(Service):
         if options.get('count') is True:
             return qs.count()
 
+        extend = options.get('extend')
+        extend_batch = options.get('extend_batch')
+
+        select = None
+        if options.get('select') and not extend and not extend_batch:
+            # `extend` may rely on any field so we can only select after it
+            select = self.__select_fields(model, options['select'], prefix)
+            qs = qs.only(*[
+                name for name in select if not isinstance(model._meta.get_field(name), ManyToManyField)
+            ])
+
+        # Fetch related objects in one query per relation instead of one per row.
+        # prefetch_related is used for ForeignKey as well because select_related
+        # would drop rows pointing to a missing object.
+        related = [
+            field.name for field in chain(model._meta.fields, model._meta.many_to_many)
+            if isinstance(field, (ForeignKey, ManyToManyField)) and (select is None or field.name in select)
+        ]
+        if related:
+            qs = qs.prefetch_related(*related)
+
+        offset = options.get('offset') or 0
+        limit = options.get('limit')
+        if options.get('get') is True:
+            limit = 1
+        if offset or limit:
+            qs = qs[offset:offset + limit] if limit else qs[offset:]
+
         result = []
         for i in self.__queryset_serialize(
-            qs, extend=options.get('extend'), field_prefix=options.get('prefix')
+            qs, extend=None if extend_batch else extend, field_prefix=options.get('prefix'), select=select,
         ):
             result.append(i)
 
+        if extend_batch and result:
+            result = self.middleware.call_sync(extend_batch, result)
+
+        if options.get('select') and (extend or extend_batch):
+            result = [select_fields(i, options['select']) for i in result]
+
         if options.get('get') is True:
             return result[0]
 
@@ -292,6 +353,25 @@ class DatastoreService(Service):
             cursor.close()
         return rv
 
+    def sql_batch(self, queries):
+        """
+        Run a list of `[query, params]` within a single transaction, e.g. queries
+        replicated in batches from the other node.
+        """
+        cursor = connection.cursor()
+        try:
+            with transaction.atomic():
+                for query, params in queries:
+                    if params is None:
+                        cursor.executelocal(query)
+                    else:
+                        cursor.executelocal(query, params)
+        except OperationalError as err:
+            raise CallError(err)
+        finally:
+            cursor.close()
+        return True
+
     @accepts(List('queries'))
     def restore(self, queries):
         """
@@ -300,6 +380,47 @@ class DatastoreService(Service):
         """
         return connection.dump_recv(queries)
 
+    @accepts()
+    def dump_checksums(self):
+        """
+        Returns a checksum of every table synced between nodes.
+        """
+        return connection.dump_checksums()
+
+    @accepts(List('tables', items=[Str('table')]))
+    def dump_tables(self, tables):
+        """
+        Dumps the rows of `tables` as `{table: {"fields": [...], "rows": [[...]]}}`.
+        """
+        return connection.dump_tables(tables)
+
+    @accepts(Dict('tables', additional_attrs=True))
+    def restore_tables(self, tables):
+        """
+        Receives tables dumped by `datastore.dump_tables` and replaces them
+        within a transaction.
+        """
+        return connection.dump_tables_recv(tables)
+
+    @accepts()
+    def sync_remote(self):
+        """
+        Sends to the other node only the tables whose checksum differ from
+        the local ones, instead of the whole database dump.
+
+        Returns the list of tables sent.
+        """
+        remote = self.middleware.call_sync('failover.call_remote', 'datastore.dump_checksums')
+        tables = sorted(
+            table for table, checksum in connection.dump_checksums().items()
+            if remote.get(table) != checksum
+        )
+        if tables:
+            self.middleware.call_sync(
+                'failover.call_remote', 'datastore.restore_tables', [connection.dump_tables(tables)],
+            )
+        return tables
+
     @accepts()
     def dump(self):
         """
@@ -308,3 +429,12 @@ class DatastoreService(Service):
         # FIXME: This could return a few hundred KB of data,
         # we need to investigate a way of doing that in chunks.
         return connection.dump()
+
+
+async def _event_carp(middleware, event_type, args):
+    # Failover status of the django sqlite3_ha backend may have changed
+    sqlite3_ha_base.FailoverStatus.invalidate()
+
+
+def setup(middleware):
+    middleware.event_subscribe('devd.carp', _event_carp)
@@ -43,7 +43,7 @@ class DiskService(CRUDService):
     class Config:
         datastore = 'storage.disk'
         datastore_prefix = 'disk_'
-        datastore_extend = 'disk.disk_extend'
+        datastore_extend_batch = 'disk.disk_extend_batch'
 
     @filterable
     async def query(self, filters=None, options=None):
@@ -53,19 +53,27 @@ class DiskService(CRUDService):
             options = {}
         options['prefix'] = 'disk_'
         filters.append(('expiretime', '=', None))
-        options['extend'] = 'disk.disk_extend'
+        options['extend_batch'] = 'disk.disk_extend_batch'
         return await self.middleware.call('datastore.query', 'storage.disk', filters, options)
 
     @private
-    async def disk_extend(self, disk):
-        disk.pop('enabled', None)
-        disk['passwd'] = await self.middleware.call(
-            'notifier.pwenc_decrypt',
-            disk['passwd']
-        )
-        for key in ['acousticlevel', 'advpowermgmt', 'hddstandby']:
-            disk[key] = disk[key].upper()
-        return disk
+    async def disk_extend_batch(self, disks):
+        # Most disks have no password, decrypt the others in a single call
+        encrypted = [disk for disk in disks if disk['passwd']]
+        if encrypted:
+            passwords = await self.middleware.call(
+                'notifier.pwenc_decrypt_many', [disk['passwd'] for disk in encrypted]
+            )
+            for disk, passwd in zip(encrypted, passwords):
+                disk['passwd'] = passwd
+
+        for disk in disks:
+            disk.pop('enabled', None)
+            if not disk['passwd']:
+                disk['passwd'] = ''
+            for key in ['acousticlevel', 'advpowermgmt', 'hddstandby']:
+                disk[key] = disk[key].upper()
+        return disks
 
     @accepts(
         Str('id'),
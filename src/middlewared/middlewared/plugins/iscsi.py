@@ -672,7 +672,8 @@ class iSCSITargetExtentService(CRUDService):
 
         zvols = await self.middleware.call(
             'pool.dataset.query',
-            [('type', '=', 'VOLUME')]
+            [('type', '=', 'VOLUME')],
+            {'extra': {'flat': True, 'properties': ['volsize']}}
         )
 
         zvol_list = [ds['name'] for ds in zvols]
@@ -3,29 +3,31 @@ import os
 import time
 import subprocess as su
 
-import iocage_lib.iocage as ioc
-import libzfs
 import requests
 import itertools
 import pathlib
 import json
 import sqlite3
-from iocage_lib.ioc_check import IOCCheck
-from iocage_lib.ioc_clean import IOCClean
-from iocage_lib.ioc_fetch import IOCFetch
-from iocage_lib.ioc_image import IOCImage
-from iocage_lib.ioc_json import IOCJson
-# iocage's imports are per command, these are just general facilities
-from iocage_lib.ioc_list import IOCList
-from iocage_lib.ioc_upgrade import IOCUpgrade
 
 from middlewared.client import ClientException
 from middlewared.schema import Bool, Dict, Int, List, Str, accepts
 from middlewared.service import CRUDService, job, private
 from middlewared.service_exception import CallError, ValidationErrors
-from middlewared.utils import filter_list
+from middlewared.utils import LazyImport, filter_list
 from middlewared.validators import IpInUse, ShouldBe
 
+# iocage and libzfs are only imported once a jail method is called
+ioc = LazyImport('iocage_lib.iocage')
+libzfs = LazyImport('libzfs')
+IOCCheck = LazyImport('iocage_lib.ioc_check', 'IOCCheck')
+IOCClean = LazyImport('iocage_lib.ioc_clean', 'IOCClean')
+IOCFetch = LazyImport('iocage_lib.ioc_fetch', 'IOCFetch')
+IOCImage = LazyImport('iocage_lib.ioc_image', 'IOCImage')
+IOCJson = LazyImport('iocage_lib.ioc_json', 'IOCJson')
+# iocage's imports are per command, these are just general facilities
+IOCList = LazyImport('iocage_lib.ioc_list', 'IOCList')
+IOCUpgrade = LazyImport('iocage_lib.ioc_upgrade', 'IOCUpgrade')
+
 
 SHUTDOWN_LOCK = asyncio.Lock()
 
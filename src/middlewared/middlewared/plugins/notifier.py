@@ -91,6 +91,12 @@ class NotifierService(Service):
             )
             return ''
 
+    def pwenc_decrypt_many(self, encrypted):
+        """
+        `pwenc_decrypt` every item of the `encrypted` list in a single call.
+        """
+        return [self.pwenc_decrypt(i) for i in encrypted]
+
     def pwenc_encrypt(self, decrypted=None):
         """
         Wrapper method to avoid traceback.
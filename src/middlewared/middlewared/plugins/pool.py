@@ -1,3 +1,4 @@
+from collections import defaultdict
 import asyncio
 import errno
 import logging
@@ -203,7 +204,7 @@ class PoolService(CRUDService):
 
     class Config:
         datastore = 'storage.volume'
-        datastore_extend = 'pool.pool_extend'
+        datastore_extend_batch = 'pool.pool_extend_batch'
         datastore_prefix = 'vol_'
 
     @accepts()
@@ -215,7 +216,8 @@ class PoolService(CRUDService):
                 [
                     ('name', 'rnin', '.system'),
                     ('pool', 'in', vol_names)
-                ]
+                ],
+                {'extra': {'flat': True, 'properties': []}}
             )
         ]
 
@@ -241,41 +243,52 @@ class PoolService(CRUDService):
         return x
 
     @private
-    def pool_extend(self, pool):
+    def pool_extend_batch(self, pools):
 
         """
         If pool is encrypted we need to check if the pool is imported
         or if all geli providers exist.
         """
         try:
-            zpool = self.middleware.call_sync('zfs.pool.query', [('id', '=', pool['name'])])[0]
+            zpools = {
+                zpool['id']: zpool
+                for zpool in self.middleware.call_sync('zfs.pool.query', [('id', 'in', [p['name'] for p in pools])])
+            }
         except Exception:
-            zpool = None
+            zpools = {}
 
-        if zpool:
-            pool['status'] = zpool['status']
-            pool['scan'] = zpool['scan']
-            pool['topology'] = self._topology(zpool['groups'])
-        else:
-            pool.update({
-                'status': 'OFFLINE',
-                'scan': None,
-                'topology': None,
-            })
+        encrypted_disks = defaultdict(list)
+        if any(pool['encrypt'] > 0 and pool['name'] not in zpools for pool in pools):
+            for ed in self.middleware.call_sync('datastore.query', 'storage.encrypteddisk'):
+                encrypted_disks[ed['encrypted_volume']['id']].append(ed)
+
+        for pool in pools:
+            zpool = zpools.get(pool['name'])
 
-        if pool['encrypt'] > 0:
             if zpool:
-                pool['is_decrypted'] = True
+                pool['status'] = zpool['status']
+                pool['scan'] = zpool['scan']
+                pool['topology'] = self._topology(zpool['groups'])
             else:
-                decrypted = True
-                for ed in self.middleware.call_sync('datastore.query', 'storage.encrypteddisk', [('encrypted_volume', '=', pool['id'])]):
-                    if not os.path.exists(f'/dev/{ed["encrypted_provider"]}.eli'):
-                        decrypted = False
-                        break
-                pool['is_decrypted'] = decrypted
-        else:
-            pool['is_decrypted'] = True
-        return pool
+                pool.update({
+                    'status': 'OFFLINE',
+                    'scan': None,
+                    'topology': None,
+                })
+
+            if pool['encrypt'] > 0:
+                if zpool:
+                    pool['is_decrypted'] = True
+                else:
+                    decrypted = True
+                    for ed in encrypted_disks[pool['id']]:
+                        if not os.path.exists(f'/dev/{ed["encrypted_provider"]}.eli'):
+                            decrypted = False
+                            break
+                    pool['is_decrypted'] = decrypted
+            else:
+                pool['is_decrypted'] = True
+        return pools
 
     @item_method
     @accepts(Int('id', required=False))
@@ -511,15 +524,33 @@ class PoolDatasetService(CRUDService):
     class Config:
         namespace = 'pool.dataset'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # dataset name -> (mtime of its mountpoint, share type)
+        self.__share_types = {}
+
     @filterable
     def query(self, filters, options):
+        """
+        Query pool datasets.
+
+        `options.extra` accepts `properties`, `depth`, `flat` and `retrieve_children`
+        as described in `zfs.dataset.query`. `properties` use the names returned
+        by this method, e.g. `comments` or `deduplication`.
+        """
         # Otimization for cases in which they can be filtered at zfs.dataset.query
         zfsfilters = []
         for f in filters:
             if len(f) == 3:
                 if f[0] in ('id', 'name', 'pool', 'type'):
                     zfsfilters.append(f)
-        datasets = self.middleware.call_sync('zfs.dataset.query', zfsfilters, None)
+        extra = dict((options or {}).get('extra') or {})
+        if extra.get('properties'):
+            extra['properties'] = [
+                {'comments': 'org.freenas:description', 'deduplication': 'dedup'}.get(i, i)
+                for i in extra['properties']
+            ]
+        datasets = self.middleware.call_sync('zfs.dataset.query', zfsfilters, {'extra': extra})
         return filter_list(self.__transform(datasets), filters, options)
 
     def __transform(self, datasets):
@@ -528,7 +559,15 @@ class PoolDatasetService(CRUDService):
         making it match whatever pool.dataset.{create,update} uses as input.
         """
 
+        transformed = set()
+        share_types = self.get_share_types(self.__filesystems(datasets))
+
         def transform(dataset):
+            # Nested children are the same dicts as the listed datasets
+            if id(dataset) in transformed:
+                return dataset
+            transformed.add(id(dataset))
+
             for orig_name, new_name, method in (
                 ('org.freenas:description', 'comments', None),
                 ('dedup', 'deduplication', str.upper),
@@ -560,16 +599,12 @@ class PoolDatasetService(CRUDService):
             del dataset['properties']
 
             if dataset['type'] == 'FILESYSTEM':
-                dataset['share_type'] = self.middleware.call_sync(
-                    'notifier.get_dataset_share_type', dataset['name'],
-                ).upper()
+                dataset['share_type'] = share_types[dataset['name']].upper()
             else:
                 dataset['share_type'] = None
 
-            rv = []
-            for child in dataset['children']:
-                rv.append(transform(child))
-            dataset['children'] = rv
+            if 'children' in dataset:
+                dataset['children'] = [transform(child) for child in dataset['children']]
             return dataset
 
         rv = []
@@ -577,6 +612,60 @@ class PoolDatasetService(CRUDService):
             rv.append(transform(dataset))
         return rv
 
+    def __filesystems(self, datasets):
+        names = set()
+        stack = list(datasets)
+        while stack:
+            dataset = stack.pop()
+            if dataset['type'] == 'FILESYSTEM' and dataset['name'] not in names:
+                names.add(dataset['name'])
+                stack.extend(dataset.get('children') or [])
+        return names
+
+    @private
+    def get_share_types(self, names):
+        """
+        Returns share type of every dataset in `names` (same as `notifier.get_dataset_share_type`).
+
+        Share types are cached until they are changed through `pool.dataset` or the
+        mountpoint directory is modified (e.g. share type changed from the legacy UI).
+        """
+        rv = {}
+        for name in names:
+            if name in rv:
+                continue
+
+            path = f'/mnt/{name}'
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime = None
+
+            cached = self.__share_types.get(name)
+            if cached is not None and cached[0] == mtime:
+                rv[name] = cached[1]
+                continue
+
+            if os.path.exists(f'{path}/.windows'):
+                share_type = 'windows'
+            elif os.path.exists(f'{path}/.apple'):
+                share_type = 'mac'
+            else:
+                share_type = 'unix'
+
+            self.__share_types[name] = (mtime, share_type)
+            rv[name] = share_type
+        return rv
+
+    @private
+    def invalidate_share_type(self, name):
+        """
+        Forget cached share type of dataset `name` and its children.
+        """
+        for i in list(self.__share_types):
+            if i == name or i.startswith(f'{name}/'):
+                self.__share_types.pop(i, None)
+
     @accepts(Dict(
         'pool_dataset_create',
         Str('name', required=True),
@@ -668,6 +757,7 @@ class PoolDatasetService(CRUDService):
             await self.middleware.call(
                 'notifier.change_dataset_share_type', data['name'], data.get('share_type', 'UNIX').lower()
             )
+            await self.middleware.call('pool.dataset.invalidate_share_type', data['name'])
 
         return await self._get_instance(data['id'])
 
@@ -744,6 +834,7 @@ class PoolDatasetService(CRUDService):
             await self.middleware.call(
                 'notifier.change_dataset_share_type', id, data['share_type'].lower()
             )
+            await self.middleware.call('pool.dataset.invalidate_share_type', id)
         elif data['type'] == 'VOLUME' and 'volsize' in data:
             if await self.middleware.call('iscsi.extent.query', [('path', '=', f'zvol/{id}')]):
                 await self.middleware.call('service.reload', 'iscsitarget')
@@ -814,7 +905,10 @@ class PoolDatasetService(CRUDService):
 
     @accepts(Str('id'))
     async def do_delete(self, id):
-        return await self.middleware.call('zfs.dataset.delete', id)
+        try:
+            return await self.middleware.call('zfs.dataset.delete', id)
+        finally:
+            await self.middleware.call('pool.dataset.invalidate_share_type', id)
 
     @item_method
     @accepts(Str('id'))
@@ -386,7 +386,9 @@ class SharingSMBService(CRUDService):
 
     @accepts(Str('path', required=True))
     async def get_storage_tasks(self, path):
-        zfs_datasets = await self.middleware.call('zfs.dataset.query', [('type', '=', 'FILESYSTEM')])
+        zfs_datasets = await self.middleware.call(
+            'zfs.dataset.query', [('type', '=', 'FILESYSTEM')], {'extra': {'flat': True, 'properties': ['mountpoint']}}
+        )
         task_list = []
         task_dict = {}
 
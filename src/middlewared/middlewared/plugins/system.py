@@ -15,6 +15,7 @@ import subprocess
 import sys
 import sysctl
 import syslog
+import threading
 import time
 
 from licenselib.license import ContractType, Features
@@ -752,17 +753,70 @@ async def _event_zfs_status(middleware, event_type, args):
         await middleware.call('cache.pop', CACHE_POOLS_STATUSES)
 
 
-class SystemHealthEventSource(EventSource):
+class SystemHealthPublisher(object):
+    """
+    Samples system health every `delay` seconds in a single thread and broadcasts
+    the same payload to every `system.health` subscriber using that delay.
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._check_update = None
-        start_daemon_thread(target=self.check_update)
+    Publishers are started on the first subscription and stopped on the last one.
+    """
+
+    lock = threading.Lock()
+    publishers = {}
+
+    # Status of `update.check_available` shared by all publishers
+    update = None
+    update_checked = None
+    update_checking = False
+
+    def __init__(self, middleware, delay):
+        self.middleware = middleware
+        self.delay = delay
+        self.subscribers = set()
+        self._cancel = threading.Event()
+
+    @classmethod
+    def subscribe(cls, event_source, delay):
+        with cls.lock:
+            publisher = cls.publishers.get(delay)
+            if publisher is None:
+                publisher = cls.publishers[delay] = cls(event_source.middleware, delay)
+                start_daemon_thread(target=publisher.run)
+            publisher.subscribers.add(event_source)
+
+    @classmethod
+    def unsubscribe(cls, event_source, delay):
+        with cls.lock:
+            publisher = cls.publishers.get(delay)
+            if publisher is None:
+                return
+            publisher.subscribers.discard(event_source)
+            if not publisher.subscribers:
+                publisher._cancel.set()
+                cls.publishers.pop(delay)
 
     def check_update(self):
-        while not self._cancel.is_set():
-            self._check_update = self.middleware.call_sync('update.check_available')['status']
-            self._cancel.wait(timeout=60 * 60 * 24)
+        """
+        Check for updates at most once a day, in the background so samples are not delayed.
+        """
+        cls = self.__class__
+        with cls.lock:
+            if cls.update_checking or (
+                cls.update_checked is not None and time.monotonic() - cls.update_checked < 60 * 60 * 24
+            ):
+                return
+            cls.update_checking = True
+
+        def check():
+            try:
+                cls.update = self.middleware.call_sync('update.check_available')['status']
+            except Exception:
+                self.middleware.logger.debug('Failed to check for updates', exc_info=True)
+            finally:
+                cls.update_checked = time.monotonic()
+                cls.update_checking = False
+
+        start_daemon_thread(target=check)
 
     def pools_statuses(self):
         return {
@@ -771,25 +825,12 @@ class SystemHealthEventSource(EventSource):
         }
 
     def run(self):
-
-        try:
-            if self.arg:
-                delay = int(self.arg)
-            else:
-                delay = 10
-        except ValueError:
-            return
-
-        # Delay too slow
-        if delay < 5:
-            return
+        self.check_update()
 
         cp_time = sysctl.filter('kern.cp_time')[0].value
         cp_old = cp_time
 
-        while not self._cancel.is_set():
-            time.sleep(delay)
-
+        while not self._cancel.wait(timeout=self.delay):
             cp_time = sysctl.filter('kern.cp_time')[0].value
             cp_diff = list(map(lambda x: x[0] - x[1], zip(cp_time, cp_old)))
             cp_old = cp_time
@@ -803,12 +844,45 @@ class SystemHealthEventSource(EventSource):
                 self.pools_statuses,
             )
 
-            self.send_event('ADDED', fields={
+            self.check_update()
+
+            fields = {
                 'cpu_percent': cpu_percent,
                 'memory': psutil.virtual_memory()._asdict(),
                 'pools': pools,
-                'update': self._check_update,
-            })
+                'update': self.__class__.update,
+            }
+            with self.lock:
+                subscribers = list(self.subscribers)
+            for event_source in subscribers:
+                event_source.send_event('ADDED', fields=fields)
+
+
+class SystemHealthEventSource(EventSource):
+    """
+    Subscribers are attached to the `SystemHealthPublisher` of their delay,
+    no thread is kept per subscriber.
+    """
+
+    def attach(self):
+        try:
+            if self.arg:
+                delay = int(self.arg)
+            else:
+                delay = 10
+        except ValueError:
+            return False
+
+        # Delay too slow
+        if delay < 5:
+            return False
+
+        self.delay = delay
+        SystemHealthPublisher.subscribe(self, delay)
+        return True
+
+    def detach(self):
+        SystemHealthPublisher.unsubscribe(self, self.delay)
 
 
 def setup(middleware):
@@ -798,7 +798,9 @@ class VMService(CRUDService):
         """
         Return the shared pool for containers images.
         """
-        for dataset in await self.middleware.call('zfs.dataset.query'):
+        for dataset in await self.middleware.call(
+            'zfs.dataset.query', [], {'extra': {'flat': True, 'properties': []}}
+        ):
             if '.bhyve_containers' in dataset['name']:
                 return dataset['mountpoint']
         return False
@@ -9,14 +9,23 @@ from bsd import getmntinfo, geom
 import humanfriendly
 import libzfs
 
+from middlewared.common.zfs.dataset_query import datasets_state
+from middlewared.common.zfs.snapshot_catalog import LibzfsSnapshotBackend, SnapshotCatalog
 from middlewared.schema import Dict, List, Str, Bool, Int, accepts
 from middlewared.service import (
     CallError, CRUDService, Service, ValidationError, ValidationErrors,
-    filterable, job, periodic,
+    filterable, job, periodic, private,
 )
 from middlewared.utils import filter_list, start_daemon_thread
 
 SCAN_THREADS = {}
+# devd zfs events which may change the snapshot catalog
+SNAPSHOT_CATALOG_EVENTS = (
+    'misc.fs.zfs.history_event', 'misc.fs.zfs.config_sync', 'misc.fs.zfs.pool_destroy',
+    'misc.fs.zfs.pool_import',
+)
+# Seconds between two verifications of the snapshot catalog against zfs
+SNAPSHOT_CATALOG_VERIFY_INTERVAL = 30
 
 
 def find_vdev(pool, vname):
@@ -212,17 +221,57 @@ class ZFSDatasetService(CRUDService):
 
     @filterable
     def query(self, filters, options):
+        """
+        Query ZFS datasets.
+
+        Every dataset is returned with its descendants nested in `children` unless
+        `options.extra` says otherwise:
+
+        - properties: list of properties to retrieve, all of them by default.
+          An empty list retrieves none, e.g. when only names are needed.
+        - depth: how many levels below the pool root datasets (or the datasets
+          selected by an `id` filter) to retrieve, unlimited by default.
+        - flat: do not nest descendants in `children`.
+        - retrieve_children: set to false to not retrieve descendants at all,
+          same as a depth of 0.
+        """
+        extra = (options or {}).get('extra') or {}
         with libzfs.ZFS() as zfs:
-            # Handle `id` filter specially to avoiding getting all datasets
-            if filters and len(filters) == 1 and list(filters[0][:2]) == ['id', '=']:
-                try:
-                    datasets = [zfs.get_dataset(filters[0][2]).__getstate__()]
-                except libzfs.ZFSException:
-                    datasets = []
-            else:
-                datasets = [i.__getstate__() for i in zfs.datasets]
+            roots, by_name = self.__roots(zfs, filters)
+            datasets = datasets_state(
+                roots,
+                properties=extra.get('properties'),
+                depth=extra.get('depth') if extra.get('retrieve_children', True) else 0,
+                flat=extra.get('flat', False),
+                list_descendants=not by_name,
+            )
         return filter_list(datasets, filters, options)
 
+    def __roots(self, zfs, filters):
+        """
+        Use `id`/`name`/`pool` filters to avoid walking every dataset.
+
+        Returns the datasets to start walking from and whether they have been
+        selected by name, in which case their descendants can not match.
+        """
+        filters = filters or []
+        for f in filters:
+            if len(f) == 3 and f[0] in ('id', 'name') and f[1] in ('=', 'in'):
+                roots = []
+                for name in ([f[2]] if f[1] == '=' else f[2]):
+                    try:
+                        roots.append(zfs.get_dataset(name))
+                    except libzfs.ZFSException:
+                        pass
+                return roots, True
+
+        for f in filters:
+            if len(f) == 3 and f[0] == 'pool' and f[1] in ('=', 'in'):
+                pools = [f[2]] if f[1] == '=' else f[2]
+                return [pool.root_dataset for pool in zfs.pools if pool.name in pools], False
+
+        return [pool.root_dataset for pool in zfs.pools], False
+
     @accepts(Dict(
         'dataset_create',
         Str('name', required=True),
@@ -342,12 +391,52 @@ class ZFSSnapshot(CRUDService):
     class Config:
         namespace = 'zfs.snapshot'
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog = SnapshotCatalog(LibzfsSnapshotBackend())
+
     @filterable
     def query(self, filters, options):
-        with libzfs.ZFS() as zfs:
-            snapshots = [i.__getstate__() for i in list(zfs.snapshots)]
-        # FIXME: awful performance with hundreds/thousands of snapshots
-        return filter_list(snapshots, filters, options)
+        """
+        Query snapshots from the in-memory snapshot catalog.
+
+        Filtering by `id`, `name`, `dataset`, `pool` or `properties.creation.rawvalue`
+        uses the catalog indexes. Snapshots are returned in creation order.
+        """
+        return self.catalog.query(filters, options)
+
+    @periodic(SNAPSHOT_CATALOG_VERIFY_INTERVAL)
+    @private
+    def catalog_verify(self):
+        """
+        Catch up with snapshot changes we did not get an event for (e.g. autosnap) and
+        refresh space accounting properties of the snapshot catalog.
+        """
+        self.catalog.verify()
+
+    @private
+    def catalog_zfs_event(self, data):
+        """
+        Keep the snapshot catalog current with devd zfs events.
+        """
+        if data.get('type') == 'misc.fs.zfs.history_event':
+            name = data.get('history_dsname') or ''
+            operation = data.get('history_internal_name')
+            if not name:
+                return
+            if '@' in name:
+                if operation == 'destroy':
+                    self.catalog.remove(name)
+                elif operation in ('snapshot', 'set', 'inherit', 'hold', 'release'):
+                    self.catalog.add(name)
+                else:
+                    self.catalog.invalidate(name.split('/', 1)[0])
+            elif operation in ('destroy', 'rename', 'receive', 'rollback', 'promote', 'clone swap'):
+                # Snapshots of the dataset are affected as well
+                self.catalog.invalidate(name.split('/', 1)[0])
+        elif data.get('type') in SNAPSHOT_CATALOG_EVENTS:
+            if data.get('pool_name'):
+                self.catalog.invalidate(data['pool_name'])
 
     @accepts(Dict(
         'snapshot_create',
@@ -382,6 +471,15 @@ class ZFSSnapshot(CRUDService):
                 if vmsnaps_count > 0:
                     ds.properties['freenas:vmsynced'] = libzfs.ZFSUserProperty('Y')
 
+                # Only load the snapshots we just took into the catalog
+                datasets = [ds]
+                if recursive:
+                    for child in datasets:
+                        datasets.extend(child.children)
+                snapshots = [f'{child.name}@{name}' for child in datasets]
+
+            await self.middleware.run_in_thread(self.catalog.add_many, snapshots)
+
             self.logger.info(f"Snapshot taken: {dataset}@{name}")
             return True
         except libzfs.ZFSException as err:
@@ -412,6 +510,9 @@ class ZFSSnapshot(CRUDService):
             return False
         else:
             self.logger.info(f"Destroyed snapshot: {snapshot_name}")
+        finally:
+            # A deferred destroy may leave the snapshot around, reload it in that case
+            await self.middleware.run_in_thread(self.catalog.add, snapshot_name)
 
         return True
 
@@ -655,6 +756,9 @@ class ScanWatch(object):
 
 async def _handle_zfs_events(middleware, event_type, args):
     data = args['data']
+    if data.get('type') in SNAPSHOT_CATALOG_EVENTS:
+        await middleware.call('zfs.snapshot.catalog_zfs_event', data)
+
     if data.get('type') in ('misc.fs.zfs.resilver_start', 'misc.fs.zfs.scrub_start'):
         pool = data.get('pool_name')
         if not pool:
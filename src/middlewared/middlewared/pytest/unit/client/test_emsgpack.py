@@ -0,0 +1,31 @@
+from datetime import date, datetime, time, timezone
+
+import pytest
+
+from middlewared.client import emsgpack
+
+pytest.importorskip("msgpack")
+
+
+def test__emsgpack__round_trip():
+    message = {
+        "id": "1",
+        "msg": "result",
+        "result": [{"name": "tank", "size": 4000787030016, "healthy": True, "scan": None, 1: [1.5, "x"]}],
+    }
+
+    assert emsgpack.loads(emsgpack.dumps(message)) == message
+
+
+def test__emsgpack__date_time():
+    message = {
+        "date": date(2018, 3, 20),
+        "datetime": datetime(2018, 3, 20, 10, 30, 15, 250000),
+        "time": time(10, 30, 15),
+    }
+
+    assert emsgpack.loads(emsgpack.dumps(message)) == {
+        "date": date(2018, 3, 20),
+        "datetime": datetime(2018, 3, 20, 10, 30, 15, 250000, tzinfo=timezone.utc),
+        "time": time(10, 30, 15),
+    }
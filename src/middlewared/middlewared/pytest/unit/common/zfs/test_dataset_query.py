@@ -0,0 +1,66 @@
+from types import SimpleNamespace
+
+from middlewared.common.zfs.dataset_query import datasets_state
+
+
+class FakeProperty(object):
+
+    def __init__(self, value):
+        self.value = value
+        self.reads = 0
+
+    def __getstate__(self):
+        self.reads += 1
+        return {'value': self.value}
+
+
+def dataset(name, children=None):
+    return SimpleNamespace(
+        name=name,
+        type=SimpleNamespace(name='FILESYSTEM'),
+        mountpoint=f'/mnt/{name}',
+        properties={'used': FakeProperty('1K'), 'compression': FakeProperty('lz4')},
+        children=children or [],
+    )
+
+
+def tree():
+    return dataset('tank', [
+        dataset('tank/a', [dataset('tank/a/b')]),
+        dataset('tank/c'),
+    ])
+
+
+def test__datasets_state__nested():
+    rv = datasets_state([tree()])
+    assert [i['name'] for i in rv] == ['tank', 'tank/a', 'tank/a/b', 'tank/c']
+    assert [i['name'] for i in rv[0]['children']] == ['tank/a', 'tank/c']
+    # Children are not retrieved again for every ancestor
+    assert rv[0]['children'][0] is rv[1]
+    assert rv[0]['properties'] == {'used': {'value': '1K'}, 'compression': {'value': 'lz4'}}
+
+
+def test__datasets_state__flat_depth():
+    rv = datasets_state([tree()], depth=1, flat=True)
+    assert [i['name'] for i in rv] == ['tank', 'tank/a', 'tank/c']
+    assert all('children' not in i for i in rv)
+
+
+def test__datasets_state__properties():
+    root = tree()
+    rv = datasets_state([root], properties=['used', 'missing'], flat=True)
+    assert rv[0]['properties'] == {'used': {'value': '1K'}}
+    assert root.properties['compression'].reads == 0
+
+    rv = datasets_state([root], properties=[], flat=True)
+    assert rv[0]['properties'] == {}
+    assert rv[0]['pool'] == 'tank'
+
+
+def test__datasets_state__roots_only():
+    rv = datasets_state([tree().children[0]], list_descendants=False)
+    assert [i['name'] for i in rv] == ['tank/a']
+    assert [i['name'] for i in rv[0]['children']] == ['tank/a/b']
+
+    rv = datasets_state([tree().children[0]], flat=True, list_descendants=False)
+    assert [i['name'] for i in rv] == ['tank/a']
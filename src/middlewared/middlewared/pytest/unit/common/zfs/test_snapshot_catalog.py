@@ -0,0 +1,171 @@
+from middlewared.common.zfs.snapshot_catalog import SnapshotCatalog, nicenum
+
+
+def snapshot(name, creation):
+    dataset, snapshot_name = name.split('@')
+    return {
+        'id': name,
+        'name': name,
+        'pool': dataset.split('/')[0],
+        'dataset': dataset,
+        'snapshot_name': snapshot_name,
+        'properties': {'creation': {'rawvalue': str(creation)}},
+    }
+
+
+class FakeBackend(object):
+
+    def __init__(self, snapshots):
+        self.snapshots = {s['name']: s for s in snapshots}
+        self.scans = 0
+        self.loads = 0
+
+    def pools(self):
+        return sorted({name.split('/')[0].split('@')[0] for name in self.snapshots})
+
+    def dataset_snapshots(self, dataset, recursive=False):
+        self.scans += 1
+        return [
+            s for name, s in self.snapshots.items()
+            if name.startswith(dataset + '@') or (recursive and name.startswith(dataset + '/'))
+        ]
+
+    def load_snapshots(self, names):
+        self.loads += len(names)
+        return {name: self.snapshots.get(name) for name in names}
+
+    def snapshot_space(self, pool):
+        return {
+            name: {'used': s.get('used', 0), 'referenced': 0, 'written': 0}
+            for name, s in self.snapshots.items() if name.split('/')[0].split('@')[0] == pool
+        }
+
+
+def catalog():
+    backend = FakeBackend([
+        snapshot('tank@a', 3),
+        snapshot('tank/foo@a', 1),
+        snapshot('tank/foo@b', 2),
+        snapshot('data/bar@a', 4),
+    ])
+    return backend, SnapshotCatalog(backend)
+
+
+def test__snapshot_catalog__query_creation_order():
+    backend, c = catalog()
+    assert [s['name'] for s in c.query()] == ['tank/foo@a', 'tank/foo@b', 'tank@a', 'data/bar@a']
+
+
+def test__snapshot_catalog__query_indexes():
+    backend, c = catalog()
+    assert [s['name'] for s in c.query([('dataset', '=', 'tank/foo')])] == ['tank/foo@a', 'tank/foo@b']
+    assert [s['name'] for s in c.query([('pool', '=', 'data')])] == ['data/bar@a']
+    assert [s['name'] for s in c.query([('id', 'in', ['tank@a', 'tank@missing'])])] == ['tank@a']
+    assert [s['name'] for s in c.query([('properties.creation.rawvalue', '>', '2')])] == ['tank@a', 'data/bar@a']
+    assert [s['name'] for s in c.query([('pool', '=', 'tank'), ('properties.creation.rawvalue', '<=', '2')])] == [
+        'tank/foo@a', 'tank/foo@b',
+    ]
+
+
+def test__snapshot_catalog__query_returns_copies():
+    backend, c = catalog()
+    for s in c.query([('dataset', '=', 'tank/foo')]):
+        s['name'] = 'modified'
+        s['properties']['creation'] = {'rawvalue': '0'}
+        s['properties']['used'] = {'rawvalue': '0'}
+    s = c.query([('id', '=', 'tank@a')], {'get': True})
+    s['properties'].clear()
+
+    assert c.query([('dataset', '=', 'tank/foo')]) == [snapshot('tank/foo@a', 1), snapshot('tank/foo@b', 2)]
+    assert c.query([('id', '=', 'tank@a')], {'get': True}) == snapshot('tank@a', 3)
+
+
+def test__snapshot_catalog__incremental_updates_do_not_rescan():
+    backend, c = catalog()
+    c.query()
+    scans = backend.scans
+
+    backend.snapshots['tank/foo@c'] = snapshot('tank/foo@c', 5)
+    c.add('tank/foo@c')
+    backend.snapshots.pop('tank/foo@a')
+    c.remove('tank/foo@a')
+
+    assert [s['name'] for s in c.query([('dataset', '=', 'tank/foo')])] == ['tank/foo@b', 'tank/foo@c']
+    assert backend.scans == scans
+
+
+def test__snapshot_catalog__invalidate_rescans_pool():
+    backend, c = catalog()
+    c.query()
+    backend.snapshots['tank/foo@c'] = snapshot('tank/foo@c', 5)
+    assert c.query([('name', '=', 'tank/foo@c')]) == []
+
+    c.invalidate('tank')
+    assert [s['name'] for s in c.query([('name', '=', 'tank/foo@c')])] == ['tank/foo@c']
+
+
+def test__snapshot_catalog__pool_gone():
+    backend, c = catalog()
+    c.query()
+    for name in list(backend.snapshots):
+        if name.startswith('data/'):
+            backend.snapshots.pop(name)
+
+    assert c.query([('pool', '=', 'data')]) == []
+    assert 'data' not in c.scanned
+
+
+def test__snapshot_catalog__add_many():
+    backend, c = catalog()
+    c.query()
+    backend.snapshots['tank@r'] = snapshot('tank@r', 6)
+    backend.snapshots['tank/foo@r'] = snapshot('tank/foo@r', 6)
+    c.add_many(['tank@r', 'tank/foo@r', 'tank/missing@r'])
+
+    assert [s['name'] for s in c.query([('properties.creation.rawvalue', '>=', '6')])] == ['tank/foo@r', 'tank@r']
+
+
+def test__snapshot_catalog__query_does_not_verify():
+    backend, c = catalog()
+    c.query()
+
+    backend.snapshots['tank/foo@c'] = snapshot('tank/foo@c', 5)
+    assert c.query([('name', '=', 'tank/foo@c')]) == []
+
+
+def test__snapshot_catalog__verify_loads_only_drifted_snapshots():
+    backend, c = catalog()
+    c.query()
+    scans = backend.scans
+
+    # Created and destroyed without any event, e.g. by autosnap
+    backend.snapshots['tank/foo@c'] = snapshot('tank/foo@c', 5)
+    backend.snapshots.pop('tank/foo@a')
+    c.verify()
+
+    assert [s['name'] for s in c.query([('dataset', '=', 'tank/foo')])] == ['tank/foo@b', 'tank/foo@c']
+    assert backend.scans == scans
+    assert backend.loads == 2
+
+
+def test__snapshot_catalog__verify_refreshes_space():
+    backend, c = catalog()
+    c.query()
+    copy = c.query([('id', '=', 'tank@a')], {'get': True})
+
+    backend.snapshots['tank@a']['used'] = 98304
+    c.verify()
+
+    s = c.query([('id', '=', 'tank@a')], {'get': True})
+    assert s['properties']['used']['parsed'] == 98304
+    assert s['properties']['used']['value'] == '96K'
+    assert 'used' not in copy['properties']
+    assert backend.loads == 0
+
+
+def test__nicenum():
+    assert nicenum(0) == '0'
+    assert nicenum(512) == '512'
+    assert nicenum(98304) == '96K'
+    assert nicenum(1234567) == '1.18M'
+    assert nicenum(123456789) == '118M'
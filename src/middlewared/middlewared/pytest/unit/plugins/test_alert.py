@@ -0,0 +1,73 @@
+import asyncio
+
+from mock import Mock, patch
+
+from middlewared.alert.source.volume_status import VolumeStatusAlertSource
+from middlewared.plugins.alert import AlertService
+
+
+class Middleware:
+
+    def __init__(self, volumes, encrypted_disks=None):
+        self.volumes = volumes
+        self.encrypted_disks = encrypted_disks or []
+
+    async def call(self, method, *args):
+        if method == "datastore.query" and args[0] == "storage.volume":
+            return self.volumes
+        if method == "datastore.query" and args[0] == "storage.encrypteddisk":
+            return self.encrypted_disks
+        if method == "alert.pools_state":
+            return await self.alert.pools_state()
+        if method == "system.is_freenas":
+            return True
+        raise ValueError(method)
+
+    async def run_in_thread(self, method, *args):
+        return method(*args)
+
+
+async def zpool_status_x(*args, **kwargs):
+    return Mock(stdout=b"all pools are healthy\n")
+
+
+def pools_state(middleware, imported):
+    middleware.alert = AlertService(middleware)
+    with patch("middlewared.plugins.alert.run", zpool_status_x):
+        with patch.object(AlertService, "_AlertService__pools_state", lambda self: {
+            name: {"name": name, "capacity": 10, "scrub_paused": False, "upgraded": True}
+            for name in imported
+        }):
+            with patch("middlewared.plugins.alert.os.path.exists", lambda path: False):
+                return asyncio.get_event_loop().run_until_complete(
+                    VolumeStatusAlertSource(middleware).check()
+                ), middleware.alert.pools_state_cache[1]
+
+
+def test__pools_state__configured_pool_not_imported():
+    middleware = Middleware([
+        {"id": 1, "name": "tank", "encrypt": 0},
+        {"id": 2, "name": "data", "encrypt": 0},
+    ])
+
+    alerts, pools = pools_state(middleware, ["freenas-boot", "tank"])
+
+    assert pools["tank"]["imported"]
+    assert pools["tank"]["state"] == "HEALTHY"
+    assert not pools["data"]["imported"]
+    assert pools["data"]["state"] == "UNKNOWN"
+    assert pools["data"]["capacity"] is None
+    assert [alert.args["volume"] for alert in alerts] == ["data"]
+    assert alerts[0].args["state"] == "UNKNOWN"
+
+
+def test__pools_state__locked_pool_not_listed():
+    middleware = Middleware([
+        {"id": 1, "name": "tank", "encrypt": 0},
+        {"id": 2, "name": "secret", "encrypt": 1},
+    ], [{"encrypted_volume": {"id": 2}, "encrypted_provider": "gptid/1234"}])
+
+    alerts, pools = pools_state(middleware, ["tank"])
+
+    assert "secret" not in pools
+    assert alerts == []
@@ -0,0 +1,26 @@
+from middlewared.plugins.auth import VerifiedCredentials
+
+
+def test__verified_credentials__valid():
+    credentials = VerifiedCredentials()
+    credentials.add("root", "secret", "$6$hash")
+
+    assert credentials.verified("root", "secret", "$6$hash")
+    assert not credentials.verified("root", "wrong", "$6$hash")
+    assert not credentials.verified("admin", "secret", "$6$hash")
+
+
+def test__verified_credentials__password_changed():
+    credentials = VerifiedCredentials()
+    credentials.add("root", "secret", "$6$hash")
+
+    assert not credentials.verified("root", "secret", "$6$newhash")
+    assert not credentials.verified("root", "secret", "$6$hash")
+
+
+def test__verified_credentials__expired():
+    credentials = VerifiedCredentials()
+    credentials.TTL = -1
+    credentials.add("root", "secret", "$6$hash")
+
+    assert not credentials.verified("root", "secret", "$6$hash")
@@ -0,0 +1,39 @@
+from mock import Mock, patch
+
+from middlewared.plugins.system import SystemHealthEventSource, SystemHealthPublisher
+
+
+def event_source(arg=None):
+    return SystemHealthEventSource(Mock(), Mock(), 'ident', 'system.health', arg)
+
+
+@patch('middlewared.plugins.system.start_daemon_thread')
+def test__system_health__subscribers_share_publisher(start_daemon_thread):
+    a, b, c = event_source(), event_source('10'), event_source('5')
+    for es in (a, b, c):
+        es.process()
+
+    assert set(SystemHealthPublisher.publishers) == {5, 10}
+    assert SystemHealthPublisher.publishers[10].subscribers == {a, b}
+    # One thread per delay, none per subscriber
+    assert start_daemon_thread.call_count == 2
+
+    publisher = SystemHealthPublisher.publishers[10]
+    a.cancel()
+    assert publisher.subscribers == {b}
+    b.cancel()
+    assert publisher._cancel.is_set()
+    assert 10 not in SystemHealthPublisher.publishers
+
+    c.cancel()
+    assert SystemHealthPublisher.publishers == {}
+
+
+@patch('middlewared.plugins.system.start_daemon_thread')
+@patch('middlewared.event.asyncio.run_coroutine_threadsafe')
+def test__system_health__invalid_delay(run_coroutine_threadsafe, start_daemon_thread):
+    for arg in ('1', 'invalid'):
+        event_source(arg).process()
+
+    assert SystemHealthPublisher.publishers == {}
+    assert run_coroutine_threadsafe.call_count == 2
@@ -0,0 +1,64 @@
+from mock import Mock
+
+from middlewared.event import EventSource
+
+
+class Publisher:
+
+    def __init__(self):
+        self.subscribers = set()
+
+
+class AttachedEventSource(EventSource):
+
+    publisher = None
+
+    def attach(self):
+        if self.arg == 'invalid':
+            return False
+        self.publisher.subscribers.add(self)
+        return True
+
+    def detach(self):
+        self.publisher.subscribers.discard(self)
+
+
+def event_source(arg=None):
+    AttachedEventSource.publisher = Publisher()
+    return AttachedEventSource(Mock(), Mock(), 'ident', 'test', arg)
+
+
+def test__event_source__attach_and_detach(monkeypatch):
+    run_coroutine_threadsafe = Mock()
+    monkeypatch.setattr('middlewared.event.asyncio.run_coroutine_threadsafe', run_coroutine_threadsafe)
+    es = event_source()
+
+    es.process()
+    assert es.publisher.subscribers == {es}
+    assert not run_coroutine_threadsafe.called
+
+    es.cancel()
+    assert es.publisher.subscribers == set()
+
+    es.cancel()
+    assert es.publisher.subscribers == set()
+
+
+def test__event_source__not_attached_unsubscribes(monkeypatch):
+    run_coroutine_threadsafe = Mock()
+    monkeypatch.setattr('middlewared.event.asyncio.run_coroutine_threadsafe', run_coroutine_threadsafe)
+    es = event_source('invalid')
+
+    es.process()
+    assert es.publisher.subscribers == set()
+    assert run_coroutine_threadsafe.called
+    es.app.unsubscribe.assert_called_once_with('ident')
+
+
+def test__event_source__cancelled_before_attach():
+    es = event_source()
+
+    es.cancel()
+    es.process()
+
+    assert es.publisher.subscribers == set()
@@ -0,0 +1,169 @@
+import asyncio
+import os
+
+from mock import Mock
+
+from middlewared.job import Job, JobLogs, JobsQueue
+
+
+class Middleware:
+
+    async def run_in_thread(self, method, *args):
+        return method(*args)
+
+
+def new_job(lock=None, lock_queue_size=None, middleware=None):
+    return Job(middleware or Mock(), "test.job", None, None, [], {
+        "lock": lock,
+        "lock_queue_size": lock_queue_size,
+        "logs": False,
+        "process": False,
+        "pipes": [],
+        "check_pipes": False,
+        "transient": True,
+    }, None)
+
+
+def test__jobs_queue__lock_fifo():
+    queue = JobsQueue(Mock())
+    a1, b1, a2, a3 = [queue.add(new_job(lock)) for lock in ("a", "b", "a", "a")]
+
+    assert list(queue.queue) == [a1, b1]
+    assert queue.job_locks["a"].get_jobs() == [a1, a2, a3]
+
+    queue.queue.clear()
+    queue.release_lock(a1)
+    assert list(queue.queue) == [a2]
+    assert a2.get_lock() is queue.job_locks["a"]
+
+    queue.release_lock(b1)
+    assert "b" not in queue.job_locks
+
+
+def test__jobs_queue__no_lock():
+    queue = JobsQueue(Mock())
+    jobs = [queue.add(new_job()) for i in range(3)]
+
+    assert list(queue.queue) == jobs
+    assert queue.job_locks == {}
+
+
+def test__jobs_queue__lock_queue_size():
+    queue = JobsQueue(Mock())
+    running = queue.add(new_job("a", 1))
+    waiting = queue.add(new_job("a", 1))
+
+    assert queue.add(new_job("a", 1)) is waiting
+    assert queue.job_locks["a"].get_jobs() == [running, waiting]
+
+
+def test__job__progress_events_coalesced():
+    middleware = Mock()
+    job = new_job(middleware=middleware)
+    job.PROGRESS_INTERVAL = 0.1
+    job.loop = asyncio.get_event_loop()
+
+    async def progress():
+        for i in range(100):
+            job.set_progress(i)
+        await asyncio.sleep(0.01)
+        assert middleware.send_event.call_count == 1
+        assert middleware.send_event.call_args[1]["fields"]["progress"]["percent"] == 99
+
+        for i in range(100, 200):
+            job.set_progress(i)
+        await asyncio.sleep(0.01)
+        assert middleware.send_event.call_count == 1
+
+        await asyncio.sleep(0.2)
+        assert middleware.send_event.call_count == 2
+        assert middleware.send_event.call_args[1]["fields"]["progress"]["percent"] == 199
+
+    asyncio.get_event_loop().run_until_complete(progress())
+
+
+def test__job_logs__excerpt(tmpdir):
+    logs = JobLogs(Middleware(), str(tmpdir / "1.log"))
+    for i in range(12):
+        logs.write(f"line {i}\n".encode())
+    logs.write(b"last")
+    asyncio.get_event_loop().run_until_complete(logs.close())
+
+    assert logs.excerpt() == "".join([f"line {i}\n" for i in range(5)]) + "[3 more lines]\n" + "".join(
+        [f"line {i}\n" for i in range(8, 12)]
+    ) + "last"
+    assert os.path.getsize(logs.path) == sum(len(f"line {i}\n") for i in range(12)) + len("last")
+
+
+def test__job_logs__short_excerpt(tmpdir):
+    logs = JobLogs(Middleware(), str(tmpdir / "1.log"))
+    logs.write(b"a\nb\nc\n")
+    asyncio.get_event_loop().run_until_complete(logs.close())
+
+    assert logs.excerpt() == "a\nb\nc\n"
+
+
+def test__job_logs__rotate(tmpdir):
+    logs = JobLogs(Middleware(), str(tmpdir / "1.log"), max_size=12)
+
+    async def write():
+        for data in (b"123456\n", b"789\n", b"abcdef\n"):
+            logs.write(data)
+            await logs.flush()
+        await logs.close()
+
+    asyncio.get_event_loop().run_until_complete(write())
+
+    assert (tmpdir / "1.log.1").read_binary() == b"123456\n789\n"
+    assert (tmpdir / "1.log").read_binary() == b"abcdef\n"
+
+
+def test__job_logs__open_creates_empty_file(tmpdir):
+    logs = JobLogs(Middleware(), str(tmpdir / "1.log"))
+
+    async def run():
+        await logs.open()
+        await logs.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+    assert (tmpdir / "1.log").read_binary() == b""
+    assert logs.excerpt() == ""
+
+
+def test__job_logs__partial_line_capped(tmpdir):
+    logs = JobLogs(Middleware(), str(tmpdir / "1.log"))
+    for i in range(1000):
+        logs.write(f"{i:>9}%\r".encode())
+    assert len(logs.partial_line) == JobLogs.EXCERPT_LINE_LENGTH
+    asyncio.get_event_loop().run_until_complete(logs.close())
+
+    assert logs.excerpt().endswith("      999%\r")
+    assert len(logs.excerpt()) == JobLogs.EXCERPT_LINE_LENGTH
+    assert os.path.getsize(logs.path) == 1000 * 11
+
+
+def test__job_logs__write_after_close_dropped(tmpdir):
+    logs = JobLogs(Middleware(), str(tmpdir / "1.log"))
+
+    async def run():
+        logs.write(b"a\n")
+        await logs.close()
+        logs.write(b"b\n")
+        await logs.flush()
+        await logs.close()
+
+    asyncio.get_event_loop().run_until_complete(run())
+
+    assert (tmpdir / "1.log").read_binary() == b"a\n"
+    assert logs.excerpt() == "a\n"
+
+
+def test__job_logs__buffer_capped(tmpdir):
+    logs = JobLogs(Middleware(), str(tmpdir / "1.log"), max_size=12)
+    for data in (b"123456\n", b"789\n", b"abcdef\n"):
+        logs.write(data)
+    assert bytes(logs.buffer) == b"\n789\nabcdef\n"
+    asyncio.get_event_loop().run_until_complete(logs.close())
+
+    assert (tmpdir / "1.log").read_binary() == b"\n789\nabcdef\n"
@@ -0,0 +1,190 @@
+import copy
+
+import pytest
+
+from middlewared.schema import (
+    accepts, Bool, Dict, Error, Int, List, Patch, private_args_kwargs, Ref, resolver, resolver_order, Str,
+)
+from middlewared.service_exception import ValidationErrors
+from middlewared.validators import Range
+
+
+def schema():
+    return Dict(
+        'data',
+        Str('name', required=True),
+        Str('type', enum=['FILESYSTEM', 'VOLUME'], default='FILESYSTEM'),
+        Int('volsize'),
+        Bool('sparse'),
+        List('tags', items=[Str('tag')]),
+        List('ports', items=[Int('port', validators=[Range(min=1, max=65535)])]),
+        Dict('extra', additional_attrs=True),
+    )
+
+
+def legacy(attr, value):
+    value = attr.clean(copy.deepcopy(value))
+    attr.validate(value)
+    return value
+
+
+def compiled(attr, value):
+    value = attr.compile_clean()(value)
+    validate = attr.compile_validate()
+    if validate is not None:
+        validate(value)
+    return value
+
+
+def outcome(fn, value):
+    try:
+        return 'ok', fn(schema(), value)
+    except Error as e:
+        return 'error', (e.attribute, e.errmsg)
+    except ValidationErrors as e:
+        return 'verrors', list(e)
+
+
+@pytest.mark.parametrize("value", [
+    {'name': 'tank/a'},
+    {'name': 'tank/a', 'type': 'VOLUME', 'volsize': '1024', 'tags': [1, 'b'], 'extra': {'a': [1]}},
+    {'name': 'tank/a', 'ports': [22, 0, 70000]},
+    {'name': 'tank/a', 'tags': ['a', None, ['x']]},
+    {'name': 'tank/a', 'type': 'OTHER'},
+    {'name': 'tank/a', 'unknown': 1},
+    {'type': 'VOLUME'},
+    None,
+    [],
+])
+def test__compiled_same_as_legacy(value):
+    original = copy.deepcopy(value)
+
+    assert outcome(compiled, value) == outcome(legacy, value)
+    assert value == original
+
+
+def test__compiled_copy_on_write():
+    clean = schema().compile_clean()
+    value = {'name': 'tank/a', 'type': 'VOLUME', 'tags': ['a', 2], 'extra': {'a': {}}}
+
+    cleaned = clean(value)
+
+    assert cleaned is not value
+    assert cleaned['tags'] == ['a', '2']
+    assert value['tags'] == ['a', 2]
+    # Values not changed by cleaning are shared
+    assert cleaned['extra'] is value['extra']
+
+
+def test__compiled_nothing_to_validate():
+    assert List('tags', items=[Str('tag')]).compile_validate() is None
+    assert schema().compile_validate() is not None
+
+
+def test__accepts_does_not_modify_arguments():
+    class Service:
+        @accepts(Dict('data', Str('name'), List('items', items=[Str('item')]), Bool('flag', default=True)))
+        def method(self, data):
+            data['modified'] = True
+            return data
+
+    data = {'name': 'a', 'items': [1]}
+
+    assert Service().method(data) == {'name': 'a', 'items': ['1'], 'flag': True, 'modified': True}
+    assert data == {'name': 'a', 'items': [1]}
+
+    data = {'name': 'a', 'items': ['b'], 'flag': False}
+
+    Service().method(data)
+
+    assert data == {'name': 'a', 'items': ['b'], 'flag': False}
+
+
+def test__accepts_does_not_modify_nested_arguments():
+    class Service:
+        @accepts(Dict('data', List('devices', items=[Dict('device', additional_attrs=True)])))
+        def method(self, data):
+            data['devices'][0]['attributes']['path'] = '/dev/zvol/tank/a'
+            data['devices'].append({})
+            return data
+
+    data = {'devices': [{'dtype': 'DISK', 'attributes': {}}]}
+
+    Service().method(data)
+
+    assert data == {'devices': [{'dtype': 'DISK', 'attributes': {}}]}
+
+
+def test__accepts_does_not_copy_private_arguments():
+    class Service:
+        @accepts(Dict('data', List('devices', items=[Dict('device', additional_attrs=True)]), Bool('flag')))
+        def method(self, data):
+            return data
+
+    method = Service().method
+    data = {'devices': [{'dtype': 'DISK', 'attributes': {}}], 'flag': True}
+
+    cleaned = method(data, **private_args_kwargs(method))
+
+    assert cleaned is data
+    assert method(data)['devices'] is not data['devices']
+
+
+class Middleware:
+
+    def __init__(self):
+        self.schemas = {}
+
+    def add_schema(self, schema):
+        assert schema.name not in self.schemas
+        self.schemas[schema.name] = schema
+
+    def get_schema(self, name):
+        return self.schemas.get(name)
+
+
+def test__resolver_order():
+    @accepts(Patch('base', 'patched', ('attr', {'update': True}), register=True))
+    def patches(self, data):
+        pass
+
+    @accepts(Ref('patched'), Ref('base'))
+    def refs(self, data, other):
+        pass
+
+    @accepts(Dict('base', Str('name'), register=True))
+    def base(self, data):
+        pass
+
+    @accepts(Str('name'))
+    def plain(self, name):
+        pass
+
+    middleware = Middleware()
+
+    order, unresolved = resolver_order(middleware, [refs, patches, plain, base, 'not a method'])
+
+    assert order == [plain, base, patches, refs]
+    assert unresolved == []
+
+    for f in order:
+        resolver(middleware, f)
+
+    assert refs.accepts[0].name == 'patched'
+    assert refs.accepts[0].update is True
+
+
+def test__resolver_order_unresolved():
+    @accepts(Ref('missing'))
+    def missing(self, data):
+        pass
+
+    @accepts(Patch('b', 'a', register=True), Ref('b'))
+    def a(self, data, other):
+        pass
+
+    @accepts(Patch('a', 'b', register=True))
+    def b(self, data):
+        pass
+
+    assert resolver_order(Middleware(), [missing, a, b]) == ([], [missing, a, b])
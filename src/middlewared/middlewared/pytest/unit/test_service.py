@@ -0,0 +1,49 @@
+import asyncio
+
+from middlewared.schema import Dict, List, resolver
+from middlewared.service import CRUDService
+from middlewared.utils import filter_list
+
+
+ROWS = [{'id': i} for i in range(1, 6)]
+
+
+class Middleware:
+
+    schemas = {
+        'query-filters': List('query-filters'),
+        'query-options': Dict('query-options', additional_attrs=True),
+    }
+
+    def get_schema(self, name):
+        return self.schemas.get(name)
+
+    async def call(self, method, datastore, filters, options):
+        assert method == 'datastore.query'
+        return filter_list(ROWS, filters, options)
+
+    async def run_in_thread(self, method, *args):
+        return method(*args)
+
+
+class ExtendedService(CRUDService):
+
+    class Config:
+        datastore = 'test.row'
+        datastore_extend = 'test.extend'
+
+
+resolver(Middleware(), CRUDService.query)
+
+
+def query(filters, options):
+    return asyncio.get_event_loop().run_until_complete(ExtendedService(Middleware()).query(filters, options))
+
+
+def test__crud_service__extend_paginates_without_filters():
+    assert [i['id'] for i in query([], {'offset': 1, 'limit': 2})] == [2, 3]
+
+
+def test__crud_service__extend_count_ignores_limit():
+    assert query([], {'count': True, 'limit': 2}) == 5
+    assert query([('id', '>', 1)], {'count': True, 'limit': 2}) == 4
@@ -0,0 +1,37 @@
+import pickle
+
+import pytest
+from mock import patch
+
+from middlewared import worker
+from middlewared.worker import FakeMiddleware, main_worker
+
+
+class Middleware(FakeMiddleware):
+
+    async def _run(self, method):
+        if method == 'fail':
+            raise ValueError('failed')
+        return method
+
+
+@pytest.fixture
+def middleware():
+    with patch.object(worker, 'MIDDLEWARE', Middleware()) as middleware:
+        yield middleware
+
+
+def test__main_worker__stats_of_failed_calls(middleware):
+    stats, result, exc = pickle.loads(pickle.dumps(main_worker('fail')))
+
+    assert result is None
+    assert isinstance(exc, ValueError)
+    assert 'failed' in str(exc.__cause__)
+    assert stats['calls'] == 1
+    assert stats['errors'] == 1
+
+    stats, result, exc = main_worker('ok')
+
+    assert (result, exc) == ('ok', None)
+    assert stats['calls'] == 2
+    assert stats['errors'] == 1
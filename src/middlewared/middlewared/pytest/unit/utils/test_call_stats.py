@@ -0,0 +1,32 @@
+from middlewared.utils.call_stats import CallStats
+
+
+def test__call_stats():
+    stats = CallStats()
+    stats.add("pool.query", "thread", 0.005, False)
+    stats.add("pool.query", "thread", 2, True)
+    stats.add("pool.query", "job", 0.5, False)
+    stats.add("core.ping", "coroutine", 100, False)
+
+    methods = stats.get()
+
+    assert [(m["method"], m["path"]) for m in methods] == [
+        ("core.ping", "coroutine"), ("pool.query", "thread"), ("pool.query", "job"),
+    ]
+    assert methods[1]["calls"] == 2
+    assert methods[1]["errors"] == 1
+    assert methods[1]["time"] == 2.005
+    assert methods[1]["time_max"] == 2
+    assert [h["count"] for h in methods[1]["histogram"]] == [0, 1, 0, 0, 1, 0, 0]
+    assert methods[0]["histogram"][-1] == {"le": None, "count": 1}
+
+
+def test__call_stats_reset():
+    stats = CallStats()
+    stats.add("pool.query", "thread", 0.005, False)
+    since = stats.since
+
+    stats.reset()
+
+    assert stats.get() == []
+    assert stats.since >= since
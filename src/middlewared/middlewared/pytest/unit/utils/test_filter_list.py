@@ -0,0 +1,37 @@
+from middlewared.utils import filter_list
+
+
+DATA = [
+    {'id': 1, 'name': 'ada0', 'size': 100, 'pool': 'tank'},
+    {'id': 2, 'name': 'ada1', 'size': 200, 'pool': 'tank'},
+    {'id': 3, 'name': 'ada2', 'size': 100, 'pool': 'data'},
+    {'id': 4, 'name': 'ada3', 'size': 200, 'pool': 'data'},
+]
+
+
+def test__filter_list__order_by_multiple_keys():
+    assert [i['id'] for i in filter_list(DATA, [], {'order_by': ['pool', '-size']})] == [4, 3, 2, 1]
+
+
+def test__filter_list__order_by_first_key_is_most_significant():
+    assert [i['id'] for i in filter_list(DATA, [], {'order_by': ['size', 'name']})] == [1, 3, 2, 4]
+
+
+def test__filter_list__offset_limit():
+    assert [i['id'] for i in filter_list(DATA, [], {'order_by': ['-id'], 'offset': 1, 'limit': 2})] == [3, 2]
+
+
+def test__filter_list__count_ignores_limit():
+    assert filter_list(DATA, [('pool', '=', 'tank')], {'count': True, 'limit': 1}) == 2
+
+
+def test__filter_list__select():
+    assert filter_list(DATA, [('size', '=', 200)], {'select': ['name']}) == [{'name': 'ada1'}, {'name': 'ada3'}]
+
+
+def test__filter_list__get_select():
+    assert filter_list(DATA, [('pool', '=', 'data')], {'select': ['id'], 'get': True}) == {'id': 3}
+
+
+def test__filter_list__get_order_by():
+    assert filter_list(DATA, [('pool', '=', 'data')], {'order_by': ['-size'], 'get': True})['id'] == 4
@@ -0,0 +1,46 @@
+import threading
+
+from middlewared.utils.io_thread_pool_executor import IoThreadPoolExecutor
+
+
+def test__io_thread_pool_executor__reuses_threads():
+    executor = IoThreadPoolExecutor('test')
+    try:
+        names = {executor.submit(lambda: threading.current_thread().name).result() for i in range(100)}
+
+        assert len(names) == 1
+        assert executor.stats() == {'live': 1, 'idle': 1, 'queued': 0}
+    finally:
+        executor.shutdown()
+
+
+def test__io_thread_pool_executor__nested_call_does_not_deadlock():
+    executor = IoThreadPoolExecutor('test')
+    try:
+        def nested(depth):
+            if depth == 0:
+                return 0
+            return executor.submit(nested, depth - 1).result(timeout=5) + 1
+
+        assert executor.submit(nested, 10).result(timeout=10) == 10
+        assert executor.stats()['live'] == 11
+    finally:
+        executor.shutdown()
+
+
+def test__io_thread_pool_executor__max_idle():
+    executor = IoThreadPoolExecutor('test', max_idle=2)
+    try:
+        event = threading.Event()
+        futures = [executor.submit(event.wait) for i in range(5)]
+        assert executor.stats()['live'] == 5
+
+        event.set()
+        for f in futures:
+            f.result()
+
+        for t in list(executor._threads):
+            t.join(timeout=0.1)
+        assert executor.stats()['idle'] == 2
+    finally:
+        executor.shutdown()
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+from middlewared.utils.loop_monitor import LoopMonitor
+
+
+async def call(name):
+    await asyncio.sleep(0.1)
+    # Blocks the event loop
+    time.sleep(0.3)
+
+
+def test__loop_monitor_blocked_method():
+    loop = asyncio.new_event_loop()
+    monitor = LoopMonitor(loop, threading.get_ident(), {
+        call.__code__: lambda frame: frame.f_locals["name"],
+    }, interval=0.01, threshold=0.05, sample_interval=0.01)
+    threading.Thread(target=monitor.run, daemon=True).start()
+
+    try:
+        loop.run_until_complete(call("vm.image_path"))
+        loop.run_until_complete(asyncio.sleep(0.1))
+    finally:
+        loop.close()
+
+    stats = monitor.get_stats()
+    assert stats["lag"]["heartbeats"] > 0
+    assert stats["lag"]["max"] >= 0.25
+    method = stats["methods"][0]
+    assert method["method"] == "vm.image_path"
+    assert method["blocked"] == 1
+    assert method["time"] >= 0.25
+    assert method["samples"] > 0
+    assert method["stacks"][0]["stack"][-1].endswith(" in call")
+
+    monitor.reset()
+
+    assert monitor.get_stats()["methods"] == []
+
+
+def test__loop_monitor_stopped_loop():
+    loop = asyncio.new_event_loop()
+    monitor = LoopMonitor(loop, threading.get_ident(), {}, interval=0.01, threshold=0.05, sample_interval=0.01)
+    thread = threading.Thread(target=monitor.run, daemon=True)
+    thread.start()
+
+    try:
+        loop.run_until_complete(asyncio.sleep(0.1))
+        # Loop is not running, this is not lag
+        time.sleep(0.3)
+        heartbeats = monitor.get_stats()["lag"]["heartbeats"]
+        loop.run_until_complete(asyncio.sleep(0.1))
+    finally:
+        loop.close()
+
+    thread.join(1)
+    assert not thread.is_alive()
+
+    stats = monitor.get_stats()
+    assert stats["lag"]["heartbeats"] > heartbeats
+    assert stats["lag"]["max"] < 0.25
+    assert stats["methods"] == []
@@ -16,7 +16,16 @@ from .service import CallError, ValidationError, ValidationErrors
 async def authenticate(middleware, req):
 
     auth = req.headers.get('Authorization')
-    if auth is None or not auth.startswith('Basic '):
+    if auth is None:
+        raise web.HTTPUnauthorized()
+
+    if auth.startswith('Bearer '):
+        # Token from `auth.generate_token`, skips password verification
+        if not await middleware.call('auth.check_token', auth[7:].strip()):
+            raise web.HTTPUnauthorized()
+        return
+
+    if not auth.startswith('Basic '):
         raise web.HTTPUnauthorized()
     try:
         username, password = base64.b64decode(auth[6:]).decode('utf8').split(':', 1)
@@ -149,6 +158,11 @@ class OpenAPIResource(object):
                 'type': 'http',
                 'scheme': 'basic'
             },
+            'token': {
+                'type': 'http',
+                'scheme': 'bearer',
+                'description': 'Token obtained from `auth/generate_token`',
+            },
         }
 
     def add_path(self, path, operation, methodname, params=None):
@@ -292,7 +306,7 @@ class OpenAPIResource(object):
             'paths': self._paths,
             'servers': servers,
             'components': self._components,
-            'security': [{'basic': []}],
+            'security': [{'basic': []}, {'token': []}],
         }
 
         resp = web.Response()
@@ -415,7 +429,10 @@ class Resource(object):
                 options[key] = convert(val)
                 continue
             elif key == 'sort':
-                options[key] = [convert(v) for v in val.split(',')]
+                options['order_by'] = [convert(v) for v in val.split(',')]
+                continue
+            elif key == 'select':
+                options[key] = val.split(',')
                 continue
 
             op_map = {
@@ -516,7 +533,8 @@ class Resource(object):
             method_args.insert(0, kwargs['id'])
 
         try:
-            result = await self.middleware.call(methodname, *method_args)
+            # Arguments have just been decoded from the request body
+            result = await self.middleware.call(methodname, *method_args, private_args=True)
         except CallError as e:
             resp = web.Response(status=400)
             result = {
@@ -1,4 +1,5 @@
 import asyncio
+from collections import defaultdict, deque
 import copy
 import errno
 import ipaddress
@@ -81,6 +82,29 @@ class Attribute(object):
         """
         raise NotImplementedError("Attribute must implement to_json_schema method")
 
+    def compile_clean(self):
+        """
+        Return a function equivalent to `clean` which never modifies the value it is given.
+
+        Containers are only copied when cleaning actually changes one of their items
+        (copy-on-write), unchanged values are returned as they are.
+        Attributes with an unknown `clean` implementation fall back to cleaning a deep copy.
+        """
+        if type(self).clean in COPY_SAFE_CLEAN:
+            return self.clean
+
+        def clean(value):
+            return self.clean(copy.deepcopy(value))
+        return clean
+
+    def compile_validate(self):
+        """
+        Return a function equivalent to `validate` or `None` if there is nothing to validate.
+        """
+        if type(self).validate is Attribute.validate and not self.validators:
+            return None
+        return self.validate
+
     def resolve(self, middleware):
         """
         After every plugin is initialized this method is called for every method param
@@ -324,6 +348,66 @@ class List(EnumMixin, Attribute):
         if verrors:
             raise verrors
 
+    def compile_clean(self):
+        if type(self).clean is not List.clean:
+            return super().compile_clean()
+
+        name = self.name
+        required = self.required
+        empty = self.empty
+        default = self.default
+        items = [i.compile_clean() for i in self.items]
+
+        def clean(value):
+            if self.enum is not None:
+                EnumMixin.clean(self, value)
+            if value is None and not required:
+                return copy.copy(default)
+            if not isinstance(value, list):
+                raise Error(name, 'Not a list')
+            if not empty and not value:
+                raise Error(name, 'Empty value not allowed')
+            cleaned = value
+            if items:
+                for index, v in enumerate(value):
+                    try:
+                        for item_clean in items:
+                            new = item_clean(v)
+                    except Error as e:
+                        found = e
+                    else:
+                        if new is not v:
+                            if cleaned is value:
+                                cleaned = list(value)
+                            cleaned[index] = new
+                        continue
+                    raise Error(name, 'Item#{0} is not valid per list types: {1}'.format(index, found))
+            return cleaned
+        return clean
+
+    def compile_validate(self):
+        if type(self).validate is not List.validate:
+            return super().compile_validate()
+
+        name = self.name
+        items = [v for v in (i.compile_validate() for i in self.items) if v is not None]
+        if not items:
+            return None
+
+        def validate(value):
+            verrors = ValidationErrors()
+
+            for i, v in enumerate(value):
+                for item_validate in items:
+                    try:
+                        item_validate(v)
+                    except ValidationErrors as e:
+                        verrors.add_child(f"{name}.{i}", e)
+
+            if verrors:
+                raise verrors
+        return validate
+
     def to_json_schema(self, parent=None):
         schema = {'type': 'array'}
         if not parent:
@@ -430,6 +514,81 @@ class Dict(Attribute):
         if verrors:
             raise verrors
 
+    def compile_clean(self):
+        if type(self).clean is not Dict.clean:
+            return super().compile_clean()
+
+        name = self.name
+        required = self.required
+        additional_attrs = self.additional_attrs
+        attrs = {key: attr.compile_clean() for key, attr in self.attrs.items()}
+        if self.update:
+            defaults = []
+        else:
+            defaults = [(attr.name, attr.required, attr.has_default, attr.default) for attr in self.attrs.values()]
+
+        def clean(data):
+            if data is None and not required:
+                data = {}
+
+            if not isinstance(data, dict):
+                raise Error(name, 'A dict was expected')
+
+            cleaned = data
+            for key, value in data.items():
+                attr_clean = attrs.get(key)
+                if attr_clean is None:
+                    if not additional_attrs:
+                        raise Error(key, 'Field was not expected')
+                    continue
+
+                new = attr_clean(value)
+                if new is not value:
+                    if cleaned is data:
+                        cleaned = data.copy()
+                    cleaned[key] = new
+
+            for attr_name, attr_required, has_default, default in defaults:
+                if attr_name in cleaned:
+                    continue
+
+                if attr_required:
+                    raise Error(attr_name, 'This field is required')
+
+                if has_default:
+                    if cleaned is data:
+                        cleaned = data.copy()
+                    cleaned[attr_name] = copy.copy(default)
+
+            return cleaned
+        return clean
+
+    def compile_validate(self):
+        if type(self).validate is not Dict.validate:
+            return super().compile_validate()
+
+        name = self.name
+        attrs = [
+            (attr.name, v) for attr, v in ((attr, attr.compile_validate()) for attr in self.attrs.values())
+            if v is not None
+        ]
+        if not attrs:
+            return None
+
+        def validate(value):
+            verrors = ValidationErrors()
+
+            for attr_name, attr_validate in attrs:
+                if attr_name in value:
+                    try:
+                        attr_validate(value[attr_name])
+                    except ValidationErrors as e:
+                        verrors.add_child(name, e)
+
+            if verrors:
+                raise verrors
+        return validate
+
     def to_json_schema(self, parent=None):
         schema = {
             'type': 'object',
@@ -594,8 +753,115 @@ def resolver(middleware, f):
     f.accepts.clear()
     f.accepts.extend(new_params)
 
+    if hasattr(f, '_compile_accepts'):
+        f._compile_accepts()
+
+
+def resolver_names(f):
+    """
+    Return names of the schemas `f` params depend on (`Ref`, `Patch`) and of the ones they register.
+    """
+    requires = set()
+    provides = set()
+
+    def walk(p):
+        if isinstance(p, (Ref, Patch)):
+            requires.add(p.name)
+            if isinstance(p, Patch) and p.register:
+                provides.add(p.newname)
+        elif isinstance(p, Attribute):
+            if p.register:
+                provides.add(p.name)
+            if isinstance(p, Dict):
+                for attr in p.attrs.values():
+                    walk(attr)
+            elif isinstance(p, List):
+                for item in p.items:
+                    walk(item)
+
+    for p in f.accepts:
+        walk(p)
+
+    return requires, provides
+
+
+def resolver_order(middleware, methods):
+    """
+    Sort `methods` having params so that every method registering a schema comes before
+    the ones referencing it and `resolver` only needs to be called once for each of them.
+
+    Returns sorted methods and methods which can never be resolved (unknown or circular schemas).
+    """
+    methods = [f for f in methods if callable(f) and hasattr(f, 'accepts')]
+    names = [resolver_names(f) for f in methods]
+
+    providers = defaultdict(set)
+    for index, (requires, provides) in enumerate(names):
+        for name in provides:
+            providers[name].add(index)
+
+    # Number of methods every method is waiting for and methods waiting for it
+    waiting = []
+    dependents = defaultdict(list)
+    for index, (requires, provides) in enumerate(names):
+        count = 0
+        for name in requires:
+            if name in provides or middleware.get_schema(name) is not None:
+                continue
+            if not providers[name]:
+                # Never going to be registered
+                count += 1
+            for provider in providers[name]:
+                dependents[provider].append(index)
+                count += 1
+        waiting.append(count)
+
+    ready = deque(index for index, count in enumerate(waiting) if count == 0)
+    order = []
+    while ready:
+        index = ready.popleft()
+        order.append(methods[index])
+        for dependent in dependents[index]:
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                ready.append(dependent)
+
+    return order, [f for index, f in enumerate(methods) if waiting[index] > 0]
+
+
+def copy_containers(value):
+    """
+    Deep copy of the dicts and lists of `value`. Other values are not copied, they are
+    immutable (they come from JSON) or were already copied by cleaning.
+
+    This is a lot cheaper than `copy.deepcopy`.
+    """
+    if isinstance(value, dict):
+        return {k: copy_containers(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [copy_containers(v) for v in value]
+    return value
+
+
+def private_args_kwargs(method):
+    """
+    Keyword arguments to call `method` with when its arguments are private to the call
+    (e.g. just decoded from JSON or unpickled) so `@accepts` does not need to copy them.
+    """
+    if hasattr(method, 'accepts'):
+        return {'_private_args': True}
+    return {}
+
 
 def accepts(*schema):
+    """
+    Clean and validate method arguments against `schema`.
+
+    Methods are free to modify their arguments: unless they are called with
+    `_private_args=True` (see `private_args_kwargs`), dicts and lists of the arguments are
+    copied so the caller's ones (e.g. of an in-process `middleware.call`) are never
+    modified.
+    """
     def wrap(f):
         # Make sure number of schemas is same as method argument
         args_index = 1
@@ -605,25 +871,43 @@ def accepts(*schema):
             args_index += 1
         assert len(schema) == f.__code__.co_argcount - args_index  # -1 for self
 
-        def clean_and_validate_args(args, kwargs):
+        # (clean, validate) functions of every resolved schema, see `Attribute.compile_clean`
+        compiled = []
+
+        def compile_accepts():
+            compiled[:] = [(attr.compile_clean(), attr.compile_validate()) for attr in nf.accepts]
+
+        def clean_arg(clean, value, private):
+            cleaned = clean(value)
+            if private:
+                # Nobody else has a reference to the containers cleaning did not copy
+                return cleaned
+            # Method is free to modify its arguments (even nested ones), never hand out caller's containers
+            return copy_containers(cleaned)
+
+        def clean_and_validate_args(args, kwargs, private):
+            if len(compiled) != len(nf.accepts):
+                # Schemas have not been resolved by the middleware (e.g. method is used directly)
+                compile_accepts()
+
             args = list(args)
-            args = args[:args_index] + copy.deepcopy(args[args_index:])
-            kwargs = copy.deepcopy(kwargs)
+            kwargs = dict(kwargs)
 
             verrors = ValidationErrors()
 
             # Iterate over positional args first, excluding self
             i = 0
             for _ in args[args_index:]:
-                attr = nf.accepts[i]
+                clean, validate = compiled[i]
 
-                value = attr.clean(args[args_index + i])
+                value = clean_arg(clean, args[args_index + i], private)
                 args[args_index + i] = value
 
-                try:
-                    attr.validate(value)
-                except ValidationErrors as e:
-                    verrors.extend(e)
+                if validate is not None:
+                    try:
+                        validate(value)
+                    except ValidationErrors as e:
+                        verrors.extend(e)
 
                 i += 1
 
@@ -632,12 +916,12 @@ def accepts(*schema):
                 kwarg = f.__code__.co_varnames[x]
 
                 if kwarg in kwargs:
-                    attr = nf.accepts[i]
+                    clean, validate = compiled[i]
                     i += 1
 
                     value = kwargs[kwarg]
-                elif len(nf.accepts) >= i + args_index:
-                    attr = nf.accepts[i]
+                elif len(compiled) >= i + args_index:
+                    clean, validate = compiled[i]
                     i += 1
 
                     value = None
@@ -645,13 +929,14 @@ def accepts(*schema):
                     i += 1
                     continue
 
-                value = attr.clean(value)
+                value = clean_arg(clean, value, private)
                 kwargs[kwarg] = value
 
-                try:
-                    attr.validate(value)
-                except ValidationErrors as e:
-                    verrors.extend(e)
+                if validate is not None:
+                    try:
+                        validate(value)
+                    except ValidationErrors as e:
+                        verrors.extend(e)
 
             if verrors:
                 raise verrors
@@ -659,12 +944,12 @@ def accepts(*schema):
             return args, kwargs
 
         if asyncio.iscoroutinefunction(f):
-            async def nf(*args, **kwargs):
-                args, kwargs = clean_and_validate_args(args, kwargs)
+            async def nf(*args, _private_args=False, **kwargs):
+                args, kwargs = clean_and_validate_args(args, kwargs, _private_args)
                 return await f(*args, **kwargs)
         else:
-            def nf(*args, **kwargs):
-                args, kwargs = clean_and_validate_args(args, kwargs)
+            def nf(*args, _private_args=False, **kwargs):
+                args, kwargs = clean_and_validate_args(args, kwargs, _private_args)
                 return f(*args, **kwargs)
 
         nf.__name__ = f.__name__
@@ -677,6 +962,7 @@ def accepts(*schema):
             if i.startswith('_'):
                 setattr(nf, i, getattr(f, i))
         nf.accepts = list(schema)
+        nf._compile_accepts = compile_accepts
 
         return nf
     return wrap
@@ -708,3 +994,13 @@ class UnixPerm(Attribute):
             schema['title'] = self.verbose
             schema['_required_'] = self.required
         return schema
+
+
+# `clean` implementations which never modify the value they are given
+COPY_SAFE_CLEAN = {
+    Attribute.clean,
+    Str.clean,
+    Bool.clean,
+    Int.clean,
+    UnixPerm.clean,
+}
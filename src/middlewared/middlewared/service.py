@@ -99,6 +99,8 @@ class ServiceBase(type):
     Currently the following options are allowed:
       - datastore: name of the datastore mainly used in the service
       - datastore_extend: datastore `extend` option used in common `query` method
+      - datastore_extend_batch: datastore `extend_batch` option used in common `query` method,
+        called once with the list of all rows instead of once per row
       - datastore_prefix: datastore `prefix` option used in helper methods
       - service: system service `name` option used by `SystemServiceService`
       - service_model: system service datastore model option used by `SystemServiceService` (`service` if used if not provided)
@@ -128,6 +130,7 @@ class ServiceBase(type):
             'datastore': None,
             'datastore_prefix': None,
             'datastore_extend': None,
+            'datastore_extend_batch': None,
             'service': None,
             'service_model': None,
             'service_verb': 'reload',
@@ -256,12 +259,24 @@ class CRUDService(ServiceChangeMixin, Service):
             options['prefix'] = self._config.datastore_prefix
         if self._config.datastore_extend:
             options['extend'] = self._config.datastore_extend
+        if self._config.datastore_extend_batch:
+            options['extend_batch'] = self._config.datastore_extend_batch
         # In case we are extending which may transform the result in numerous ways
         # we can only filter the final result.
-        if 'extend' in options:
+        if 'extend' in options or 'extend_batch' in options:
             datastore_options = options.copy()
             datastore_options.pop('count', None)
             datastore_options.pop('get', None)
+            datastore_options.pop('select', None)
+            if filters or options.get('count'):
+                datastore_options.pop('offset', None)
+                datastore_options.pop('limit', None)
+            else:
+                # Extending does not drop any row so pagination can still be
+                # done by the database when there is nothing to filter (or count).
+                options = options.copy()
+                options.pop('offset', None)
+                options.pop('limit', None)
             result = await self.middleware.call(
                 'datastore.query', self._config.datastore, [], datastore_options
             )
@@ -460,6 +475,68 @@ class CoreService(Service):
     async def event_send(self, name, event_type, kwargs):
         self.middleware.send_event(name, event_type, **kwargs)
 
+    @accepts()
+    async def get_io_thread_pool_stats(self):
+        """
+        Returns the number of `live`, `idle` and `queued` threads of the
+        thread pool used to run blocking method calls.
+        """
+        return self.middleware.get_io_thread_pool_stats()
+
+    @accepts()
+    async def get_process_pool_stats(self):
+        """
+        Returns size of the process pool and, for every worker process, the number of
+        `calls` and `errors` and the total and maximum call `time` (seconds) it reported.
+        """
+        return self.middleware.get_process_pool_stats()
+
+    @accepts(Dict('options', Bool('reset', default=False)))
+    async def get_call_stats(self, options):
+        """
+        Returns, for every method and execution path (`coroutine`, `thread`, `thread_pool`,
+        `process_pool` or `job`), the number of `calls` and `errors`, the total and maximum
+        call `time` (seconds) and a latency `histogram` (number of calls taking up to `le`
+        seconds, `null` meaning unbounded), slowest methods first.
+
+        Counters are kept since middlewared start or last `reset` (`since`, a timestamp).
+        `reset` clears them after they are returned.
+        """
+        call_stats = self.middleware.call_stats
+        stats = {
+            'enabled': call_stats.enabled,
+            'since': call_stats.since,
+            'methods': call_stats.get(),
+        }
+        if options['reset']:
+            call_stats.reset()
+        return stats
+
+    @accepts(Dict('options', Bool('reset', default=False)))
+    async def get_loop_stats(self, options):
+        """
+        Returns event loop scheduling lag (seconds) measured by the loop monitor
+        and the methods which blocked the event loop for longer than `threshold`
+        seconds, longest total `time` first.
+
+        For every method: number of times it `blocked` the loop, total and maximum
+        blocked `time`, stack `samples` taken while it was blocking and the most
+        frequently sampled `stacks` (innermost frame last).
+
+        Returns `null` if the loop monitor is disabled.
+        `reset` clears the statistics after they are returned.
+        """
+        return self.middleware.get_loop_stats(options['reset'])
+
+    @accepts()
+    async def get_websocket_stats(self):
+        """
+        Returns, for every websocket connection, the number of messages `queued` to be
+        sent, `sent`, `coalesced` (CHANGED events merged into a pending one) and the
+        largest queue length seen (`queue_max`).
+        """
+        return self.middleware.get_wsclients_stats()
+
     @accepts()
     def ping(self):
         """
@@ -1,11 +1,13 @@
 import asyncio
 import imp
+import importlib
 import inspect
 import os
 import re
 import sys
 import subprocess
 import threading
+import time
 from datetime import datetime, timedelta
 from itertools import chain
 from functools import wraps
@@ -20,7 +22,7 @@ BUILDTIME = None
 VERSION = None
 
 
-def django_modelobj_serialize(middleware, obj, extend=None, field_prefix=None):
+def django_modelobj_serialize(middleware, obj, extend=None, field_prefix=None, select=None):
     from django.db.models.fields.related import ForeignKey, ManyToManyField
     from freenasUI.contrib.IPAddressField import (
         IPAddressField, IP4AddressField, IP6AddressField
@@ -28,6 +30,8 @@ def django_modelobj_serialize(middleware, obj, extend=None, field_prefix=None):
     data = {}
     for field in chain(obj._meta.fields, obj._meta.many_to_many):
         name = field.name
+        if select is not None and name not in select:
+            continue
         try:
             value = getattr(obj, name)
         except Exception as e:
@@ -142,6 +146,9 @@ def filter_list(_list, filters=None, options=None):
     if options is None:
         options = {}
 
+    # With no ordering nor offset the first matching entry can be returned right away
+    get_first = options.get('get') is True and not options.get('order_by') and not options.get('offset')
+
     rv = []
     if filters:
         for i in _list:
@@ -161,8 +168,8 @@ def filter_list(_list, filters=None, options=None):
             if not valid:
                 continue
             rv.append(i)
-            if options.get('get') is True:
-                return i
+            if get_first:
+                return select_fields(i, options['select']) if options.get('select') else i
     else:
         rv = _list
 
@@ -170,13 +177,15 @@ def filter_list(_list, filters=None, options=None):
         return len(rv)
 
     if options.get('order_by'):
-        for o in options.get('order_by'):
-            if o.startswith('-'):
-                o = o[1:]
-                reverse = True
-            else:
-                reverse = False
-            rv = sorted(rv, key=lambda x: x[o], reverse=reverse)
+        rv = sorted(rv, key=order_by_key(options['order_by']))
+
+    if options.get('offset') or options.get('limit'):
+        offset = options.get('offset') or 0
+        limit = options.get('limit')
+        rv = rv[offset:offset + limit] if limit else rv[offset:]
+
+    if options.get('select'):
+        rv = [select_fields(i, options['select']) for i in rv]
 
     if options.get('get') is True:
         return rv[0]
@@ -184,6 +193,60 @@ def filter_list(_list, filters=None, options=None):
     return rv
 
 
+class _OrderByKey(object):
+    """
+    Sort key comparing entries by a list of `order_by` fields in a single pass.
+    Fields prefixed with `-` are compared in descending order.
+    """
+
+    __slots__ = ('values', 'descending')
+
+    def __init__(self, values, descending):
+        self.values = values
+        self.descending = descending
+
+    def __eq__(self, other):
+        return self.values == other.values
+
+    def __lt__(self, other):
+        for a, b, descending in zip(self.values, other.values, self.descending):
+            if a == b:
+                continue
+            return a > b if descending else a < b
+        return False
+
+
+def order_by_key(order_by):
+    """
+    Returns a key function to sort a list by every field of `order_by`, the first
+    field being the most significant one (the same semantics as SQL ORDER BY).
+    """
+    fields = []
+    descending = []
+    for o in order_by:
+        if o.startswith('-'):
+            fields.append(o[1:])
+            descending.append(True)
+        else:
+            fields.append(o)
+            descending.append(False)
+
+    if not any(descending):
+        return lambda x: tuple(x[f] for f in fields)
+
+    descending = tuple(descending)
+    return lambda x: _OrderByKey(tuple(x[f] for f in fields), descending)
+
+
+def select_fields(obj, select):
+    """
+    Returns a new dict with only the `select` fields of `obj`.
+    """
+    if not isinstance(obj, dict):
+        return obj
+    return {f: obj[f] for f in select if f in obj}
+
+
 def sw_buildtime():
     global BUILDTIME
     if BUILDTIME is None:
@@ -271,18 +334,21 @@ class cache_with_autorefresh(object):
         return wrapper
 
 
-def load_modules(directory):
+def load_modules(directory, import_times=None):
     modules = []
     for f in os.listdir(directory):
         if not f.endswith('.py'):
             continue
         f = f[:-3]
+        start = time.monotonic()
         fp, pathname, description = imp.find_module(f, [directory])
         try:
             modules.append(imp.load_module(f, fp, pathname, description))
         finally:
             if fp:
                 fp.close()
+        if import_times is not None:
+            import_times[f] = time.monotonic() - start
 
     return modules
 
@@ -297,3 +363,33 @@ def load_classes(module, base, blacklist):
                     classes.append(attr)
 
     return classes
+
+
+class LazyImport(object):
+    """
+    Stand-in for a module (or an attribute of a module) which is only imported on first use,
+    so heavy libraries used by a few services do not slow down middlewared startup.
+
+    e.g.
+    ioc = LazyImport('iocage_lib.iocage')
+    IOCJson = LazyImport('iocage_lib.ioc_json', 'IOCJson')
+    """
+
+    def __init__(self, module, attr=None):
+        self.__module = module
+        self.__attr = attr
+        self.__target = None
+
+    def __resolve(self):
+        if self.__target is None:
+            target = importlib.import_module(self.__module)
+            if self.__attr is not None:
+                target = getattr(target, self.__attr)
+            self.__target = target
+        return self.__target
+
+    def __getattr__(self, name):
+        return getattr(self.__resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self.__resolve()(*args, **kwargs)
@@ -0,0 +1,55 @@
+import bisect
+import time
+
+
+class CallStats(object):
+    """
+    Counters of method calls by method name and execution path (`coroutine`, `thread`,
+    `thread_pool`, `process_pool` or `job`): number of calls and errors, total and maximum
+    latency and a latency histogram.
+
+    Calls are only accounted from the event loop thread so no locking is required.
+    """
+
+    # Upper bounds (seconds) of the latency histogram buckets, last bucket is unbounded
+    BUCKETS = (0.001, 0.01, 0.1, 1, 10, 60)
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.since = time.time()
+        self.__stats = {}
+
+    def add(self, method, path, elapsed, error):
+        stats = self.__stats.get((method, path))
+        if stats is None:
+            # calls, errors, total time, max time, histogram
+            stats = self.__stats[(method, path)] = [0, 0, 0.0, 0.0, [0] * (len(self.BUCKETS) + 1)]
+        stats[0] += 1
+        if error:
+            stats[1] += 1
+        stats[2] += elapsed
+        if elapsed > stats[3]:
+            stats[3] = elapsed
+        stats[4][bisect.bisect_left(self.BUCKETS, elapsed)] += 1
+
+    def get(self):
+        methods = []
+        for (method, path), (calls, errors, total, maximum, histogram) in self.__stats.items():
+            methods.append({
+                'method': method,
+                'path': path,
+                'calls': calls,
+                'errors': errors,
+                'time': total,
+                'time_max': maximum,
+                'histogram': [
+                    {'le': le, 'count': count}
+                    for le, count in zip(self.BUCKETS + (None,), histogram)
+                ],
+            })
+        methods.sort(key=lambda m: m['time'], reverse=True)
+        return methods
+
+    def reset(self):
+        self.since = time.time()
+        self.__stats = {}
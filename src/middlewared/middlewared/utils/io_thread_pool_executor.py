@@ -0,0 +1,140 @@
+import concurrent.futures
+import itertools
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _WorkItem(object):
+
+    def __init__(self, future, fn, args, kwargs):
+        self.future = future
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self, done):
+        """
+        `done` is called before the result is set so the worker is accounted as idle
+        by the time the caller is notified and may submit another call.
+        """
+        if not self.future.set_running_or_notify_cancel():
+            return done()
+
+        try:
+            result = self.fn(*self.args, **self.kwargs)
+        except BaseException as e:
+            keep_running = done()
+            self.future.set_exception(e)
+        else:
+            keep_running = done()
+            self.future.set_result(result)
+        return keep_running
+
+
+class IoThreadPoolExecutor(concurrent.futures.Executor):
+    """
+    Long-lived thread pool for blocking I/O calls.
+
+    Unlike `concurrent.futures.ThreadPoolExecutor` a submitted call never waits
+    for a busy thread: if there is no idle thread to pick it up a new one is
+    started. This keeps the property of spawning one thread per call (a call
+    running in this pool may synchronously wait for another call submitted to
+    the same pool without deadlocking) while reusing threads between calls.
+
+    Threads that stay idle for more than `idle_timeout` seconds exit, and no
+    more than `max_idle` threads are kept waiting for work at any time.
+    """
+
+    def __init__(self, name, idle_timeout=60, max_idle=20):
+        self.name = name
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._shutdown = False
+        self._threads = set()
+        # Number of threads that are not running a work item (including those
+        # which have been reserved for a work item that is still in the queue)
+        self._idle = 0
+        # Number of work items waiting in the queue
+        self._pending = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+
+            future = concurrent.futures.Future()
+            self._queue.put(_WorkItem(future, fn, args, kwargs))
+            self._pending += 1
+            if self._pending > self._idle:
+                self._start_thread()
+            return future
+
+    def _start_thread(self):
+        t = threading.Thread(target=self._worker, name=f'{self.name}_{next(self._counter)}', daemon=True)
+        self._threads.add(t)
+        self._idle += 1
+        t.start()
+
+    def _worker(self):
+        try:
+            while True:
+                try:
+                    work_item = self._queue.get(timeout=self.idle_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        # Only leave if every queued item still has an idle thread to run it
+                        if self._idle > self._pending:
+                            self._idle -= 1
+                            return
+                    continue
+
+                with self._lock:
+                    self._idle -= 1
+                    self._pending -= 1
+
+                if work_item is None:
+                    return
+
+                keep_running = work_item.run(self._work_done)
+                del work_item
+                if not keep_running:
+                    return
+        except Exception:
+            logger.critical('Exception in I/O thread pool worker', exc_info=True)
+        finally:
+            with self._lock:
+                self._threads.discard(threading.current_thread())
+
+    def _work_done(self):
+        with self._lock:
+            if self._idle - self._pending >= self.max_idle:
+                return False
+            self._idle += 1
+            return True
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            self._shutdown = True
+            threads = list(self._threads)
+            for i in range(len(threads)):
+                self._queue.put(None)
+                self._pending += 1
+
+        if wait:
+            for t in threads:
+                t.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'live': len(self._threads),
+                'idle': max(self._idle - self._pending, 0),
+                'queued': self._pending,
+            }
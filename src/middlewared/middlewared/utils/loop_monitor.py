@@ -0,0 +1,191 @@
+from collections import Counter
+import logging
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+class Heartbeat(object):
+
+    def __init__(self):
+        self.scheduled = time.monotonic()
+        self.ran = None
+        self.event = threading.Event()
+
+    def __call__(self):
+        self.ran = time.monotonic()
+        self.event.set()
+
+
+class LoopMonitor(object):
+    """
+    Measures how late callbacks run on the event loop (scheduling lag) by scheduling
+    a heartbeat every `interval` seconds.
+
+    While a heartbeat is late by more than `threshold` seconds (i.e. something is
+    blocking the loop) the stack of the loop thread is sampled every `sample_interval`
+    seconds. Samples are grouped by the middleware method in flight, found by looking for
+    frames of code objects in `call_frames` (mapping of code object to a function
+    returning the method name out of that frame).
+    """
+
+    # Number of innermost frames kept per sample and of distinct stacks kept per method
+    STACK_DEPTH = 10
+    MAX_STACKS = 50
+
+    def __init__(self, loop, thread_id, call_frames, interval=0.5, threshold=0.5, sample_interval=0.01,
+                 log_threshold=2):
+        self.loop = loop
+        self.thread_id = thread_id
+        self.call_frames = call_frames
+        self.interval = interval
+        self.threshold = threshold
+        self.sample_interval = sample_interval
+        self.log_threshold = log_threshold
+
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.since = time.time()
+            self.heartbeats = 0
+            self.lag_total = 0
+            self.lag_max = 0
+            self.lag_last = 0
+            # method: [times blocked, blocked time, max blocked time, samples, Counter of stacks]
+            self.methods = {}
+
+    def run(self):
+        while not self.loop.is_closed():
+            heartbeat = Heartbeat()
+            try:
+                self.loop.call_soon_threadsafe(heartbeat)
+            except RuntimeError:
+                # Loop closed meanwhile
+                return
+
+            if heartbeat.event.wait(self.threshold):
+                self.add_lag(heartbeat.ran - heartbeat.scheduled)
+            else:
+                samples = Counter()
+                stacks = Counter()
+                stopped = False
+                while not heartbeat.event.wait(self.interval if stopped else self.sample_interval):
+                    if not self.loop.is_running():
+                        # Loop stopped (e.g. between `run_until_complete` calls), the heartbeat will
+                        # run once it is started again. Time spent stopped is not lag.
+                        if self.loop.is_closed():
+                            return
+                        stopped = True
+                        continue
+                    if stopped:
+                        continue
+                    sample = self.sample()
+                    if sample is not None:
+                        samples[sample[0]] += 1
+                        stacks[sample] += 1
+
+                if not stopped:
+                    self.add_blocked(heartbeat.ran - heartbeat.scheduled, samples, stacks)
+                    self.add_lag(heartbeat.ran - heartbeat.scheduled)
+
+            time.sleep(self.interval)
+
+    def sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return None
+
+        method = None
+        stack = []
+        while frame is not None:
+            if len(stack) < self.STACK_DEPTH:
+                stack.append((frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+            if method is None:
+                get_method = self.call_frames.get(frame.f_code)
+                if get_method is not None:
+                    try:
+                        method = get_method(frame)
+                    except Exception:
+                        pass
+            frame = frame.f_back
+
+        return method or '<event loop>', tuple(reversed(stack))
+
+    def add_lag(self, lag):
+        with self.lock:
+            self.heartbeats += 1
+            self.lag_total += lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_last = lag
+
+    def add_blocked(self, elapsed, samples, stacks):
+        if samples:
+            method = samples.most_common(1)[0][0]
+        else:
+            # Unblocked before the first sample could be taken
+            method = '<event loop>'
+
+        with self.lock:
+            for name, count in samples.items():
+                self.__method(name)[3] += count
+            for (name, stack), count in stacks.items():
+                method_stacks = self.__method(name)[4]
+                if stack in method_stacks or len(method_stacks) < self.MAX_STACKS:
+                    method_stacks[stack] += count
+
+            stats = self.__method(method)
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+
+        if elapsed >= self.log_threshold:
+            stack = []
+            for (name, s), count in stacks.most_common():
+                if name == method:
+                    stack = s
+                    break
+            logger.warning(''.join(
+                [f'Event loop blocked for {elapsed:.2f} seconds by {method}:\n'] +
+                traceback.format_list([traceback.FrameSummary(*frame) for frame in stack])
+            ))
+
+    def __method(self, name):
+        stats = self.methods.get(name)
+        if stats is None:
+            stats = self.methods[name] = [0, 0, 0, 0, Counter()]
+        return stats
+
+    def get_stats(self, stacks=5):
+        with self.lock:
+            return {
+                'since': self.since,
+                'threshold': self.threshold,
+                'lag': {
+                    'heartbeats': self.heartbeats,
+                    'avg': self.lag_total / self.heartbeats if self.heartbeats else 0,
+                    'max': self.lag_max,
+                    'last': self.lag_last,
+                },
+                'methods': sorted([
+                    {
+                        'method': name,
+                        'blocked': blocked,
+                        'time': total,
+                        'time_max': maximum,
+                        'samples': samples,
+                        'stacks': [
+                            {
+                                'count': count,
+                                'stack': [f'{filename}:{lineno} in {func}' for filename, lineno, func in stack],
+                            }
+                            for stack, count in method_stacks.most_common(stacks)
+                        ],
+                    }
+                    for name, (blocked, total, maximum, samples, method_stacks) in self.methods.items()
+                ], key=lambda m: m['time'], reverse=True),
+            }
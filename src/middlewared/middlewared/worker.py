@@ -1,9 +1,11 @@
 #!/usr/local/bin/python3
 from middlewared.client import Client
+from middlewared.schema import private_args_kwargs
+from middlewared.utils.io_thread_pool_executor import IoThreadPoolExecutor
 
 import asyncio
 import concurrent.futures
-from concurrent.futures.process import _process_worker
+from concurrent.futures.process import _ExceptionWithTraceback, _process_worker
 import functools
 import importlib
 import logging
@@ -12,6 +14,7 @@ import os
 import select
 import setproctitle
 import threading
+import time
 
 MIDDLEWARE = None
 
@@ -40,6 +43,9 @@ class ProcessPoolExecutor(concurrent.futures.ProcessPoolExecutor):
             p.start()
             self._processes[p.pid] = p
 
+    def get_pids(self):
+        return list(self._processes or {})
+
 
 class FakeMiddleware(object):
     """
@@ -47,37 +53,65 @@ class FakeMiddleware(object):
     """
 
     def __init__(self):
+        # Connection to middlewared kept open for every call of this worker
         self.client = None
         self.logger = logging.getLogger('worker')
+        self.io_threadpool = IoThreadPoolExecutor('IoThread')
+        # Service instances by (module, class name), created on first call
+        self.services = {}
+        self.stats = {
+            'pid': os.getpid(),
+            'calls': 0,
+            'errors': 0,
+            'time': 0,
+            'time_max': 0,
+        }
+
+    def get_client(self):
+        if self.client is None or self.client._closed.is_set():
+            self.client = Client()
+        return self.client
+
+    def add_call_stats(self, elapsed, error):
+        self.stats['calls'] += 1
+        if error:
+            self.stats['errors'] += 1
+        self.stats['time'] += elapsed
+        self.stats['time_max'] = max(self.stats['time_max'], elapsed)
 
     async def run_in_thread(self, method, *args, **kwargs):
-        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
-        try:
-            return await asyncio.get_event_loop().run_in_executor(
-                executor, functools.partial(method, *args, **kwargs)
-            )
-        finally:
-            # We need this because default behavior of PoolExecutor with
-            # context manager is to shutdown(wait=True) which would block
-            # the worker until thread finishes.
-            executor.shutdown(wait=False)
+        return await asyncio.get_event_loop().run_in_executor(
+            self.io_threadpool, functools.partial(method, *args, **kwargs)
+        )
 
     async def _call(self, name, serviceobj, methodobj, params=None, app=None, pipes=None, io_thread=False, job=None):
-        with Client() as c:
-            self.client = c
-            job_options = getattr(methodobj, '_job', None)
-            if job and job_options:
-                params = list(params) if params else []
-                params.insert(0, FakeJob(job['id'], self.client))
+        client = self.get_client()
+        job_options = getattr(methodobj, '_job', None)
+        fake_job = None
+        if job and job_options:
+            fake_job = FakeJob(job['id'], client)
+            params = list(params) if params else []
+            params.insert(0, fake_job)
+        # Arguments have just been unpickled, @accepts does not need to copy them
+        kwargs = private_args_kwargs(methodobj)
+        try:
             if asyncio.iscoroutinefunction(methodobj):
-                return await methodobj(*params)
+                return await methodobj(*params, **kwargs)
             else:
-                return methodobj(*params)
-        self.client = None
+                return methodobj(*params, **kwargs)
+        finally:
+            if fake_job is not None:
+                # Latest progress must be sent before the job is done
+                try:
+                    fake_job.flush()
+                except Exception:
+                    self.logger.warning('Failed to send job progress', exc_info=True)
 
     async def _run(self, service_mod, service_name, method, args, job=None):
-        module = importlib.import_module(service_mod)
-        serviceobj = getattr(module, service_name)(self)
+        serviceobj = self.services.get((service_mod, service_name))
+        if serviceobj is None:
+            module = importlib.import_module(service_mod)
+            serviceobj = self.services[(service_mod, service_name)] = getattr(module, service_name)(self)
         methodobj = getattr(serviceobj, method)
         return await self._call(f'{service_name}.{method}', serviceobj, methodobj, params=args, job=job)
 
@@ -95,6 +129,12 @@ class FakeMiddleware(object):
 
 
 class FakeJob(object):
+    """
+    Progress updates are sent to middlewared at most once every `PROGRESS_INTERVAL`
+    seconds (the latest one) so bursts of updates do not cost a call each.
+    """
+
+    PROGRESS_INTERVAL = 1
 
     def __init__(self, id, client):
         self.id = id
@@ -104,25 +144,65 @@ class FakeJob(object):
             'description': None,
             'extra': None,
         }
+        self.lock = threading.Lock()
+        self.pending = False
+        self.sent_at = 0
+        self.timer = None
 
     def set_progress(self, percent, description=None, extra=None):
-        self.progress['percent'] = percent
-        if description:
-            self.progress['description'] = description
-        if extra:
-            self.progress['extra'] = extra
-        self.client.call('core.job_update', self.id, {'progress': self.progress})
+        with self.lock:
+            self.progress['percent'] = percent
+            if description:
+                self.progress['description'] = description
+            if extra:
+                self.progress['extra'] = extra
+
+            self.pending = True
+            if self.timer is not None:
+                return
+            delay = self.sent_at + self.PROGRESS_INTERVAL - time.monotonic()
+            if delay > 0:
+                self.timer = threading.Timer(delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+                return
+
+        self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if not self.pending:
+                return
+            self.pending = False
+            self.sent_at = time.monotonic()
+            progress = self.progress.copy()
+
+        self.client.call('core.job_update', self.id, {'progress': progress})
 
 
 def main_worker(*call_args):
+    """
+    Returns statistics of this worker along with the result of the call or the
+    exception it raised (for the caller to raise it) so statistics of failed
+    calls are not lost.
+    """
     global MIDDLEWARE
     loop = asyncio.get_event_loop()
     coro = MIDDLEWARE._run(*call_args)
+    start = time.monotonic()
+    res = exc = None
     try:
         res = loop.run_until_complete(coro)
     except SystemExit:
-        raise RuntimeError('Worker call raised SystemExit exception')
-    return res
+        exc = RuntimeError('Worker call raised SystemExit exception')
+    except Exception as e:
+        # Keeps the traceback of the worker, as if the exception had been raised
+        exc = _ExceptionWithTraceback(e, e.__traceback__)
+    MIDDLEWARE.add_call_stats(time.monotonic() - start, exc is not None)
+    return dict(MIDDLEWARE.stats), res, exc
 
 
 def watch_parent():